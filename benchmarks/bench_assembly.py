@@ -0,0 +1,88 @@
+"""Collection and run time of raw concatenated output versus assembled output.
+
+Writes the same synthetic writer snippets twice: once concatenated as they
+arrive (``TestFileSink(assemble=False)``) and once through the output
+assembler. Every snippet repeats the imports and a module-level client like
+real writer output does, and defines the same slow fixture. The assembled
+suite builds the client once per module and the fixture once per session.
+
+    python benchmarks/bench_assembly.py --modules 4 --tests 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from output_sink import TestFileSink  # noqa: E402
+
+SNIPPET = '''import pytest
+import time
+from decimal import Decimal
+
+client = dict.fromkeys(range(200000))
+
+@pytest.fixture
+def ledger():
+    time.sleep({setup_seconds})
+    return [Decimal(i) for i in range(1000)]
+
+def test_{name}(ledger):
+    assert sum(ledger[:{count}]) == Decimal({total})
+    assert len(client) == 200000
+'''
+
+
+def write_suite(directory, modules, tests, setup_seconds, assemble):
+    os.makedirs(directory)
+    for m in range(modules):
+        sink = TestFileSink(f"src/module_{m}.py", os.path.join(directory, f"test_module_{m}.py"), assemble=assemble)
+        for t in range(tests):
+            count = t + 1
+            sink.add(t, SNIPPET.format(name=f"sum_{m}_{t}", count=count, total=count * (count - 1) // 2,
+                                       setup_seconds=setup_seconds))
+        sink.commit()
+
+
+def time_pytest(directory, extra_args, repeat):
+    """Median wall time of a pytest run, and its summary line."""
+    command = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", *extra_args, directory]
+    env = {**os.environ, "PYTEST_DISABLE_PLUGIN_AUTOLOAD": "1"}
+    times, summary = [], ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=directory, env=env, capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+        summary = result.stdout.strip().splitlines()[-1] if result.stdout.strip() else result.stderr
+    return statistics.median(times), summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark raw versus assembled generated test modules.")
+    parser.add_argument("--modules", type=int, default=4, help="Generated test modules (default: 4)")
+    parser.add_argument("--tests", type=int, default=20, help="Tests per module (default: 20)")
+    parser.add_argument("--setup-seconds", type=float, default=0.005,
+                        help="Set-up time of the shared fixture (default: 0.005)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the median is kept (default: 3)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'output':<12}{'collect s':>11}{'run s':>9}  result")
+        for label, assemble in (("raw", False), ("assembled", True)):
+            directory = os.path.join(tmp, label)
+            write_suite(directory, args.modules, args.tests, args.setup_seconds, assemble)
+            collect, _ = time_pytest(directory, ["--collect-only"], args.repeat)
+            run, summary = time_pytest(directory, [], args.repeat)
+            print(f"{label:<12}{collect:>11.3f}{run:>9.3f}  {summary}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Source discovery time: recursive glob plus filter versus the pruning scandir walker.
+
+Builds a synthetic repository with a few hundred source files next to
+``node_modules``, ``.venv`` and ``build`` trees holding many more files,
+then times the old ``glob.glob("**/*.py")`` discovery against
+``discovery.iter_source_files``, which never enters the ignored trees.
+
+    python benchmarks/bench_discovery.py --sources 300 --vendored 30000
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discovery import iter_source_files  # noqa: E402
+
+VENDORED_TREES = ("node_modules", ".venv/lib/python3.12/site-packages", "build/lib")
+
+
+def make_repo(root, sources, vendored):
+    for i in range(sources):
+        package = os.path.join(root, "src", f"pkg_{i % 10}")
+        os.makedirs(package, exist_ok=True)
+        with open(os.path.join(package, f"module_{i}.py"), "w") as f:
+            f.write("def f(x):\n    return x\n")
+    per_tree = vendored // len(VENDORED_TREES)
+    for tree in VENDORED_TREES:
+        for i in range(per_tree):
+            package = os.path.join(root, tree, f"dep_{i // 50}")
+            os.makedirs(package, exist_ok=True)
+            open(os.path.join(package, f"mod_{i}.py"), "w").close()
+    with open(os.path.join(root, ".gitignore"), "w") as f:
+        f.write("build/\n")
+
+
+def glob_discovery(repo_path):
+    """The previous discovery: a full recursive glob, filtered afterwards."""
+    source_files = glob.glob(f"{repo_path}/**/*.py", recursive=True)
+    return [f for f in source_files if not f.endswith("test.py")
+            and "test_" not in os.path.basename(f)
+            and "__pycache__" not in f
+            and "__init__.py" not in f]
+
+
+def time_call(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark source discovery on a repository with vendored trees.")
+    parser.add_argument("--sources", type=int, default=300, help="Source files to discover (default: 300)")
+    parser.add_argument("--vendored", type=int, default=30000,
+                        help="Files in node_modules, .venv and build together (default: 30000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the median is kept (default: 3)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as root:
+        make_repo(root, args.sources, args.vendored)
+        print(f"{'discovery':<12}{'seconds':>9}{'files':>8}")
+        for label, fn in (("glob", lambda: glob_discovery(root)),
+                          ("scandir", lambda: list(iter_source_files(root)))):
+            seconds, files = time_call(fn, args.repeat)
+            print(f"{label:<12}{seconds:>9.3f}{len(files):>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""End-to-end pipeline benchmark using the offline fake LLM backend.
+
+Generates a synthetic repository of ``--files`` modules with ``--functions``
+functions each, runs it through ``build_workflow()`` with simulated LLM
+latency and reports files/sec, scenarios/sec, peak RSS and per-node time.
+
+    python benchmarks/bench_pipeline.py --files 20 --functions 8 --latency 0.05 --jitter 0.02 -j 4
+    python benchmarks/bench_pipeline.py ... --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py ... --baseline benchmarks/baseline.json
+
+With ``--baseline`` the run exits with status 1 if throughput drops, peak
+RSS grows or any node slows down by more than ``--tolerance``.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_client  # noqa: E402
+from llm_cache import configure_cache  # noqa: E402
+from main import build_workflow, discover_source_files, initial_state, save_generated_tests  # noqa: E402
+from metrics import default_metrics  # noqa: E402
+
+# Node times below this many seconds are too noisy to compare against a baseline
+MIN_COMPARABLE_SECONDS = 0.05
+
+MODULE_TEMPLATE = '''"""Synthetic module {index}."""
+
+
+'''
+
+FUNCTION_TEMPLATE = '''def function_{index}(value, limit={index}):
+    """Clamp a value to a limit."""
+    if value is None:
+        raise ValueError("value is required")
+    if value > limit:
+        return limit
+    for _ in range(value):
+        value -= 1
+    return value
+
+
+'''
+
+
+def make_synthetic_repo(root, files, functions):
+    """Write ``files`` modules with ``functions`` functions each under ``root``."""
+    for i in range(files):
+        with open(os.path.join(root, f"module_{i}.py"), "w", encoding="utf-8") as f:
+            f.write(MODULE_TEMPLATE.format(index=i))
+            for j in range(functions):
+                f.write(FUNCTION_TEMPLATE.format(index=j))
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_pipeline(app, source_files, output_dir, jobs):
+    """Run every file through the graph; returns the number of scenarios planned."""
+    if jobs <= 1:
+        results = [app.invoke(initial_state(file_path)) for file_path in source_files]
+    else:
+        async def run_all():
+            semaphore = asyncio.Semaphore(jobs)
+
+            async def process(file_path):
+                async with semaphore:
+                    return await app.ainvoke(initial_state(file_path))
+
+            return await asyncio.gather(*(process(f) for f in source_files))
+
+        results = asyncio.run(run_all())
+
+    for file_path, result in zip(source_files, results):
+        save_generated_tests(result, file_path, output_dir)
+    return sum(len(result["test_scenarios"]) for result in results)
+
+
+def run_benchmark(args):
+    """Run the configured benchmark ``args.repeat`` times and return the median results."""
+    os.environ["TESTGEN_BACKEND"] = "fake"
+    os.environ["TESTGEN_FAKE_LATENCY"] = str(args.latency)
+    os.environ["TESTGEN_FAKE_JITTER"] = str(args.jitter)
+    llm_client.reset()
+    configure_cache(enabled=False)
+
+    runs = []
+    with tempfile.TemporaryDirectory() as repo, tempfile.TemporaryDirectory() as output_dir:
+        make_synthetic_repo(repo, args.files, args.functions)
+        source_files = discover_source_files(repo)
+        app = build_workflow(writer_concurrency=args.writer_concurrency, use_async=args.jobs > 1,
+                             group_by_function=args.group_by_function)
+        for _ in range(args.repeat):
+            default_metrics.reset()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                scenarios = run_pipeline(app, source_files, output_dir, args.jobs)
+            seconds = time.perf_counter() - start
+            runs.append({
+                "seconds": seconds,
+                "files_per_sec": len(source_files) / seconds,
+                "scenarios_per_sec": scenarios / seconds,
+                "scenarios": scenarios,
+                "node_seconds": {node: entry["wall_seconds"] for node, entry in default_metrics.summary().items()},
+            })
+
+    nodes = sorted({node for run in runs for node in run["node_seconds"]})
+    return {
+        "config": {key: getattr(args, key) for key in
+                   ("files", "functions", "jobs", "writer_concurrency", "group_by_function", "latency", "jitter")},
+        "seconds": statistics.median(run["seconds"] for run in runs),
+        "files_per_sec": statistics.median(run["files_per_sec"] for run in runs),
+        "scenarios_per_sec": statistics.median(run["scenarios_per_sec"] for run in runs),
+        "scenarios": runs[-1]["scenarios"],
+        "peak_rss_mb": peak_rss_mb(),
+        "node_seconds": {node: statistics.median(run["node_seconds"].get(node, 0.0) for run in runs)
+                         for node in nodes},
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Human-readable regressions of ``results`` against ``baseline``; empty if none."""
+    if results["config"] != baseline["config"]:
+        return [f"baseline was recorded with a different config: {baseline['config']}"]
+
+    regressions = []
+    for key in ("files_per_sec", "scenarios_per_sec"):
+        if results[key] < baseline[key] * (1 - tolerance):
+            regressions.append(f"{key} dropped from {baseline[key]:.2f} to {results[key]:.2f}")
+    if results["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak_rss_mb grew from {baseline['peak_rss_mb']:.1f} to {results['peak_rss_mb']:.1f}")
+    for node, before in baseline["node_seconds"].items():
+        after = results["node_seconds"].get(node, 0.0)
+        if before >= MIN_COMPARABLE_SECONDS and after > before * (1 + tolerance):
+            regressions.append(f"{node} slowed from {before:.3f}s to {after:.3f}s")
+    return regressions
+
+
+def format_results(results):
+    lines = [
+        f"{results['config']['files']} files x {results['config']['functions']} functions, "
+        f"{results['scenarios']} scenarios in {results['seconds']:.2f}s",
+        f"  files/sec:       {results['files_per_sec']:.2f}",
+        f"  scenarios/sec:   {results['scenarios_per_sec']:.2f}",
+        f"  peak RSS:        {results['peak_rss_mb']:.1f} MB",
+    ]
+    for node, seconds in results["node_seconds"].items():
+        lines.append(f"  {node + ':':<17}{seconds:.3f}s")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the test generation pipeline offline.")
+    parser.add_argument("--files", type=int, default=10, help="Synthetic source files (default: 10)")
+    parser.add_argument("--functions", type=int, default=5, help="Functions per file (default: 5)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Files processed concurrently (default: 1)")
+    parser.add_argument("--writer-concurrency", type=int, default=4,
+                        help="Max test writer requests in flight per file (default: 4)")
+    parser.add_argument("--group-by-function", action="store_true",
+                        help="Write one parametrized test per function")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated LLM latency in seconds (default: 0.02)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Simulated latency jitter in seconds (default: 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs to take the median of (default: 3)")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    parser.add_argument("--save-baseline", help="Write the results as a baseline to this file")
+    parser.add_argument("--baseline", help="Fail if the results regress against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative regression against the baseline (default: 0.15)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmark(args)
+    print(format_results(results))
+
+    for path in (args.json_path, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nPERFORMANCE REGRESSION against {args.baseline}:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Per-scenario overhead of the graph state as the scenario count grows.
+
+Runs one synthetic file through the one-scenario-per-step test writer with
+a zero-latency fake LLM, so the time measured is the graph's own
+bookkeeping. With delta-returning nodes and the append reducer on
+``generated_tests`` the cost per scenario should stay flat.
+
+    python benchmarks/bench_state.py --scenarios 50 100 200 400 800
+    python benchmarks/bench_state.py --max-growth 1.5
+
+With ``--max-growth`` the run exits with status 1 if the per-scenario time
+at the largest count exceeds the smallest by more than that factor.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_client  # noqa: E402
+from llm_cache import configure_cache  # noqa: E402
+from main import build_workflow, initial_state  # noqa: E402
+
+SOURCE = '''def clamp(value, limit):
+    """Clamp a value to a limit."""
+    if value > limit:
+        return limit
+    return value
+'''
+
+# Large enough that copying them on every step would show up
+DESCRIPTION = "x" * 2048
+TEST_CODE = "def test_clamp():\n    assert True\n" + "# padding\n" * 400
+
+
+def make_script(path, scenarios):
+    """Fake LLM script: the strategist plans ``scenarios`` scenarios and every test is TEST_CODE."""
+    plan = [{"function": "clamp", "test_name": f"test_clamp_{i}", "description": DESCRIPTION,
+             "priority": "high"} for i in range(scenarios)]
+    rules = [
+        {"match": "test strategist", "response": json.dumps(plan)},
+        {"match": "test code writer", "response": f"```python\n{TEST_CODE}```"},
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(rules, f)
+
+
+def time_run(source_path, script_path, repeat):
+    """Best wall time over ``repeat`` runs of the graph for one file."""
+    os.environ["TESTGEN_FAKE_SCRIPT"] = script_path
+    llm_client.reset()
+    # Dedupe would merge the identical synthetic scenarios into one
+    app = build_workflow(writer_concurrency=1, dedupe_scenarios=False)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = app.invoke(initial_state(source_path))
+        best = min(best, time.perf_counter() - start)
+    return best, len(result["generated_tests"])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark per-scenario graph state overhead.")
+    parser.add_argument("--scenarios", type=int, nargs="+", default=[50, 100, 200, 400],
+                        help="Scenario counts to measure (default: 50 100 200 400)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per count; the best is kept (default: 3)")
+    parser.add_argument("--max-growth", type=float, default=None,
+                        help="Fail if per-scenario time grows by more than this factor")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ["TESTGEN_BACKEND"] = "fake"
+    os.environ["TESTGEN_FAKE_LATENCY"] = "0"
+    configure_cache(enabled=False)
+
+    per_scenario = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, "clamp.py")
+        with open(source_path, "w", encoding="utf-8") as f:
+            f.write(SOURCE)
+        print(f"{'scenarios':>10}{'total s':>10}{'ms/scenario':>13}")
+        for count in sorted(args.scenarios):
+            script_path = os.path.join(tmp, f"script_{count}.json")
+            make_script(script_path, count)
+            seconds, written = time_run(source_path, script_path, args.repeat)
+            if written != count:
+                print(f"Expected {count} tests but {written} were generated")
+                return 1
+            per_scenario[count] = seconds / count
+            print(f"{count:>10}{seconds:>10.3f}{per_scenario[count] * 1000:>13.3f}")
+
+    smallest, largest = min(per_scenario), max(per_scenario)
+    growth = per_scenario[largest] / per_scenario[smallest]
+    print(f"\nPer-scenario time grew {growth:.2f}x from {smallest} to {largest} scenarios")
+    if args.max_growth is not None and growth > args.max_growth:
+        print(f"PERFORMANCE REGRESSION: growth exceeds {args.max_growth:.2f}x")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""Run and per-file spending limits that decide which scenarios get written.
+
+Limits are set in tokens, dollars or wall-clock seconds, for the whole run
+and for each file (``parse_limits("$5,2h")``). Every LLM call that reaches
+the provider is charged to the run and to the file it was made for; cached
+responses are free. Before each writer call the scenario is admitted or
+skipped:
+
+* nothing is written once the estimated cost of a writer call no longer
+  fits in what is left of a limit;
+* lower-value scenarios must leave a reserve: ``medium`` ones stop when
+  less than 10% of a limit is left, ``low`` ones at 25%. The reserve
+  shrinks with the complexity of the function under test, so complex
+  functions keep their tests longer;
+* across files, scenarios below ``high`` stay within their file's fair
+  share of the run limits (what was left when the file started, divided
+  by the files still to go), so early files cannot starve later ones.
+
+Skipped scenarios are recorded for the end-of-run report.
+"""
+import json
+import os
+import re
+import threading
+import time
+
+KINDS = ("tokens", "dollars", "seconds")
+
+# Spend and skipped scenarios of a run, written to the output directory
+BUDGET_REPORT_NAME = "testgen_budget.json"
+
+# Fraction of a limit kept back from each priority, before the complexity weight
+RESERVE = {"high": 0.0, "medium": 0.10, "low": 0.25}
+
+# Divides the reserve: complex functions may spend further into it
+COMPLEXITY_WEIGHT = {"simple": 1.0, "medium": 1.5, "complex": 2.0}
+
+# Assumed tokens of a writer call until one has been measured
+WRITER_TOKEN_ESTIMATE = 2000
+
+# Dollars per million (input, output) tokens; TESTGEN_PRICE="in,out" overrides
+PRICES = {
+    "gpt-4": (30.0, 60.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4.1": (2.0, 8.0),
+    "gpt-4.1-mini": (0.4, 1.6),
+    "gpt-4.1-nano": (0.1, 0.4),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+
+_LIMIT = re.compile(r"^(\$)?\s*(\d+(?:\.\d+)?)\s*([km]?)\s*(tokens?|usd|\$|s|m|h)?$", re.IGNORECASE)
+_SECONDS = {"s": 1, "m": 60, "h": 3600}
+
+
+def parse_limits(spec):
+    """Limits from a spec such as ``"500k tokens"``, ``"$5"``, ``"2h"`` or ``"$5,90m"``.
+
+    Returns ``{kind: amount}``; raises ValueError for a malformed spec.
+    """
+    limits = {}
+    for part in filter(None, (p.strip() for p in str(spec or "").split(","))):
+        match = _LIMIT.match(part)
+        if not match:
+            raise ValueError(f"invalid budget {part!r}; use e.g. 500k tokens, $5 or 2h")
+        dollar, number, scale, unit = match.groups()
+        scale, unit = scale.lower(), (unit or "").lower()
+        if scale == "m" and not unit and not dollar:
+            scale, unit = "", "m"  # "90m" is minutes, "2m tokens" two million
+        amount = float(number) * {"": 1, "k": 1e3, "m": 1e6}[scale]
+        if dollar or unit in ("usd", "$"):
+            limits["dollars"] = amount
+        elif unit.startswith("token"):
+            limits["tokens"] = amount
+        elif unit in _SECONDS and not scale:
+            limits["seconds"] = amount * _SECONDS[unit]
+        else:
+            raise ValueError(f"invalid budget {part!r}; give a unit: tokens, $ or s/m/h")
+    return limits
+
+
+def price(settings):
+    """Dollars per million ``(input, output)`` tokens for a node's model settings, or None if unknown."""
+    override = os.getenv("TESTGEN_PRICE")
+    if override:
+        prompt, completion = (float(p) for p in override.split(","))
+        return prompt, completion
+    if settings.get("backend") != "openai":
+        return 0.0, 0.0
+    model = str(settings.get("model", ""))
+    # Dated snapshots (gpt-4o-2024-08-06) cost the same as their model
+    for name in sorted(PRICES, key=len, reverse=True):
+        if model == name or model.startswith(f"{name}-"):
+            return PRICES[name]
+    return None
+
+
+class _Account:
+    """What one run or file may spend and has spent."""
+
+    def __init__(self, limits, clock):
+        self.limits = dict(limits)
+        self.clock = clock
+        self.started = clock()
+        self.spent = {"tokens": 0.0, "dollars": 0.0}
+        self.share = {}
+        self.writing = 0  # Admitted writer calls not finished yet
+
+    def used(self, kind):
+        return self.clock() - self.started if kind == "seconds" else self.spent[kind]
+
+    def remaining(self, kind):
+        return self.limits[kind] - self.used(kind)
+
+    def committed(self, kind, estimate):
+        """What is spent, plus the estimate for writer calls in flight (time passes for them already)."""
+        return self.used(kind) + (0 if kind == "seconds" else self.writing * estimate)
+
+
+class Budget:
+    """Thread-safe run and per-file accounts, and the admission of writer calls."""
+
+    def __init__(self, limits=None, file_limits=None, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.configure(limits, file_limits)
+
+    def configure(self, limits=None, file_limits=None, files=0, parallel=1):
+        """Start a run of ``files`` files processed ``parallel`` at a time."""
+        with self._lock:
+            self.run = _Account(limits or {}, self.clock)
+            self.file_limits = dict(file_limits or {})
+            self.files = {}
+            self.total_files = files
+            self.parallel = max(1, parallel)
+            self.skipped = []
+            self.unpriced = set()
+            self._writer_calls = 0
+            self._writer_spent = {"tokens": 0.0, "dollars": 0.0, "seconds": 0.0}
+
+    @property
+    def enabled(self):
+        return bool(self.run.limits or self.file_limits)
+
+    @property
+    def exhausted(self):
+        """Whether the run budget cannot pay for another writer call."""
+        with self._lock:
+            return any(self.run.remaining(kind) < self.estimate(kind) for kind in self.run.limits)
+
+    def start_round(self, files):
+        """Reopen the file accounts for another pass over ``files`` files; the run account carries over."""
+        with self._lock:
+            self.files = {}
+            self.total_files = files
+
+    def _file(self, file_path):
+        """The account of a file, opened with its share of the run on first use."""
+        account = self.files.get(file_path)
+        if account is None:
+            account = self.files[file_path] = _Account(self.file_limits, self.clock)
+            files_left = max(1, self.total_files - len(self.files) + 1)
+            for kind in self.run.limits:
+                # Files running side by side share the clock, not the tokens
+                share = min(self.parallel, files_left) if kind == "seconds" else 1
+                account.share[kind] = self.run.remaining(kind) * share / files_left
+        return account
+
+    def charge(self, file_path, prompt_tokens, completion_tokens, seconds, settings=None, writer=False):
+        """Book one LLM call that reached the provider."""
+        rates = price(settings or {})
+        with self._lock:
+            if rates is None:
+                self.unpriced.add(str((settings or {}).get("model")))
+                rates = (0.0, 0.0)
+            cost = {"tokens": prompt_tokens + completion_tokens,
+                    "dollars": (prompt_tokens * rates[0] + completion_tokens * rates[1]) / 1e6}
+            for account in (self.run, self._file(file_path)):
+                for kind, amount in cost.items():
+                    account.spent[kind] += amount
+            if writer:
+                self._writer_calls += 1
+                self._writer_spent["seconds"] += seconds
+                for kind, amount in cost.items():
+                    self._writer_spent[kind] += amount
+
+    def estimate(self, kind):
+        """Expected cost of one writer call: the average so far."""
+        if self._writer_calls:
+            return self._writer_spent[kind] / self._writer_calls
+        return WRITER_TOKEN_ESTIMATE if kind == "tokens" else 0.0
+
+    def _refusal(self, account, kind, estimate, reserve, what):
+        if account.limits[kind] - account.committed(kind, estimate) - estimate < reserve * account.limits[kind]:
+            return f"{what} {kind} spent"
+        return None
+
+    def admit(self, file_path, scenario, complexity="simple"):
+        """Whether to write ``scenario`` of ``file_path``; records it as skipped otherwise.
+
+        ``complexity`` is the simple|medium|complex label of the function
+        under test. An admitted scenario holds the estimated cost of a
+        writer call until ``release()``, so concurrent writers cannot all
+        be admitted on the same remaining budget.
+        """
+        return bool(self.admit_call(file_path, [scenario], complexity))
+
+    def _refusal_reason(self, account, priority, complexity):
+        reserve = RESERVE.get(priority, RESERVE["medium"]) / COMPLEXITY_WEIGHT.get(complexity, 1.0)
+        reason = None
+        for kind in KINDS:
+            estimate = self.estimate(kind)
+            if kind in self.run.limits:
+                reason = reason or self._refusal(self.run, kind, estimate, reserve, "run budget")
+                if priority != "high" and account.committed(kind, estimate) + estimate > account.share[kind]:
+                    reason = reason or f"file's share of the run {kind} spent"
+            if kind in account.limits:
+                reason = reason or self._refusal(account, kind, estimate, reserve, "file budget")
+        return reason
+
+    def admit_call(self, file_path, scenarios, complexity="simple"):
+        """The ``scenarios`` one writer call of ``file_path`` may cover; the others are recorded as skipped.
+
+        A grouped writer covers all of a function's scenarios in a single
+        call, so it holds a single writer call estimate until
+        ``release()``. Each scenario stays in the call if the budget left
+        for that one call satisfies the reserve of its priority.
+        """
+        if not self.enabled:
+            return list(scenarios)
+        with self._lock:
+            account = self._file(file_path)
+            allowed = []
+            for scenario in scenarios:
+                priority = str(scenario.get("priority", "medium")).lower()
+                reason = self._refusal_reason(account, priority, complexity)
+                if reason is None:
+                    allowed.append(scenario)
+                    continue
+                self.skipped.append({"file": file_path, "test_name": scenario.get("test_name"),
+                                     "function": scenario.get("function"), "priority": priority,
+                                     "complexity": complexity, "reason": reason})
+            if allowed:
+                self.run.writing += 1
+                account.writing += 1
+            return allowed
+
+    def release(self, file_path, count=1):
+        """Finish ``count`` admitted writer calls of a file, whether or not they succeeded."""
+        if not self.enabled or not count:
+            return
+        with self._lock:
+            account = self._file(file_path)
+            self.run.writing = max(0, self.run.writing - count)
+            account.writing = max(0, account.writing - count)
+
+    def skipped_for(self, file_path):
+        with self._lock:
+            return [skip for skip in self.skipped if skip["file"] == file_path]
+
+    def report(self):
+        """Summary lines for the end of a run, listing skipped scenarios per file."""
+        spent = f"{self.run.spent['tokens']:.0f} tokens, ${self.run.spent['dollars']:.4f}, " \
+                f"{self.run.used('seconds'):.0f}s"
+        lines = [f"Budget: spent {spent}; skipped {len(self.skipped)} scenarios"]
+        if self.unpriced:
+            lines.append(f"  No price known for {', '.join(sorted(self.unpriced))}; their calls "
+                         f"were counted as free (set TESTGEN_PRICE=\"in,out\" dollars per million tokens)")
+        by_file = {}
+        for skip in self.skipped:
+            by_file.setdefault(skip["file"], []).append(skip)
+        for file_path, skips in by_file.items():
+            lines.append(f"  {file_path}:")
+            lines.extend(f"    {s['test_name']} ({s['priority']}, {s['complexity']}): {s['reason']}" for s in skips)
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        with self._lock:
+            data = {"limits": self.run.limits, "file_limits": self.file_limits,
+                    "spent": {**self.run.spent, "seconds": self.run.used("seconds")},
+                    "skipped": list(self.skipped)}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+
+default_budget = Budget()
@@ -0,0 +1,285 @@
+"""Durable graph checkpoints so an interrupted run can resume mid-file.
+
+``SqliteCheckpointer`` is a LangGraph checkpoint saver backed by one local
+SQLite file (stdlib ``sqlite3``, no extra dependency). The workflow saves
+a checkpoint after every step. With the one-scenario-at-a-time writer
+that is after every test, so a resumed file continues with the next
+scenario instead of starting over.
+
+A checkpoint row holds only the channel versions. Each channel value is
+stored once per version, when it changes, as LangGraph's own savers do.
+A list that only grew since the channel's previous version, such as
+``generated_tests``, is stored as the appended items plus a reference to
+that version. So a step writes what the step produced, not the whole
+state, and the database grows linearly with the number of tests. The
+previous version is read back from the database rather than kept in
+memory, so threads of files that fail cost nothing once they stop, and a
+resumed thread keeps storing deltas.
+
+Each file of a run is its own graph thread, keyed ``<run id>:<file path>``.
+The same database records the runs and which of their files finished, so
+``--resume`` can skip those and continue the others from their last
+checkpoint.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+CHECKPOINT_DB_NAME = ".testgen_checkpoints.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, parent_id TEXT,
+    checkpoint_type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT, checkpoint_ns TEXT, channel TEXT, version TEXT, base_version TEXT,
+    value_type TEXT, value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, task_id TEXT, idx INTEGER,
+    channel TEXT, value_type TEXT, value BLOB, task_path TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, started REAL, fingerprint TEXT);
+CREATE TABLE IF NOT EXISTS run_files (
+    run_id TEXT, file_path TEXT, status TEXT, PRIMARY KEY (run_id, file_path)
+);
+"""
+
+# run_files.status values
+STARTED, FINISHED = "started", "finished"
+
+
+def thread_config(run_id, file_path):
+    """Graph config that keys a file's checkpoints by run and path."""
+    return {"configurable": {"thread_id": f"{run_id}:{file_path}"}}
+
+
+class SqliteCheckpointer(BaseCheckpointSaver):
+    """LangGraph checkpoint saver storing checkpoints and pending writes in SQLite."""
+
+    def __init__(self, path, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _execute(self, sql, rows):
+        with self._lock:
+            self._db.executemany(sql, rows)
+            self._db.commit()
+
+    # --- Checkpoint saver interface ---
+
+    def _channel_values(self, thread_id, checkpoint_ns, channel_versions):
+        """The values of the checkpoint's channels, rebuilt from their stored versions."""
+        values = {}
+        for channel, version in channel_versions.items():
+            rows = self._query("SELECT version, base_version, value_type, value FROM blobs "
+                               "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ?",
+                               (thread_id, checkpoint_ns, channel))
+            blobs = {row[0]: row[1:] for row in rows}
+            chain, version = [], str(version)
+            while version in blobs:
+                base_version, value_type, value = blobs[version]
+                chain.append((value_type, value))
+                version = base_version
+            if not chain or chain[-1][0] == "empty":
+                continue
+            value = self.serde.loads_typed(chain.pop())
+            while chain:
+                value = value + self.serde.loads_typed(chain.pop())
+            values[channel] = value
+        return values
+
+    def _tuple(self, thread_id, checkpoint_ns, row):
+        checkpoint_id, parent_id, checkpoint_type, checkpoint, metadata_type, metadata = row
+        checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint))
+        # Checkpoints saved before values moved to the blobs table still carry them inline
+        checkpoint["channel_values"] = {**checkpoint.get("channel_values", {}), **self._channel_values(
+            thread_id, checkpoint_ns, checkpoint.get("channel_versions", {}))}
+        writes = self._query(
+            "SELECT task_id, idx, channel, value_type, value, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id))
+        writes.sort(key=lambda w: writes_sort_key(w[5], w[0], w[1]))
+
+        def config(cid):
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": cid}}
+
+        return CheckpointTuple(
+            config=config(checkpoint_id),
+            checkpoint=checkpoint,
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=config(parent_id) if parent_id else None,
+            pending_writes=[(task_id, channel, self.serde.loads_typed((value_type, value)))
+                            for task_id, _, channel, value_type, value, _ in writes],
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_id, checkpoint_type, checkpoint, metadata_type, metadata"
+        if checkpoint_id := get_checkpoint_id(config):
+            rows = self._query(f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                               "AND checkpoint_id = ?", (thread_id, checkpoint_ns, checkpoint_id))
+        else:
+            rows = self._query(f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                               "ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns))
+        return self._tuple(thread_id, checkpoint_ns, rows[0]) if rows else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        sql = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint_type, checkpoint, "
+               "metadata_type, metadata FROM checkpoints")
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        for thread_id, checkpoint_ns, *row in self._query(sql + " ORDER BY checkpoint_id DESC", params):
+            checkpoint = self._tuple(thread_id, checkpoint_ns, row)
+            if filter and not all(checkpoint.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield checkpoint
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint = checkpoint.copy()
+        values = checkpoint.pop("channel_values", {})
+        self._execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                      [(thread_id, checkpoint_ns, channel, str(version),
+                        *self._dump_value(thread_id, checkpoint_ns, channel, version, values))
+                       for channel, version in new_versions.items()])
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        self._execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(
+            thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+            checkpoint_type, checkpoint_blob, metadata_type, metadata_blob)])
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def _dump_value(self, thread_id, checkpoint_ns, channel, version, values):
+        """``(base version, type, blob)`` of a channel's new version; only the new items of a grown list."""
+        if channel not in values:
+            return None, "empty", b""
+        value = values[channel]
+        if isinstance(value, list):
+            # The channel's most recently stored version, which this one replaces
+            rows = self._query("SELECT version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                               "AND channel = ? AND version != ? ORDER BY rowid DESC LIMIT 1",
+                               (thread_id, checkpoint_ns, channel, str(version)))
+            if rows:
+                previous = self._channel_values(thread_id, checkpoint_ns, {channel: rows[0][0]}).get(channel)
+                if (isinstance(previous, list) and len(value) >= len(previous)
+                        and value[:len(previous)] == previous):
+                    return (rows[0][0], *self.serde.dumps_typed(value[len(previous):]))
+        return (None, *self.serde.dumps_typed(value))
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Regular writes are kept once per task; special ones (errors, interrupts) are replaced
+        regular, special = [], []
+        for index, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, index)
+            value_type, value_blob = self.serde.dumps_typed(value)
+            (regular if idx >= 0 else special).append((
+                thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, value_type, value_blob, task_path))
+        self._execute("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", regular)
+        self._execute("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", special)
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            self._db.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._db.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self._db.execute("DELETE FROM blobs WHERE thread_id = ?", (thread_id,))
+            self._db.commit()
+
+    # SQLite calls are local and short, so the async variants run them inline
+    async def aget_tuple(self, config):
+        return self.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for checkpoint in self.list(config, filter=filter, before=before, limit=limit):
+            yield checkpoint
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        self.delete_thread(thread_id)
+
+    # --- Run bookkeeping ---
+
+    def start_run(self, fingerprint):
+        """Register a new run; returns its id."""
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self._execute("INSERT INTO runs VALUES (?, ?, ?)", [(run_id, time.time(), fingerprint)])
+        return run_id
+
+    def latest_run(self):
+        """``(run_id, fingerprint)`` of the most recent run, or None."""
+        rows = self._query("SELECT run_id, fingerprint FROM runs ORDER BY started DESC LIMIT 1")
+        return rows[0] if rows else None
+
+    def _mark(self, run_id, file_path, status):
+        self._execute("INSERT OR REPLACE INTO run_files VALUES (?, ?, ?)", [(run_id, file_path, status)])
+
+    def start_file(self, run_id, file_path):
+        """Note that a file of the run started; returns the graph config of its thread."""
+        self._mark(run_id, file_path, STARTED)
+        return thread_config(run_id, file_path)
+
+    def finish_file(self, run_id, file_path):
+        """Note that a file of the run is done and drop its checkpoints, which nothing will resume."""
+        self._mark(run_id, file_path, FINISHED)
+        self.delete_thread(thread_config(run_id, file_path)["configurable"]["thread_id"])
+
+    def is_finished(self, run_id, file_path):
+        rows = self._query("SELECT status FROM run_files WHERE run_id = ? AND file_path = ?", (run_id, file_path))
+        return bool(rows) and rows[0][0] == FINISHED
@@ -1,34 +1,14 @@
 import json
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from langchain_core.tools import tool
-import os
-from dotenv import load_dotenv
+from llm_client import call_llm, acall_llm
+import metrics
+import structured_output
+from static_analyzer import analyze_source
 
-load_dotenv()
-llm = ChatOpenAI(api_key=os.getenv("OPENAI_API_KEY"), model="gpt-4", temperature=0.1)
+LLM_NODE = "code_analyzer"
 
-@tool
-def read_source_file(file_path: str) -> str:
-    """Read the full content of a specified source code file."""
-    print(f"Reading file: {file_path}")
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except FileNotFoundError:
-        return f"Error: The file at path '{file_path}' was not found."
-    except UnicodeDecodeError:
-        return f"Error: Could not decode file at path '{file_path}'. File may be binary."
-
-def code_analyser_node(state):
-    """Agent that reads and analyzes the source code using LLM."""
-    print("🔍 Agent: Code Analyzer")
-    
-    source_code = read_source_file.invoke({"file_path": state["file_path"]})
-    if source_code.startswith("Error:"):
-        return {**state, "source_code": source_code, "code_map": {}}
-
-    system_prompt = """You are a Python code analyzer. Analyze the given source code and extract:
+SYSTEM_PROMPT = """You are a Python code analyzer. Analyze the given source code and extract:
 1. All functions (including class methods and static methods) with their signatures
 2. All classes and their methods  
 3. Key imports and dependencies
@@ -56,37 +36,132 @@ Return ONLY a valid JSON object with this structure:
     "overall_complexity": "simple|medium|complex"
 }"""
 
-    messages = [
-        SystemMessage(content=system_prompt),
+ENRICH_PROMPT = """You are a Python code analyzer. For each listed function, write a one-sentence description of what it does.
+
+Return ONLY a valid JSON object mapping each function name to its description:
+{
+    "function_name or ClassName.method_name": "brief description of what it does"
+}"""
+
+@tool
+def read_source_file(file_path: str) -> str:
+    """Read the full content of a specified source code file."""
+    print(f"Reading file: {file_path}")
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return f"Error: The file at path '{file_path}' was not found."
+    except UnicodeDecodeError:
+        return f"Error: Could not decode file at path '{file_path}'. File may be binary."
+
+def build_messages(source_code):
+    """Builds the analysis prompt for a source file"""
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
         HumanMessage(content=f"Analyze this Python code:\n\n```python\n{source_code}\n```")
     ]
 
-    try: 
-        response = llm.invoke(messages)
-        response_text = response.content.strip()
-
-        # Extract JSON from response
-        if "```json" in response_text:
-            json_start = response_text.find("```json") + 7
-            json_end = response_text.find("```", json_start)
-            json_text = response_text[json_start:json_end].strip()
-        elif "```" in response_text:
-            json_start = response_text.find("```") + 3
-            json_end = response_text.find("```", json_start)
-            json_text = response_text[json_start:json_end].strip()
-        else:
-            json_text = response_text
-        
-        code_map = json.loads(json_text)
-        print(f"Found {len(code_map.get('functions', []))} functions and {len(code_map.get('classes', []))} classes")
-        
-    except (json.JSONDecodeError, Exception) as e:
-        print(f"Error parsing LLM response: {e}")
-        code_map = {
-            "functions": [],
-            "classes": [],
-            "imports": [],
-            "overall_complexity": "unknown"
-        }
+def parse_code_map(response_text):
+    """Extracts the code map JSON from the LLM response"""
+    with metrics.parse_guard():
+        code_map = structured_output.parse_code_map(response_text)
+    print(f"Found {len(code_map.get('functions', []))} functions and {len(code_map.get('classes', []))} classes")
+    return code_map
+
+def empty_code_map():
+    """Code map used when analysis fails"""
+    return {
+        "functions": [],
+        "classes": [],
+        "imports": [],
+        "overall_complexity": "unknown"
+    }
+
+def static_code_map(source_code):
+    """Analyzes the source with the ast module, or returns None if it does not parse"""
+    try:
+        code_map = analyze_source(source_code)
+    except SyntaxError as e:
+        print(f"Static analysis failed ({e}), falling back to LLM analysis")
+        return None
+    print(f"Found {len(code_map['functions'])} functions and {len(code_map['classes'])} classes")
+    return code_map
+
+def build_enrich_messages(source_code, code_map):
+    """Builds the prompt asking for descriptions of undocumented functions, or None"""
+    undocumented = [f["name"] for f in code_map["functions"] if not f.get("description")]
+    if not undocumented:
+        return None
+    return [
+        SystemMessage(content=ENRICH_PROMPT),
+        HumanMessage(content=f"Functions: {json.dumps(undocumented)}\n\n```python\n{source_code}\n```")
+    ]
+
+def apply_descriptions(code_map, response_text):
+    """Merges LLM-written descriptions into functions that have none"""
+    with metrics.parse_guard():
+        descriptions = structured_output.parse_descriptions(response_text)
+    for function in code_map["functions"]:
+        if not function.get("description") and descriptions.get(function["name"]):
+            function["description"] = descriptions[function["name"]]
+    return code_map
+
+def code_analyser_node(state, enrich_descriptions=False):
+    """Agent that reads and analyzes the source code.
+
+    The code map comes from static analysis; the LLM is only used when the
+    source does not parse, or to describe undocumented functions when
+    ``enrich_descriptions`` is set.
+    """
+    print("🔍 Agent: Code Analyzer")
     
-    return {**state, "source_code": source_code, "code_map": code_map}
\ No newline at end of file
+    source_code = read_source_file.invoke({"file_path": state["file_path"]})
+    if source_code.startswith("Error:"):
+        return {"source_code": source_code, "code_map": {}}
+
+    code_map = static_code_map(source_code)
+    if code_map is None:
+        try: 
+            response = call_llm(LLM_NODE, build_messages(source_code), schema="code_map")
+            code_map = parse_code_map(response.content)
+        except (json.JSONDecodeError, Exception) as e:
+            print(f"Error parsing LLM response: {e}")
+            code_map = empty_code_map()
+    elif enrich_descriptions:
+        messages = build_enrich_messages(source_code, code_map)
+        if messages:
+            try:
+                response = call_llm(LLM_NODE, messages, schema="descriptions")
+                apply_descriptions(code_map, response.content)
+            except (json.JSONDecodeError, Exception) as e:
+                print(f"Error enriching descriptions: {e}")
+    
+    return {"source_code": source_code, "code_map": code_map}
+
+async def acode_analyser_node(state, enrich_descriptions=False):
+    """Async variant of code_analyser_node."""
+    print("🔍 Agent: Code Analyzer")
+
+    source_code = read_source_file.invoke({"file_path": state["file_path"]})
+    if source_code.startswith("Error:"):
+        return {"source_code": source_code, "code_map": {}}
+
+    code_map = static_code_map(source_code)
+    if code_map is None:
+        try:
+            response = await acall_llm(LLM_NODE, build_messages(source_code), schema="code_map")
+            code_map = parse_code_map(response.content)
+        except (json.JSONDecodeError, Exception) as e:
+            print(f"Error parsing LLM response: {e}")
+            code_map = empty_code_map()
+    elif enrich_descriptions:
+        messages = build_enrich_messages(source_code, code_map)
+        if messages:
+            try:
+                response = await acall_llm(LLM_NODE, messages, schema="descriptions")
+                apply_descriptions(code_map, response.content)
+            except (json.JSONDecodeError, Exception) as e:
+                print(f"Error enriching descriptions: {e}")
+
+    return {"source_code": source_code, "code_map": code_map}
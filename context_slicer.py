@@ -0,0 +1,192 @@
+"""Function-scoped source slices for LLM prompts.
+
+Instead of sending the first N characters of a file, a slice contains just
+what is needed to understand one function: the imports and module-level
+names it references, stubs of referenced module functions and classes, the
+header of its enclosing class and the function's own source.
+"""
+import ast
+from static_analyzer import iter_functions
+
+
+def _referenced_names(node):
+    """Bare names read inside a node, and attributes accessed on self/cls."""
+    names, self_attributes = set(), set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            names.add(child.id)
+        elif (isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name)
+              and child.value.id in ("self", "cls")):
+            self_attributes.add(child.attr)
+    return names, self_attributes
+
+
+def _used_names(code):
+    """Bare names read anywhere in a piece of code (empty if it does not parse)."""
+    try:
+        return _referenced_names(ast.parse(code))[0]
+    except SyntaxError:
+        return set()
+
+
+def _bound_names(node):
+    """Names a module-level statement binds."""
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return {(alias.asname or alias.name).split(".")[0] for alias in node.names}
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return {node.name}
+    if isinstance(node, ast.Assign):
+        return {n.id for target in node.targets for n in ast.walk(target) if isinstance(n, ast.Name)}
+    if isinstance(node, (ast.AnnAssign, ast.AugAssign)) and isinstance(node.target, ast.Name):
+        return {node.target.id}
+    return set()
+
+
+def _start(node):
+    return min([d.lineno for d in getattr(node, "decorator_list", [])] + [node.lineno])
+
+
+def _segment(lines, node):
+    """Original source lines of a node including its decorators."""
+    return lines[_start(node) - 1:node.end_lineno]
+
+
+def _signature(lines, node):
+    """Decorators and ``def``/``class`` lines of a node, without its body."""
+    first_body = node.body[0]
+    signature = lines[_start(node) - 1:first_body.lineno - 1]
+    prefix = lines[first_body.lineno - 1][:first_body.col_offset]
+    if prefix.strip():
+        # The body starts on the same line as the end of the signature
+        signature.append(prefix.rstrip())
+    return signature
+
+
+def _body_indent(lines, node):
+    prefix = lines[node.body[0].lineno - 1][:node.body[0].col_offset]
+    if prefix.strip():
+        return " " * (node.col_offset + 4)
+    return prefix
+
+
+def _header(lines, node):
+    """Decorators, signature and docstring of a function or class."""
+    first_body = node.body[0]
+    has_docstring = (isinstance(first_body, ast.Expr) and isinstance(first_body.value, ast.Constant)
+                     and isinstance(first_body.value.value, str))
+    if not has_docstring:
+        return _signature(lines, node)
+    return lines[_start(node) - 1:first_body.end_lineno]
+
+
+def _stub(lines, node):
+    """Header of a function or class with the body elided."""
+    body_indent = _body_indent(lines, node)
+    stub = _header(lines, node)
+    if isinstance(node, ast.ClassDef):
+        for child in node.body:
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                stub.extend(_signature(lines, child))
+                stub.append(f"{body_indent}    ...")
+        if len(stub) == len(_header(lines, node)):
+            stub.append(f"{body_indent}...")
+    else:
+        stub.append(f"{body_indent}...")
+    return stub
+
+
+def _find_function(tree, function_name):
+    """Locate a function by qualified name, falling back to a unique suffix match."""
+    functions = list(iter_functions(tree))
+    for name, node in functions:
+        if name == function_name:
+            return name, node
+    matches = [(name, node) for name, node in functions if name.split(".")[-1] == function_name.split(".")[-1]]
+    return matches[0] if len(matches) == 1 else (None, None)
+
+
+def _enclosing_class(tree, qualified_name):
+    parts = qualified_name.split(".")[:-1]
+    body, node = tree.body, None
+    for part in parts:
+        node = next((n for n in body if isinstance(n, ast.ClassDef) and n.name == part), None)
+        if node is None:
+            return None
+        body = node.body
+    return node
+
+
+def slice_function(source_code, function_name):
+    """Source slice needed to test ``function_name``, or None if it cannot be found."""
+    try:
+        tree = ast.parse(source_code)
+    except SyntaxError:
+        return None
+    qualified_name, target = _find_function(tree, function_name)
+    if target is None:
+        return None
+
+    lines = source_code.splitlines()
+    names, self_attributes = _referenced_names(target)
+    enclosing = _enclosing_class(tree, qualified_name)
+    if enclosing is not None:
+        for base in enclosing.bases:
+            names |= _referenced_names(base)[0]
+
+    # Pull in module-level statements binding referenced names, one level deep
+    imports, definitions = [], []
+    for node in tree.body:
+        if node is enclosing or not (_bound_names(node) & names):
+            continue
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.extend(_segment(lines, node))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            definitions.extend(_stub(lines, node) + [""])
+        else:
+            definitions.extend(_segment(lines, node))
+
+    parts = []
+    if imports:
+        parts.append("\n".join(imports))
+    if definitions:
+        parts.append("\n".join(definitions).rstrip())
+
+    if enclosing is not None:
+        class_lines = _header(lines, enclosing)
+        for child in enclosing.body:
+            if child is target:
+                continue
+            if isinstance(child, (ast.Assign, ast.AnnAssign)):
+                class_lines.extend(_segment(lines, child))
+            elif (isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+                  and (child.name in self_attributes or child.name == "__init__")):
+                class_lines.extend(_segment(lines, child) if child.name == "__init__" else _stub(lines, child))
+        class_lines.append("")
+        class_lines.extend(_segment(lines, target))
+        parts.append("\n".join(class_lines))
+    else:
+        parts.append("\n".join(_segment(lines, target)))
+
+    return "\n\n".join(parts)
+
+
+def attach_context(scenarios, source_code, dependencies=None):
+    """Store each scenario's function slice under its ``context`` key.
+
+    ``dependencies`` maps names imported from other analysed modules to
+    summaries of them (see ``import_graph``). The summaries of the names a
+    slice uses are stored under the scenario's ``dependencies`` key.
+    """
+    slices = {}
+    for scenario in scenarios:
+        function_name = scenario.get("function", "")
+        if function_name not in slices:
+            slices[function_name] = slice_function(source_code, function_name) if source_code else None
+        if slices[function_name]:
+            scenario["context"] = slices[function_name]
+        if dependencies:
+            used = _used_names(slices[function_name] or source_code or "")
+            summaries = [summary for name, summary in dependencies.items() if name in used]
+            if summaries:
+                scenario["dependencies"] = "\n".join(summaries)
+    return scenarios
@@ -0,0 +1,138 @@
+"""Coverage of the existing tests, used to generate tests only for uncovered code.
+
+``measure`` runs the repository's test suite (and any tests generated so
+far) once under ``pytest-cov`` with branch coverage, in a subprocess, and
+loads the JSON report. ``CoverageReport.gaps`` maps a source file's missing
+lines and branches back to the functions of its code map that contain
+them. Only those functions are then given to the function path agent and
+the test strategist, with the uncovered lines quoted so the plan targets
+them. Files whose functions are fully covered are not processed at all.
+
+Uncovered code outside any function (module-level statements) cannot be
+reached by a function's tests and is not targeted.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from static_analyzer import analyze_source
+
+# Seconds the whole test suite may take under coverage
+DEFAULT_TIMEOUT = 600.0
+
+
+def _coverage_env(repo_path):
+    """The caller's environment, with the repository and its package root importable."""
+    env = dict(os.environ)
+    repo_dir = os.path.abspath(repo_path)
+    package_root = repo_dir
+    while os.path.exists(os.path.join(package_root, "__init__.py")):
+        package_root = os.path.dirname(package_root)
+    paths = [repo_dir, package_root, os.getcwd()]
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(dict.fromkeys(paths))
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def measure(repo_path, test_paths, ignore=(), timeout=DEFAULT_TIMEOUT):
+    """Run the tests in ``test_paths`` under branch coverage of ``repo_path``; returns a CoverageReport.
+
+    ``ignore`` lists test files to leave out, such as generated modules
+    that are about to be rewritten. Failing tests and modules that cannot
+    be imported do not stop the run; they just cover nothing. Returns an
+    empty report when the suite could not be run at all.
+    """
+    with tempfile.TemporaryDirectory(prefix="testgen-coverage-") as tmp:
+        report_path = os.path.join(tmp, "coverage.json")
+        command = [sys.executable, "-m", "pytest", "-q", "--no-header", "-p", "no:cacheprovider",
+                   "-p", "pytest_cov", f"--cov={repo_path}", "--cov-branch", f"--cov-report=json:{report_path}",
+                   "--import-mode=importlib", "--continue-on-collection-errors",
+                   *(f"--ignore={path}" for path in ignore), *test_paths]
+        env = _coverage_env(repo_path)
+        env["COVERAGE_FILE"] = os.path.join(tmp, ".coverage")  # Keep the data file out of the working directory
+        try:
+            subprocess.run(command, env=env, capture_output=True, text=True, timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"Could not measure coverage: {e}")
+            return CoverageReport({})
+        try:
+            with open(report_path, "r", encoding="utf-8") as f:
+                return CoverageReport(json.load(f))
+        except (OSError, ValueError):
+            print("Could not measure coverage: pytest-cov wrote no report")
+            return CoverageReport({})
+
+
+def _innermost(functions, line):
+    """Name of the innermost function whose body contains ``line``, or None."""
+    best = None
+    for function in functions:
+        start, end = function.get("lineno"), function.get("end_lineno")
+        if start is None or end is None or not start < line <= end:
+            continue
+        if best is None or start > best["lineno"]:
+            best = function
+    return best["name"] if best else None
+
+
+class CoverageReport:
+    """Per-file line and branch coverage from a ``pytest-cov`` JSON report."""
+
+    def __init__(self, data):
+        self.files = {os.path.abspath(path): entry for path, entry in data.get("files", {}).items()}
+
+    def __bool__(self):
+        return bool(self.files)
+
+    def entry(self, file_path):
+        return self.files.get(os.path.abspath(file_path))
+
+    def percent(self, source_files):
+        """Line and branch coverage of ``source_files`` together, in percent (0 for an empty report)."""
+        if not self.files:
+            return 0.0
+        covered = total = 0
+        for file_path in source_files:
+            summary = (self.entry(file_path) or {}).get("summary", {})
+            covered += summary.get("covered_lines", 0) + summary.get("covered_branches", 0)
+            total += summary.get("num_statements", 0) + summary.get("num_branches", 0)
+        return 100.0 * covered / total if total else 100.0
+
+    def gaps(self, file_path):
+        """``{function name: {"lines": [...], "branches": [...]}}`` of a file's uncovered code.
+
+        Lines and branches are quoted from the source as ``"12: text"`` and
+        ``"12->14: text"`` (``exit`` for a branch out of the function).
+        Returns None when the file is not in the report or cannot be
+        parsed, meaning nothing is known and every function is a target.
+        """
+        entry = self.entry(file_path)
+        if entry is None:
+            return None
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                source_code = f.read()
+            functions = analyze_source(source_code).get("functions", [])
+        except (OSError, UnicodeDecodeError, SyntaxError):
+            return None
+        source_lines = source_code.splitlines()
+
+        def quote(line):
+            return source_lines[line - 1].strip() if 0 < line <= len(source_lines) else ""
+
+        gaps = {}
+        for line in entry.get("missing_lines", []):
+            name = _innermost(functions, line)
+            if name:
+                gaps.setdefault(name, {"lines": [], "branches": []})["lines"].append(f"{line}: {quote(line)}")
+        for start, end in entry.get("missing_branches", []):
+            name = _innermost(functions, start)
+            if name:
+                target = end if end > 0 else "exit"
+                gaps.setdefault(name, {"lines": [], "branches": []})["branches"].append(
+                    f"{start}->{target}: {quote(start)}")
+        return gaps
@@ -0,0 +1,186 @@
+"""Discovery of the source files to generate tests for.
+
+The repository is walked with ``os.scandir``, and ignored directories are
+pruned before they are entered, so ``node_modules``, virtualenvs and build
+trees cost one directory entry each instead of a walk through everything
+beneath them. Files are yielded as they are found, in a stable
+(name-sorted) order.
+
+A file is a source file when its path matches one of the ``include``
+globs and none of the ``exclude`` globs, and it is not ignored by a
+``.gitignore``. Globs follow ``.gitignore`` syntax: a pattern without a
+slash matches a name at any depth (``test_*.py``), one with a slash is
+anchored to the repository (``app/legacy/``), ``**`` spans directories and
+a trailing slash matches only directories. The ``.gitignore`` files of the
+repository, of every directory walked, and of its parents up to the
+enclosing git work tree all apply, with the usual precedence: deeper
+files and later lines win, and ``!pattern`` re-includes.
+
+The ``exclude`` globs use the same last-match-wins rule, so a
+``!pattern`` after ``DEFAULT_EXCLUDE`` brings back something the defaults
+skip. The defaults only skip ``build/`` and ``dist/`` at the top of the
+repository; a package of that name deeper down is scanned.
+"""
+import os
+import re
+
+DEFAULT_INCLUDE = ("*.py",)
+
+# Test modules, package markers and trees that never hold code to test.
+# Build output is anchored to the root so packages named build/ or dist/ stay
+DEFAULT_EXCLUDE = (
+    "test_*.py", "*_test.py", "conftest.py", "__init__.py",
+    ".git/", ".hg/", ".svn/", "__pycache__/", "node_modules/", ".venv/", "venv/", ".tox/", ".nox/",
+    ".mypy_cache/", ".pytest_cache/", ".ruff_cache/", ".eggs/", "*.egg-info/", "site-packages/",
+    "/build/", "/dist/",
+)
+
+GITIGNORE_NAME = ".gitignore"
+
+
+def _translate(pattern):
+    """Regular expression for the body of a ``.gitignore`` pattern, relative to its directory."""
+    parts, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            parts.append("[" + ("^" + body[1:] if body[:1] == "!" else body).replace("\\", "\\\\") + "]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(parts)
+
+
+class Pattern:
+    """One ``.gitignore``-style pattern, anchored at ``base`` (a directory path, '' for the walk root)."""
+
+    def __init__(self, line, base=""):
+        self.negated = line.startswith("!")
+        if self.negated or line.startswith("\\"):
+            line = line[1:]
+        self.dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        self.base = base
+        body = _translate(line.lstrip("/"))
+        self.regex = re.compile(body if anchored else f"(?:.*/)?{body}", re.DOTALL)
+
+    def matches(self, path, is_dir):
+        """Whether ``path`` ('/'-separated, relative to the walk root) matches."""
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not path.startswith(self.base + "/"):
+                return False
+            path = path[len(self.base) + 1:]
+        return self.regex.fullmatch(path) is not None
+
+
+def parse_patterns(lines, base=""):
+    """Patterns from ``.gitignore``-style lines; blank lines and comments are skipped."""
+    patterns = []
+    for line in lines:
+        line = line.rstrip("\n").rstrip()
+        if line and not line.startswith("#"):
+            patterns.append(Pattern(line, base))
+    return patterns
+
+
+def _read_patterns(path, base):
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return parse_patterns(f, base)
+    except OSError:
+        return []
+
+
+def ignored(patterns, path, is_dir):
+    """Whether the last pattern matching ``path`` ignores it (rather than re-including it)."""
+    for pattern in reversed(patterns):
+        if pattern.matches(path, is_dir):
+            return not pattern.negated
+    return False
+
+
+def _parent_gitignores(root):
+    """Patterns of the ``.gitignore`` files above ``root`` in its git work tree, anchored to ``root``."""
+    root = os.path.abspath(root)
+    directory, chain = root, []
+    while True:
+        chain.append(directory)
+        if os.path.exists(os.path.join(directory, ".git")):
+            break
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return []  # Not in a git work tree
+        directory = parent
+    patterns = []
+    for directory in reversed(chain[1:]):
+        relative = os.path.relpath(root, directory).replace(os.sep, "/")
+        for pattern in _read_patterns(os.path.join(directory, GITIGNORE_NAME), ""):
+            # Re-anchor to root: only patterns that can match below it matter
+            patterns.append(_Reanchored(pattern, relative))
+    return patterns
+
+
+class _Reanchored:
+    """A parent directory's pattern, applied to paths relative to the walk root."""
+
+    def __init__(self, pattern, prefix):
+        self.pattern = pattern
+        self.prefix = prefix
+        self.negated = pattern.negated
+
+    def matches(self, path, is_dir):
+        return self.pattern.matches(f"{self.prefix}/{path}", is_dir)
+
+
+def iter_source_files(root, include=DEFAULT_INCLUDE, exclude=DEFAULT_EXCLUDE, use_gitignore=True):
+    """Yield the source files under ``root`` as they are found, as ``os.path.join(root, ...)`` paths."""
+    includes = parse_patterns(include)
+    excludes = parse_patterns(exclude)
+    gitignores = _parent_gitignores(root) if use_gitignore else []
+    # (directory path, path relative to root, .gitignore patterns in effect)
+    stack = [(root, "", gitignores)]
+    while stack:
+        directory, relative, patterns = stack.pop()
+        if use_gitignore:
+            local = _read_patterns(os.path.join(directory, GITIGNORE_NAME), relative)
+            patterns = patterns + local if local else patterns
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirectories = []
+        for entry in entries:
+            path = f"{relative}/{entry.name}" if relative else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if ignored(excludes, path, is_dir) or ignored(patterns, path, is_dir):
+                continue
+            if is_dir:
+                subdirectories.append((entry.path, path, patterns))
+            elif any(pattern.matches(path, False) for pattern in includes):
+                yield entry.path
+        # Reversed so the stack pops them in name order
+        stack.extend(reversed(subdirectories))
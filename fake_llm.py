@@ -0,0 +1,187 @@
+"""Deterministic stand-in for the chat model, for offline runs and benchmarks.
+
+Selected with ``TESTGEN_BACKEND=fake`` (or per node, e.g.
+``TESTGEN_TEST_WRITER_BACKEND=fake``). Responses are looked up in this
+order:
+
+1. A script of ``{"match": "...", "response": "..."}`` rules from the JSON
+   file in ``TESTGEN_FAKE_SCRIPT``; the first rule whose ``match`` occurs in
+   the prompt wins
+2. A replay of an LLM cache directory recorded by a real OpenAI run with
+   the same base URL and no structured output (``TESTGEN_FAKE_REPLAY_DIR``)
+3. A well-formed response synthesised from the prompt
+
+Each call sleeps for ``TESTGEN_FAKE_LATENCY`` seconds plus or minus up to
+``TESTGEN_FAKE_JITTER`` seconds. The jitter is derived from the prompt, so
+reruns take the same time.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+
+def _find_json(text):
+    """First JSON object or array embedded in ``text``, or None."""
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"[\[{]", text):
+        try:
+            return decoder.raw_decode(text, match.start())[0]
+        except ValueError:
+            continue
+    return None
+
+
+def _identifier(name):
+    return re.sub(r"\W+", "_", name).strip("_").lower() or "function"
+
+
+def _code_map(source):
+    functions = [{"name": name, "params": [], "return_type": "unknown", "complexity": "simple",
+                  "description": ""} for name in re.findall(r"^\s*(?:async\s+)?def\s+(\w+)", source, re.M)]
+    return {"functions": functions, "classes": [], "imports": [], "overall_complexity": "simple"}
+
+
+def _execution_paths(functions):
+    return {
+        f["name"]: [
+            {"path_type": "happy_path", "description": f"{f['name']} succeeds",
+             "test_inputs": "valid inputs", "expected_behavior": "returns a result"},
+            {"path_type": "error_case", "description": f"{f['name']} rejects bad input",
+             "test_inputs": "invalid inputs", "expected_behavior": "raises an exception"},
+        ]
+        for f in functions if isinstance(f, dict) and f.get("name")
+    }
+
+
+def _scenarios(execution_paths):
+    scenarios = []
+    for function_name, paths in execution_paths.items():
+        for i, path in enumerate(paths):
+            path_type = path.get("path_type", "happy_path")
+            scenarios.append({
+                "function": function_name,
+                "test_name": f"test_{_identifier(function_name)}_{path_type}_{i}",
+                "description": path.get("description", ""),
+                "priority": "high" if path_type == "happy_path" else "medium",
+                "test_type": "error_handling" if path_type == "error_case" else "unit",
+                "setup_required": "none",
+                "test_inputs": path.get("test_inputs", ""),
+                "expected_output": path.get("expected_behavior", ""),
+            })
+    return scenarios
+
+
+def _test_function(test_name, body="    assert True"):
+    return f'def {_identifier(test_name)}():\n    """Generated offline."""\n{body}\n'
+
+
+def scripted_response(system, human):
+    """A well-formed response for one of the agents' prompts."""
+    system = system.lower()
+    if "write a one-sentence description" in system:
+        names = _find_json(human.split("Functions:", 1)[-1]) or []
+        return json.dumps({name: f"Does what {name} does." for name in names})
+    if "code analyzer" in system:
+        return f"```json\n{json.dumps(_code_map(human))}\n```"
+    if "path analyzer" in system:
+        return json.dumps(_execution_paths(_find_json(human) or []))
+    if "test strategist" in system:
+        context = _find_json(human) or {}
+        return json.dumps(_scenarios(context.get("execution_paths", {})))
+    if "parametrize" in system:
+        match = re.search(r"`([^`]+)` covering", human)
+        ids = re.findall(r'"test_name":\s*"([^"]+)"', human)
+        name = _identifier(match.group(1) if match else "function")
+        return ("```python\nimport pytest\n\n"
+                f"@pytest.mark.parametrize('case', {ids!r})\n"
+                f"def test_{name}(case):\n    \"\"\"Generated offline.\"\"\"\n    assert case\n```")
+    if "test code writer" in system:
+        scenario = _find_json(human) or {}
+        return f"```python\n{_test_function(scenario.get('test_name', 'test_generated'))}```"
+    return "{}"
+
+
+class FakeChatModel:
+    """Chat model double with the ``invoke``/``ainvoke`` surface the agents use."""
+
+    def __init__(self, model_name="fake", temperature=0.0, latency=0.0, jitter=0.0, script=None, replay_dir=None,
+                 replay_scope=None):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.latency = latency
+        self.jitter = jitter
+        self.rules = list(script or [])
+        self.replay = None
+        # Cache scope the recorded real run used (see llm_client.cache_scope)
+        self.replay_scope = replay_scope or {"backend": "openai", "base_url": None, "schema": None}
+        if replay_dir:
+            from llm_cache import LLMCache
+            self.replay = LLMCache(replay_dir)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build from node settings and the ``TESTGEN_FAKE_*`` environment variables."""
+        script = None
+        script_path = os.getenv("TESTGEN_FAKE_SCRIPT")
+        if script_path:
+            with open(script_path, "r", encoding="utf-8") as f:
+                script = json.load(f)
+        return cls(
+            model_name=settings["model"],
+            temperature=settings["temperature"],
+            latency=float(os.getenv("TESTGEN_FAKE_LATENCY", "0")),
+            jitter=float(os.getenv("TESTGEN_FAKE_JITTER", "0")),
+            script=script,
+            replay_dir=os.getenv("TESTGEN_FAKE_REPLAY_DIR"),
+            replay_scope={"backend": "openai", "base_url": settings.get("base_url"), "schema": None},
+        )
+
+    def delay(self, messages):
+        """Simulated latency for a prompt; the same prompt always gets the same delay."""
+        if not self.jitter:
+            return self.latency
+        seed = hashlib.sha256("\n".join(m.content for m in messages).encode("utf-8")).digest()
+        return max(0.0, self.latency + random.Random(seed).uniform(-self.jitter, self.jitter))
+
+    def respond(self, messages):
+        """Response text for a prompt, without any simulated latency."""
+        with self._lock:
+            self.calls += 1
+        prompt = "\n".join(m.content for m in messages)
+        for rule in self.rules:
+            if rule["match"] in prompt:
+                return rule["response"]
+        if self.replay is not None:
+            content = self.replay.get(self.replay.make_key(self, messages, self.replay_scope))
+            if content is not None:
+                return content
+        system = next((m.content for m in messages if m.type == "system"), "")
+        human = messages[-1].content if messages else ""
+        return scripted_response(system, human)
+
+    def _message(self, messages, content):
+        from langchain_core.messages import AIMessage
+
+        # Roughly four characters per token, like the OpenAI tokenizers
+        prompt_tokens = sum(len(m.content) for m in messages) // 4
+        completion_tokens = len(content) // 4
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        })
+
+    def invoke(self, messages, *args, **kwargs):
+        time.sleep(self.delay(messages))
+        return self._message(messages, self.respond(messages))
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        await asyncio.sleep(self.delay(messages))
+        return self._message(messages, self.respond(messages))
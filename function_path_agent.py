@@ -1,21 +1,14 @@
 import json
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
-import os
-from dotenv import load_dotenv
+from llm_client import call_llm, acall_llm
+import metrics
+import structured_output
+from path_analyzer import enumerate_paths
+from context_slicer import slice_function
 
-load_dotenv()
-llm = ChatOpenAI(api_key=os.getenv("OPENAI_API_KEY"), model="gpt-4", temperature=0.1)
+LLM_NODE = "function_path"
 
-def function_path_node(state):
-    """Maps out all possible execution paths using LLM."""
-    print("Agent: Function Path")
-
-    if not state["code_map"] or not state["code_map"].get("functions"):
-        print("No functions found to analyze paths")
-        return {**state, "execution_paths": {}}
-    
-    system_prompt = """You are a test path analyzer. For each function in the code, identify all possible execution paths:
+SYSTEM_PROMPT = """You are a test path analyzer. For each function in the code, identify all possible execution paths:
 1. Happy path (normal successful execution)
 2. Edge cases (boundary conditions, empty inputs, etc.)
 3. Error cases (invalid inputs, exceptions)
@@ -33,35 +26,80 @@ Return ONLY a valid JSON object mapping function names to their execution paths:
     ]
 }"""
 
-    functions_info = json.dumps(state["code_map"]["functions"], indent=2)
-    source_code = state["source_code"][:2000] if state["source_code"] else ""
+def build_messages(state, function_names):
+    """Builds the path analysis prompt for the named functions"""
+    functions = [f for f in state["code_map"]["functions"] if f.get("name") in function_names]
+    functions_info = json.dumps(functions, indent=2)
+    source_code = state["source_code"] or ""
+
+    # Send only the slices of the functions being analyzed when they can be found
+    slices = [slice_function(source_code, name) for name in function_names]
+    if source_code and all(slices):
+        source_code = "\n\n# ---\n\n".join(slices)
+    else:
+        source_code = source_code[:2000]
 
-    messages = [
-        SystemMessage(content=system_prompt),
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
         HumanMessage(content=f"Functions to analyze:\n{functions_info}\n\nSource code snippet:\n```python\n{source_code}\n```")
     ]
 
-    try:
-        response = llm.invoke(messages)
-        response_text = response.content.strip()
-        
-        # Extract JSON from response
-        if "```json" in response_text:
-            json_start = response_text.find("```json") + 7
-            json_end = response_text.find("```", json_start)
-            json_text = response_text[json_start:json_end].strip()
-        elif "```" in response_text:
-            json_start = response_text.find("```") + 3
-            json_end = response_text.find("```", json_start)
-            json_text = response_text[json_start:json_end].strip()
-        else:
-            json_text = response_text
-        
-        execution_paths = json.loads(json_text)
-        print(f"Mapped execution paths for {len(execution_paths)} functions")
-        
-    except (json.JSONDecodeError, Exception) as e:
-        print(f"Error parsing execution paths: {e}")
-        execution_paths = {}
+def parse_execution_paths(response_text):
+    """Extracts the execution paths JSON from the LLM response"""
+    with metrics.parse_guard():
+        execution_paths = structured_output.parse_execution_paths(response_text)
+    print(f"Mapped execution paths for {len(execution_paths)} functions")
+    return execution_paths
+
+def target_functions(state):
+    """The code map's functions, narrowed to those with uncovered code in coverage-guided runs"""
+    functions = state["code_map"].get("functions", [])
+    gaps = state.get("coverage_gaps")
+    return [f for f in functions if f.get("name") in gaps] if gaps else functions
+
+def static_execution_paths(state):
+    """Enumerates paths statically; returns them with the functions left for the LLM"""
+    function_names = [f.get("name") for f in target_functions(state)]
+    execution_paths, uncharacterized = enumerate_paths(state["source_code"] or "", function_names)
+    print(f"Statically mapped execution paths for {len(execution_paths)} functions")
+    return execution_paths, uncharacterized
+
+def function_path_node(state):
+    """Maps out all possible execution paths.
+
+    Paths come from a static control-flow pass; the LLM is only consulted for
+    functions the static pass cannot characterize.
+    """
+    print("Agent: Function Path")
+
+    if not state["code_map"] or not target_functions(state):
+        print("No functions found to analyze paths")
+        return {"execution_paths": {}}
+
+    execution_paths, uncharacterized = static_execution_paths(state)
+    if uncharacterized:
+        try:
+            response = call_llm(LLM_NODE, build_messages(state, uncharacterized), schema="execution_paths")
+            execution_paths.update(parse_execution_paths(response.content))
+        except (json.JSONDecodeError, Exception) as e:
+            print(f"Error parsing execution paths: {e}")
     
-    return {**state, "execution_paths": execution_paths}
\ No newline at end of file
+    return {"execution_paths": execution_paths}
+
+async def afunction_path_node(state):
+    """Async variant of function_path_node."""
+    print("Agent: Function Path")
+
+    if not state["code_map"] or not target_functions(state):
+        print("No functions found to analyze paths")
+        return {"execution_paths": {}}
+
+    execution_paths, uncharacterized = static_execution_paths(state)
+    if uncharacterized:
+        try:
+            response = await acall_llm(LLM_NODE, build_messages(state, uncharacterized), schema="execution_paths")
+            execution_paths.update(parse_execution_paths(response.content))
+        except (json.JSONDecodeError, Exception) as e:
+            print(f"Error parsing execution paths: {e}")
+
+    return {"execution_paths": execution_paths}
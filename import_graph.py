@@ -0,0 +1,175 @@
+"""Import dependencies between the source files of one run.
+
+Files are processed dependencies first, so by the time a module is
+processed, the code maps of the modules it imports are known. The symbols
+it imports from them are summarised in a few lines each and given to the
+writer, which then sees what ``Calculator.divide`` takes and returns
+instead of guessing. Each module is analysed at most once per run: code
+maps from processed files are reused, and the ones of files skipped this
+run come from a static analysis that is done once.
+
+A file may be importable under several names (``app.calculator`` from the
+repository's parent, or ``calculator`` from inside it); all of them are
+resolved. Import cycles are broken in discovery order.
+"""
+import ast
+import os
+
+from static_analyzer import analyze_source
+
+# Longest description kept per symbol in a dependency summary
+DESCRIPTION_CHARS = 80
+
+
+def module_names(file_path, repo_path):
+    """Dotted names ``file_path`` can be imported as, most qualified first."""
+    root = os.path.dirname(os.path.abspath(repo_path))
+    relative = os.path.relpath(os.path.abspath(file_path), root)
+    parts = os.path.splitext(relative)[0].split(os.sep)
+    return [".".join(parts[i:]) for i in range(len(parts))]
+
+
+def imported_modules(source_code, module_name):
+    """``{module: {bound name: imported name or None}}`` for a module's imports.
+
+    A value of None means the whole module is bound (``import x``).
+    Relative imports are resolved against ``module_name``.
+    """
+    try:
+        tree = ast.parse(source_code)
+    except SyntaxError:
+        return {}
+    package = module_name.split(".")[:-1]
+    imports = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                bound = alias.asname or alias.name.split(".")[0]
+                imports.setdefault(alias.name, {})[bound] = None
+        elif isinstance(node, ast.ImportFrom):
+            base = package[:len(package) - node.level + 1] if node.level else []
+            module = ".".join(base + ([node.module] if node.module else []))
+            for alias in node.names:
+                if alias.name == "*":
+                    continue
+                bound = alias.asname or alias.name
+                imports.setdefault(module, {})[bound] = alias.name
+                # ``from package import module`` imports a module, not a symbol
+                imports.setdefault(f"{module}.{alias.name}" if module else alias.name, {})[bound] = None
+    return imports
+
+
+def _read(file_path):
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return ""
+
+
+def _short(text):
+    text = (text or "").strip().splitlines()[0] if (text or "").strip() else ""
+    return text if len(text) <= DESCRIPTION_CHARS else text[:DESCRIPTION_CHARS - 3] + "..."
+
+
+def _signature(function):
+    name = function["name"]
+    line = f"{name}({', '.join(function.get('params', []))}) -> {function.get('return_type', 'unknown')}"
+    description = _short(function.get("description"))
+    return f"{line}: {description}" if description else line
+
+
+def summarize(code_map, module, symbol=None):
+    """Compact lines describing ``symbol`` (or the whole module) from a code map."""
+    lines = []
+    for cls in code_map.get("classes", []):
+        if symbol in (None, cls["name"]):
+            description = _short(cls.get("description"))
+            lines.append(f"class {cls['name']}" + (f": {description}" if description else ""))
+    for function in code_map.get("functions", []):
+        owner = function["name"].split(".")[0]
+        if symbol is None or function["name"] == symbol or owner == symbol:
+            indent = "    " if "." in function["name"] else ""
+            lines.append(indent + _signature(function))
+    if not lines:
+        return None
+    where = f"{symbol} from {module}" if symbol else f"module {module}"
+    return "\n".join([f"# {where}"] + lines)
+
+
+class ImportGraph:
+    """Which discovered files import which, and the code maps known for them."""
+
+    def __init__(self, files, repo_path):
+        self.files = list(files)
+        by_name = {}
+        for file_path in self.files:
+            for name in module_names(file_path, repo_path):
+                by_name.setdefault(name, set()).add(file_path)
+        # Names that several files could be imported as say nothing
+        self._module_files = {name: next(iter(paths)) for name, paths in by_name.items() if len(paths) == 1}
+        self._module_name = {f: module_names(f, repo_path)[0] for f in self.files}
+
+        # file -> {dependency: {bound name: imported name or None}}
+        self.imports = {}
+        for file_path in self.files:
+            dependencies = {}
+            for module, bindings in imported_modules(_read(file_path), self._module_name[file_path]).items():
+                dependency = self._module_files.get(module)
+                if dependency and dependency != file_path:
+                    dependencies.setdefault(dependency, {}).update(bindings)
+            self.imports[file_path] = dependencies
+        self.code_maps = {}
+
+    @property
+    def edge_count(self):
+        return sum(len(dependencies) for dependencies in self.imports.values())
+
+    def dependencies(self, file_path):
+        return list(self.imports.get(file_path, {}))
+
+    def order(self, files=None):
+        """``files`` (default: all) with dependencies first, otherwise in discovery order."""
+        files = self.files if files is None else list(files)
+        position = {f: i for i, f in enumerate(self.files)}
+        done, ordered = set(), []
+
+        def visit(file_path, active):
+            if file_path in done or file_path in active:
+                return  # Already placed, or an import cycle
+            active.add(file_path)
+            for dependency in sorted(self.dependencies(file_path), key=position.get):
+                visit(dependency, active)
+            active.discard(file_path)
+            done.add(file_path)
+            ordered.append(file_path)
+
+        for file_path in self.files:
+            visit(file_path, set())
+        wanted = set(files)
+        return [f for f in ordered if f in wanted]
+
+    def record(self, file_path, code_map):
+        """Remember a processed file's code map for its dependents."""
+        if code_map:
+            self.code_maps[file_path] = code_map
+
+    def code_map(self, file_path):
+        """Code map of a file: from this run if it was processed, otherwise static analysis (once)."""
+        if file_path not in self.code_maps:
+            try:
+                self.code_maps[file_path] = analyze_source(_read(file_path))
+            except SyntaxError:
+                self.code_maps[file_path] = {}
+        return self.code_maps[file_path]
+
+    def context_for(self, file_path):
+        """``{bound name: summary}`` for the symbols a file imports from other discovered files."""
+        context = {}
+        for dependency, bindings in self.imports.get(file_path, {}).items():
+            code_map = self.code_map(dependency)
+            for bound, symbol in bindings.items():
+                summary = summarize(code_map, self._module_name[dependency], symbol)
+                if summary:
+                    context[bound] = summary
+        return context
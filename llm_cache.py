@@ -0,0 +1,232 @@
+"""Persistent on-disk cache for LLM responses shared by all agents.
+
+Responses are content-addressed by backend, endpoint, model, temperature,
+response schema and the exact message list, so rerunning the pipeline on
+unchanged code does not repay for calls it has already made. The cache
+directory is bounded in size; the least recently used entries are evicted
+first, down to ``EVICT_TO`` of the limit.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+
+DEFAULT_CACHE_DIR = ".llm_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Eviction frees space down to this fraction of the limit, so a full cache
+# is not rescanned on every put
+EVICT_TO = 0.9
+
+
+def _message(content):
+    # Imported lazily so that the CLI can start without loading LangChain
+    from langchain_core.messages import AIMessage
+    return AIMessage(content=content, response_metadata={"cache_hit": True})
+
+
+def is_cache_hit(response):
+    """True if ``response`` was served from the cache rather than the model."""
+    return bool(getattr(response, "response_metadata", {}).get("cache_hit"))
+
+
+class LLMCache:
+    """Size-bounded LRU response cache with single-flight deduplication."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._ainflight = {}
+        self._total_bytes = None
+
+    @staticmethod
+    def make_key(llm, messages, scope=None):
+        """Hash the model settings and exact message list into a cache key.
+
+        ``scope`` adds what the model object does not say, such as the
+        backend, endpoint and response schema (see ``llm_client.cache_scope``),
+        so a fake or differently configured model never shares entries
+        with the real one.
+        """
+        payload = {
+            **(scope or {}),
+            "model": getattr(llm, "model_name", None) or getattr(llm, "model", None),
+            "temperature": getattr(llm, "temperature", None),
+            "messages": [[message.type, message.content] for message in messages],
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Return the cached response text for ``key`` or None."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = json.load(f)["content"]
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            # Bump the modification time so eviction sees this entry as recent
+            os.utime(path)
+        except OSError:
+            pass
+        return content
+
+    def put(self, key, content):
+        """Store response text for ``key`` and evict old entries if needed."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"content": content}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += os.path.getsize(path) - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is down to ``EVICT_TO`` of its limit."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def invoke(self, llm, messages, call=None, scope=None):
+        """Cached ``llm.invoke(messages)``.
+
+        Concurrent threads asking for the same key wait for the first caller
+        instead of sending duplicate requests. ``call`` replaces
+        ``llm.invoke`` for cache misses, e.g. to add retries. ``scope`` is
+        passed on to ``make_key``.
+        """
+        call = call or llm.invoke
+        if not self.enabled:
+            return call(messages)
+
+        key = self.make_key(llm, messages, scope)
+        while True:
+            content = self.get(key)
+            if content is not None:
+                with self._lock:
+                    self.hits += 1
+                return _message(content)
+
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    self._inflight[key] = threading.Event()
+                    self.misses += 1
+                    break
+                self.deduplicated += 1
+            event.wait()
+            # Loop to read the leader's result; if it failed, we become the leader
+
+        try:
+            response = call(messages)
+            self.put(key, response.content)
+            return response
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    async def ainvoke(self, llm, messages, call=None, scope=None):
+        """Async variant of ``invoke`` with the same deduplication."""
+        call = call or llm.ainvoke
+        if not self.enabled:
+            return await call(messages)
+
+        key = self.make_key(llm, messages, scope)
+        while True:
+            content = self.get(key)
+            if content is not None:
+                self.hits += 1
+                return _message(content)
+
+            future = self._ainflight.get(key)
+            if future is None:
+                future = asyncio.get_running_loop().create_future()
+                self._ainflight[key] = future
+                self.misses += 1
+                break
+            self.deduplicated += 1
+            await asyncio.shield(future)
+
+        try:
+            response = await call(messages)
+            self.put(key, response.content)
+            return response
+        finally:
+            self._ainflight.pop(key)
+            future.set_result(None)
+
+    def report(self):
+        """One-line hit/miss summary for the end of a run."""
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return (f"LLM cache: {self.hits} hits, {self.misses} misses "
+                f"({rate:.1f}% hit rate), {self.deduplicated} duplicate requests coalesced")
+
+
+default_cache = LLMCache(
+    cache_dir=os.getenv("TESTGEN_CACHE_DIR", DEFAULT_CACHE_DIR),
+    max_bytes=int(os.getenv("TESTGEN_CACHE_MAX_MB", DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024,
+)
+
+
+def configure_cache(cache_dir=None, max_bytes=None, enabled=None):
+    """Adjust the shared cache before a run starts."""
+    if cache_dir is not None:
+        default_cache.cache_dir = cache_dir
+        default_cache._total_bytes = None
+    if max_bytes is not None:
+        default_cache.max_bytes = max_bytes
+    if enabled is not None:
+        default_cache.enabled = enabled
+
+
+def cached_invoke(llm, messages, call=None, scope=None):
+    """``llm.invoke(messages)`` through the shared cache."""
+    return default_cache.invoke(llm, messages, call, scope)
+
+
+async def cached_ainvoke(llm, messages, call=None, scope=None):
+    """``await llm.ainvoke(messages)`` through the shared cache."""
+    return await default_cache.ainvoke(llm, messages, call, scope)
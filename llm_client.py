@@ -0,0 +1,301 @@
+"""Shared registry of LLM clients for all agents, and the single call path to them.
+
+Models are built on first use and reused across nodes, files and threads.
+Every model shares one pooled HTTP client (and one async client) so
+connections stay warm instead of each agent paying its own TLS handshakes.
+
+Settings are resolved per node, lowest precedence first:
+
+1. ``DEFAULTS``
+2. ``TESTGEN_BACKEND``, ``TESTGEN_MODEL``, ``TESTGEN_TEMPERATURE``,
+   ``TESTGEN_TIMEOUT``, ``TESTGEN_MAX_RETRIES`` environment variables
+3. The same variables with the node name, e.g. ``TESTGEN_TEST_WRITER_MODEL``
+4. Values passed to ``configure()``
+
+The ``backend`` setting picks the factory in ``BACKENDS`` that builds the
+model: ``openai`` for ChatOpenAI, ``fake`` for the offline stand-in in
+``fake_llm``. With ``structured_output`` on, JSON-producing calls ask the
+provider to follow the stage's schema from ``structured_output`` (needs a
+model with JSON-schema response formats, e.g. gpt-4o).
+
+Agents call ``call_llm()``/``acall_llm()``, which go through the response
+cache, wait for the shared request scheduler before every request that
+reaches the provider, retry transient failures with exponential backoff,
+record each call in the run metrics and charge it to the run's budget.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from dotenv import load_dotenv
+from llm_cache import cached_ainvoke, cached_invoke, is_cache_hit
+from budget import default_budget
+from metrics import current_scope, default_metrics
+from scheduler import default_scheduler, estimate_tokens
+
+NODES = ("code_analyzer", "function_path", "test_strategist", "test_writer")
+
+DEFAULTS = {"backend": "openai", "model": "gpt-4", "temperature": 0.1, "timeout": 120.0, "max_retries": 2,
+            "structured_output": False, "base_url": None}
+
+# HTTP statuses worth retrying; anything else fails the call immediately
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "TimeoutException"}
+MAX_BACKOFF_SECONDS = 8.0
+
+def _flag(value):
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+_CASTS = {"backend": str, "model": str, "temperature": float, "timeout": float, "max_retries": int,
+          "structured_output": _flag, "base_url": str}
+
+_lock = threading.Lock()
+_overrides = {}
+_models = {}
+_pool = {"max_connections": 20, "max_keepalive_connections": 20, "keepalive_expiry": 30.0}
+_http_client = None
+_http_async_client = None
+
+
+def configure(node=None, **settings):
+    """Override settings for one node, or for every node when ``node`` is None."""
+    unknown = set(settings) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown LLM settings: {', '.join(sorted(unknown))}")
+    with _lock:
+        _overrides.setdefault(node, {}).update({k: v for k, v in settings.items() if v is not None})
+
+
+def configure_pool(max_connections=None, max_keepalive_connections=None, keepalive_expiry=None):
+    """Size the shared HTTP connection pool. Must be called before the first request."""
+    with _lock:
+        if _http_client is not None or _http_async_client is not None:
+            raise RuntimeError("The HTTP pool is already in use")
+        for key, value in (("max_connections", max_connections),
+                           ("max_keepalive_connections", max_keepalive_connections),
+                           ("keepalive_expiry", keepalive_expiry)):
+            if value is not None:
+                _pool[key] = value
+
+
+def node_settings(node):
+    """Resolved model settings for a node."""
+    settings = dict(DEFAULTS)
+    for prefix in ("TESTGEN_", f"TESTGEN_{node.upper()}_"):
+        for key, cast in _CASTS.items():
+            value = os.getenv(f"{prefix}{key.upper()}")
+            if value:
+                settings[key] = cast(value)
+    settings.update(_overrides.get(None, {}))
+    settings.update(_overrides.get(node, {}))
+    return settings
+
+
+def _http_clients():
+    """The shared keep-alive HTTP clients, created on first use."""
+    global _http_client, _http_async_client
+    import httpx
+
+    if _http_client is None:
+        limits = httpx.Limits(**_pool)
+        _http_client = httpx.Client(limits=limits)
+        _http_async_client = httpx.AsyncClient(limits=limits)
+    return _http_client, _http_async_client
+
+
+def _openai_model(settings):
+    load_dotenv()
+    from langchain_openai import ChatOpenAI
+
+    http_client, http_async_client = _http_clients()
+    return ChatOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=settings["base_url"],
+        model=settings["model"],
+        temperature=settings["temperature"],
+        timeout=settings["timeout"],
+        # Retries happen in call_llm() so they can be counted
+        max_retries=0,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+
+def _fake_model(settings):
+    from fake_llm import FakeChatModel
+    return FakeChatModel.from_settings(settings)
+
+
+# Model factories by backend name; each takes the resolved node settings
+BACKENDS = {"openai": _openai_model, "fake": _fake_model}
+
+
+def requires_api_key():
+    """True if any node talks to the OpenAI API."""
+    return any(node_settings(node)["backend"] == "openai" for node in NODES)
+
+
+def get_llm(node):
+    """The chat model for ``node``, built on first use.
+
+    Nodes whose settings are identical share a single model instance.
+    """
+    settings = node_settings(node)
+    if settings["backend"] not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend {settings['backend']!r} (choose from {', '.join(BACKENDS)})")
+    key = tuple(sorted(settings.items()))
+    with _lock:
+        llm = _models.get(key)
+        if llm is None:
+            llm = BACKENDS[settings["backend"]](settings)
+            _models[key] = llm
+    return llm
+
+
+def reset():
+    """Drop cached models and close the shared HTTP clients."""
+    global _http_client, _http_async_client
+    with _lock:
+        _models.clear()
+        if _http_client is not None:
+            _http_client.close()
+        # The async client belongs to the event loop that used it; let it be collected
+        _http_client = _http_async_client = None
+
+
+def is_retryable(error):
+    """True for rate limits, timeouts, connection errors and 5xx responses."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(error):
+    """Seconds the provider asked us to wait in a Retry-After header, or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given retry attempt."""
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, 0.5 * 2 ** attempt))
+
+
+def _usage(response):
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+
+def _record(node, settings, response, seconds, prompt_tokens, completion_tokens, retries):
+    """Record a successful call in the metrics, and charge it to the budget unless it was cached."""
+    cached = is_cache_hit(response)
+    default_metrics.record_llm_call(seconds, prompt_tokens, completion_tokens, cached=cached, retries=retries)
+    if not cached:
+        default_budget.charge(current_scope().get("file"), prompt_tokens, completion_tokens, seconds, settings,
+                              writer=node == "test_writer")
+
+
+def _with_schema(llm, settings, schema):
+    """``llm`` bound to the named response schema, if structured output is on and supported."""
+    if schema is None or not settings["structured_output"] or not hasattr(llm, "bind"):
+        return llm
+    from structured_output import RESPONSE_SCHEMAS
+
+    return llm.bind(response_format={
+        "type": "json_schema",
+        "json_schema": {"name": schema, "schema": RESPONSE_SCHEMAS[schema], "strict": False},
+    })
+
+
+def cache_scope(settings, schema=None):
+    """What decides a reply besides the model, temperature and messages: backend, endpoint and schema."""
+    return {"backend": settings["backend"], "base_url": settings["base_url"],
+            "schema": schema if settings["structured_output"] else None}
+
+
+def call_llm(node, messages, schema=None):
+    """Invoke ``node``'s model on ``messages`` through the cache, with retries and metrics.
+
+    ``schema`` names the reply's schema in ``structured_output.RESPONSE_SCHEMAS``.
+    """
+    llm = get_llm(node)
+    settings = node_settings(node)
+    model = _with_schema(llm, settings, schema)
+    max_retries = settings["max_retries"]
+    retries = 0
+
+    def call(messages):
+        nonlocal retries
+        estimate = estimate_tokens(messages)
+        for attempt in range(max_retries + 1):
+            ticket = default_scheduler.acquire(estimate, kind=node)
+            try:
+                response = model.invoke(messages)
+            except Exception as e:
+                default_scheduler.release(ticket, rate_limited=getattr(e, "status_code", None) == 429,
+                                          retry_after=retry_after(e))
+                if attempt == max_retries or not is_retryable(e):
+                    raise
+                retries += 1
+                time.sleep(backoff_delay(attempt))
+                continue
+            except BaseException:
+                default_scheduler.release(ticket)
+                raise
+            default_scheduler.release(ticket, used_tokens=sum(_usage(response)) or None)
+            return response
+
+    start = time.perf_counter()
+    try:
+        response = cached_invoke(llm, messages, call, cache_scope(settings, schema))
+    except Exception as e:
+        default_metrics.record_llm_call(time.perf_counter() - start, retries=retries, error=str(e))
+        raise
+    prompt_tokens, completion_tokens = _usage(response)
+    _record(node, settings, response, time.perf_counter() - start, prompt_tokens, completion_tokens, retries)
+    return response
+
+
+async def acall_llm(node, messages, schema=None):
+    """Async variant of ``call_llm``."""
+    llm = get_llm(node)
+    settings = node_settings(node)
+    model = _with_schema(llm, settings, schema)
+    max_retries = settings["max_retries"]
+    retries = 0
+
+    async def call(messages):
+        nonlocal retries
+        estimate = estimate_tokens(messages)
+        for attempt in range(max_retries + 1):
+            ticket = await default_scheduler.aacquire(estimate, kind=node)
+            try:
+                response = await model.ainvoke(messages)
+            except Exception as e:
+                default_scheduler.release(ticket, rate_limited=getattr(e, "status_code", None) == 429,
+                                          retry_after=retry_after(e))
+                if attempt == max_retries or not is_retryable(e):
+                    raise
+                retries += 1
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            except BaseException:
+                default_scheduler.release(ticket)
+                raise
+            default_scheduler.release(ticket, used_tokens=sum(_usage(response)) or None)
+            return response
+
+    start = time.perf_counter()
+    try:
+        response = await cached_ainvoke(llm, messages, call, cache_scope(settings, schema))
+    except Exception as e:
+        default_metrics.record_llm_call(time.perf_counter() - start, retries=retries, error=str(e))
+        raise
+    prompt_tokens, completion_tokens = _usage(response)
+    _record(node, settings, response, time.perf_counter() - start, prompt_tokens, completion_tokens, retries)
+    return response
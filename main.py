@@ -1,29 +1,64 @@
-import glob
+import argparse
+import asyncio
 import json
+import operator
 import os
-from typing import List, Dict, Any, TypedDict, Optional
+import re
+import sys
+from functools import partial
+from typing import Annotated, List, Dict, Any, TypedDict, Optional, Tuple
 from dotenv import load_dotenv
 
-# LangChain / LangGraph imports
-from langgraph.graph import END, StateGraph
+# Only lightweight modules are imported here. LangGraph, LangChain and the
+# agents are imported inside build_workflow() so that --help, --dry-run and
+# runs where every file is up to date never pay for them.
+import coverage_guide
+import llm_client
+from budget import BUDGET_REPORT_NAME, default_budget, parse_limits
+from discovery import DEFAULT_EXCLUDE, DEFAULT_INCLUDE, iter_source_files
+from import_graph import ImportGraph
+from llm_cache import configure_cache, default_cache
+from manifest import RunManifest, file_hash, pipeline_fingerprint
+from metrics import default_metrics, instrument
+from output_sink import TestFileSink
+from scheduler import default_scheduler
+from sharding import estimated_work, find_shard_dirs, merge_shards, parse_shard, select_shard, shard_dir
+from validation import VALIDATION_CACHE_NAME, ValidationCache, Validator
 
-# Import agents
-from code_analyzer_agent import code_analyser_node
-from function_path_agent import function_path_node
-from test_strategist_agent import test_strategist_node
-from test_writer_agent import test_writer_node
+# Basename of the JSON/CSV metrics report written to the output directory
+METRICS_NAME = "testgen_metrics"
 
-load_dotenv()
+# Modules whose code or prompts shape the generated tests
+PIPELINE_MODULES = [
+    "code_analyzer_agent.py",
+    "function_path_agent.py",
+    "test_strategist_agent.py",
+    "test_writer_agent.py",
+    "static_analyzer.py",
+    "path_analyzer.py",
+    "context_slicer.py",
+    "import_graph.py",
+    "structured_output.py",
+    "scenario_dedup.py",
+    "output_assembler.py",
+    "test_validator_agent.py",
+    "validation.py",
+    "coverage_guide.py",
+]
 
 # --- State Definition ---
+# Nodes return only the keys they change; new generated_tests are appended by the reducer
 class TestGenerationState(TypedDict):
     file_path: str
     source_code: Optional[str] 
     code_map: Dict[str, Any]
     execution_paths: Dict[str, Any]
     test_scenarios: List[Dict[str, Any]]
-    generated_tests: List[str]
+    generated_tests: Annotated[List[str], operator.add]
     current_scenario_index: int
+    validation_results: List[Dict[str, Any]]
+    dependency_context: Dict[str, str]
+    coverage_gaps: Dict[str, Any]
 
 # --- Conditional Logic ---
 def should_continue_writing(state: TestGenerationState) -> str:
@@ -38,15 +73,73 @@ def should_continue_writing(state: TestGenerationState) -> str:
         return "end"
 
 # --- Graph Construction ---
-def build_workflow():
-    """Build and compile the test generation workflow."""
+def build_workflow(writer_concurrency: int = 1, use_async: bool = False, enrich_descriptions: bool = False,
+                   group_by_function: bool = False, validator: Optional[Validator] = None,
+                   dedupe_scenarios: bool = True, checkpointer=None):
+    """Build and compile the test generation workflow.
+
+    With ``writer_concurrency`` of 1 the test writer loops over scenarios one
+    at a time. Larger values write all scenarios in a single concurrent batch
+    with at most that many LLM requests in flight.
+
+    With ``use_async`` the graph is built from the async node variants and
+    must be run with ``ainvoke``.
+
+    ``enrich_descriptions`` lets the code analyser ask the LLM to describe
+    functions that have no docstring.
+
+    ``group_by_function`` writes one parametrized test per function in a
+    single LLM call instead of one call per scenario.
+
+    ``dedupe_scenarios`` drops near-duplicate scenarios from the
+    strategist's plan before any writer call is made.
+
+    With a ``validator`` the finished tests are run in sandboxed pytest
+    processes before the file is written, and failing ones are flagged or
+    dropped.
+
+    With a ``checkpointer`` (see ``checkpoints``) the graph state is saved
+    after every step, so an interrupted file can be resumed from its last
+    checkpoint by streaming its thread again with no input.
+
+    Every node is instrumented so its runs and LLM calls show up in the
+    end-of-run metrics report.
+    """
+    # LangChain / LangGraph imports
+    from langgraph.graph import END, StateGraph
+
+    # Import agents
+    from code_analyzer_agent import code_analyser_node, acode_analyser_node
+    from function_path_agent import function_path_node, afunction_path_node
+    from test_strategist_agent import test_strategist_node, atest_strategist_node
+    from test_writer_agent import (
+        test_writer_node, test_writer_batch_node, test_writer_grouped_node,
+        atest_writer_node, atest_writer_batch_node, atest_writer_grouped_node
+    )
+    from test_validator_agent import test_validator_node, atest_validator_node
+
     workflow = StateGraph(TestGenerationState)
 
+    if use_async:
+        analyser, path, strategist = acode_analyser_node, afunction_path_node, atest_strategist_node
+        writer, batch_writer, grouped_writer = atest_writer_node, atest_writer_batch_node, atest_writer_grouped_node
+    else:
+        analyser, path, strategist = code_analyser_node, function_path_node, test_strategist_node
+        writer, batch_writer, grouped_writer = test_writer_node, test_writer_batch_node, test_writer_grouped_node
+
+    if group_by_function:
+        writer = partial(grouped_writer, max_in_flight=writer_concurrency)
+    elif writer_concurrency > 1:
+        writer = partial(batch_writer, max_in_flight=writer_concurrency)
+
     # Add nodes (agents)
-    workflow.add_node("code_analyser", code_analyser_node)
-    workflow.add_node("function_path", function_path_node) 
-    workflow.add_node("test_strategist", test_strategist_node)
-    workflow.add_node("test_writer", test_writer_node)
+    workflow.add_node("code_analyser", instrument("code_analyzer", partial(analyser, enrich_descriptions=enrich_descriptions)))
+    workflow.add_node("function_path", instrument("function_path", path))
+    workflow.add_node("test_strategist", instrument("test_strategist", partial(strategist, dedupe=dedupe_scenarios)))
+    workflow.add_node("test_writer", instrument("test_writer", writer))
+    if validator is not None:
+        validate = atest_validator_node if use_async else test_validator_node
+        workflow.add_node("test_validator", instrument("test_validator", partial(validate, validator=validator)))
 
     # Set entry point
     workflow.set_entry_point("code_analyser")
@@ -62,90 +155,550 @@ def build_workflow():
     workflow.add_conditional_edges(
         "test_writer", 
         should_continue_writing,
-        {"continue": "test_writer", "end": END}
+        {"continue": "test_writer", "end": "test_validator" if validator is not None else END}
     )
+    if validator is not None:
+        workflow.add_edge("test_validator", END)
 
     # Compile the workflow
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
-# --- Main Execution Logic ---
-if __name__ == "__main__":
-    # Configuration
-    repo_path = "app"  # Path relative to the script's location
-    output_dir = "generated_tests"
-    
-    # Validate API key
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    if not OPENAI_API_KEY:
-        print("Please set your OpenAI API key!")
-        print("Either set the OPENAI_API_KEY environment variable or update the .env file.")
-        exit(1)
+# --- File Processing ---
+def initial_state(file_path: str, dependency_context: Optional[Dict[str, str]] = None,
+                  coverage_gaps: Optional[Dict[str, Any]] = None) -> TestGenerationState:
+    """Initial graph state for one source file.
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    ``dependency_context`` summarises the symbols the file imports from
+    other project modules (see ``ImportGraph.context_for``).
+    ``coverage_gaps`` limits the tests to the functions with uncovered
+    code (see ``CoverageReport.gaps``); empty means every function.
+    """
+    return {
+        "file_path": file_path,
+        "source_code": None,
+        "code_map": {},
+        "execution_paths": {},
+        "test_scenarios": [],
+        "generated_tests": [],
+        "current_scenario_index": 0,
+        "validation_results": [],
+        "dependency_context": dependency_context or {},
+        "coverage_gaps": coverage_gaps or {}
+    }
 
-    # Find all Python files
-    source_files = glob.glob(f"{repo_path}/**/*.py", recursive=True)
-    
-    # Filter out test files and __pycache__
-    source_files = [f for f in source_files if not f.endswith('test.py') 
-                and 'test_' not in os.path.basename(f)
-                and '__pycache__' not in f
-                and '__init__.py' not in f]  # Skip __init__.py files
+def output_path_for(file_path: str, output_dir: str, round_index: int = 1) -> str:
+    """Path of the generated test file for a source file.
 
-    if not source_files:
-        print(f"No Python files found in {repo_path}. Please check the path.")
-        exit(1)
-    
-    print(f"Found {len(source_files)} Python files to test.\n")
-    
-    # Build the workflow
-    app = build_workflow()
-    
-    # Process each file
+    Coverage-guided rounds after the first add their tests in a module of
+    their own, ``test_<name>_round<N>.py``.
+    """
+    base_name = os.path.basename(file_path).replace('.py', '')
+    suffix = f"_round{round_index}" if round_index > 1 else ""
+    return os.path.join(output_dir, f"test_{base_name}{suffix}.py")
+
+def generated_outputs(file_path: str, output_dir: str) -> List[str]:
+    """The existing test modules generated for a source file, from every coverage round."""
+    base_name = re.escape(os.path.basename(file_path).replace('.py', ''))
+    pattern = re.compile(rf"^test_{base_name}(?:_round\d+)?\.py$")
+    try:
+        names = os.listdir(output_dir)
+    except OSError:
+        return []
+    return sorted(os.path.join(output_dir, name) for name in names if pattern.match(name))
+
+def current_pipeline_fingerprint(**settings: Any) -> str:
+    """Fingerprint of the pipeline code, prompts and per-agent model settings.
+
+    Keyword ``settings`` are pipeline options that change the generated output.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    models = {node: llm_client.node_settings(node) for node in llm_client.NODES}
+    return pipeline_fingerprint(
+        json.dumps(settings, sort_keys=True),
+        *(f"{name}:{file_hash(os.path.join(here, name))}" for name in PIPELINE_MODULES),
+        *(f"{node}:{model['backend']}:{model['model']}:{model['temperature']}:{model['structured_output']}"
+          for node, model in models.items())
+    )
+
+def save_generated_tests(result: Dict[str, Any], file_path: str, output_dir: str) -> Tuple[Optional[str], str]:
+    """Write the generated tests for one file.
+
+    Returns the output path (None when nothing was generated) and a
+    progress message.
+    """
+    sink = TestFileSink(file_path, output_path_for(file_path, output_dir))
+    return finish_file(sink, result)
+
+# Graph stream modes used while processing a file: node updates drive the
+# progress view, custom events carry finished tests, values track the state
+STREAM_MODES = ["updates", "custom", "values"]
+
+def handle_stream_chunk(sink: TestFileSink, mode: str, chunk: Any, report,
+                        stage: str = "writer") -> Optional[Dict[str, Any]]:
+    """Apply one streamed chunk; returns the graph state for ``values`` chunks.
+
+    Only tests from ``stage`` are saved: ``"validated"`` when the validator
+    runs, so the file only gets tests that went through it.
+    """
+    if mode == "values":
+        return chunk
+    if mode == "custom" and "test_index" in chunk and chunk.get("stage", "writer") == stage:
+        written = sink.written
+        sink.add(chunk["test_index"], chunk["test_code"])
+        if sink.written > written:
+            report(f"{sink.written} tests saved to {sink.partial_path}")
+    elif mode == "updates":
+        # The writer's progress is reported per saved test instead
+        for node in chunk:
+            if node != "test_writer":
+                report(f"{node} finished")
+    return None
+
+def finish_file(sink: TestFileSink, result: Dict[str, Any]) -> Tuple[Optional[str], str]:
+    """Commit a file's streamed tests; returns the output path (or None) and a progress message."""
+    output_file_path = sink.commit(result.get("generated_tests") or [])
+    if output_file_path is None:
+        return None, f"No tests generated for {sink.file_path}"
+    return output_file_path, f"Generated {sink.written} tests saved to {output_file_path}"
+
+def resume_point(snapshot, sink: TestFileSink, stage: str = "writer") -> Optional[Dict[str, Any]]:
+    """Graph state checkpointed for an interrupted file, or None if it has none.
+
+    When tests are saved as the writer finishes them, the sink is refilled
+    with those already written, and expects the next scenario's test next.
+    """
+    if not snapshot.values:
+        return None
+    if stage == "writer":
+        sink.restore(snapshot.values.get("generated_tests") or [], snapshot.values.get("current_scenario_index", 0))
+    return snapshot.values
+
+def failure_message(sink: TestFileSink, error: Exception) -> str:
+    partial_path = sink.abort()
+    message = f"Error processing {sink.file_path}: {error}"
+    if partial_path:
+        message += f" ({sink.written} completed tests kept in {partial_path})"
+    return message
+
+def run_serial(app, source_files: List[str], output_dir: str, manifest: RunManifest,
+               stage: str = "writer", graph: Optional[ImportGraph] = None,
+               checkpointer=None, run_id: Optional[str] = None,
+               coverage_gaps: Optional[Dict[str, Dict[str, Any]]] = None, round_index: int = 1) -> None:
+    """Process files one at a time with the sync workflow.
+
+    Tests are written to disk as ``stage`` (the writer, or the validator)
+    finishes them. With an import ``graph``, each file's code map is
+    recorded for the files that import it, which come later in the order.
+    With a ``checkpointer`` each file is a thread of run ``run_id``, and a
+    file interrupted in an earlier process of that run continues from its
+    last checkpoint. ``coverage_gaps`` maps files to the uncovered code
+    their tests should target; files of coverage ``round_index`` 2 and up
+    get additional test modules, which the manifest does not track.
+    """
     for i, file_path in enumerate(source_files, 1):
         print(f"\n{'='*60}")
         print(f"Processing file {i}/{len(source_files)}: {file_path}")
         print(f"{'='*60}")
-        
-        # Initialize state
-        inputs = {
-            "file_path": file_path,
-            "source_code": None,
-            "code_map": {},
-            "execution_paths": {},
-            "test_scenarios": [],
-            "generated_tests": [],
-            "current_scenario_index": 0
-        }
-        
+
+        sink = TestFileSink(file_path, output_path_for(file_path, output_dir, round_index))
+        result: Dict[str, Any] = {}
+        config: Dict[str, Any] = {}
         try:
             # Run the workflow
-            result = app.invoke(inputs)
-            
-            # Save generated tests
-            if result.get("generated_tests"):
-                base_name = os.path.basename(file_path).replace('.py', '')
-                output_file_path = os.path.join(output_dir, f"test_{base_name}.py")
-                
-                with open(output_file_path, 'w', encoding='utf-8') as f:
-                    f.write("# Auto-generated tests using AI-powered multi-agent analysis\n")
-                    f.write(f"# Source file: {file_path}\n")
-                    f.write("# Generated by LangGraph Test Generator\n\n")
-                    f.write("import pytest\n")
-                    f.write("from unittest.mock import Mock, patch\n\n")
-                    
-                    for j, test_code in enumerate(result["generated_tests"], 1):
-                        f.write(f"# Test {j}\n")
-                        f.write(test_code)
-                        f.write("\n\n")
-                
-                print(f"Generated {len(result['generated_tests'])} tests saved to {output_file_path}")
-            else:
-                print(f"No tests generated for {file_path}")
-                
+            state = initial_state(file_path, graph.context_for(file_path) if graph else None,
+                                  (coverage_gaps or {}).get(file_path))
+            if checkpointer:
+                config = checkpointer.start_file(run_id, file_path)
+                checkpointed = resume_point(app.get_state(config), sink, stage)
+                if checkpointed:
+                    state, result = None, checkpointed
+                    print(f"  -> resuming after scenario {checkpointed.get('current_scenario_index', 0)}")
+            for mode, chunk in app.stream(state, config, stream_mode=STREAM_MODES):
+                result = handle_stream_chunk(sink, mode, chunk, lambda text: print(f"  -> {text}"), stage) or result
+            if graph:
+                graph.record(file_path, result.get("code_map"))
+            output_file_path, message = finish_file(sink, result)
+            if output_file_path and round_index == 1 and not default_budget.skipped_for(file_path):
+                manifest.record(file_path, output_file_path, graph.dependencies(file_path) if graph else ())
+            if checkpointer:
+                checkpointer.finish_file(run_id, file_path)
+            print(message)
         except Exception as e:
-            print(f"Error processing {file_path}: {e}")
+            print(failure_message(sink, e))
             continue
-    
-    print(f"\nTest generation completed! Check the '{output_dir}' directory for results.")
\ No newline at end of file
+
+async def run_concurrent(app, source_files: List[str], output_dir: str, manifest: RunManifest, jobs: int,
+                         stage: str = "writer", graph: Optional[ImportGraph] = None,
+                         checkpointer=None, run_id: Optional[str] = None,
+                         coverage_gaps: Optional[Dict[str, Dict[str, Any]]] = None, round_index: int = 1) -> None:
+    """Process up to ``jobs`` files at once with the async workflow.
+
+    With an import ``graph`` a file starts only once the files it imports
+    that come earlier in ``source_files`` have finished, so their code maps
+    are available to it. Checkpoints and coverage rounds work as in
+    ``run_serial``.
+    A failure in one file is reported and does not affect the others.
+    Live progress lines are prefixed with the file path; per-file results
+    are printed in discovery order as soon as every earlier file has
+    finished.
+    """
+    semaphore = asyncio.Semaphore(max(1, jobs))
+    total = len(source_files)
+    messages: Dict[int, str] = {}
+    next_to_report = 0
+    finished = {file_path: asyncio.Event() for file_path in source_files}
+    position = {file_path: i for i, file_path in enumerate(source_files)}
+
+    async def process(index: int, file_path: str) -> None:
+        nonlocal next_to_report
+        if graph:
+            for dependency in graph.dependencies(file_path):
+                if position.get(dependency, index) < index:
+                    await finished[dependency].wait()
+        async with semaphore:
+            sink = TestFileSink(file_path, output_path_for(file_path, output_dir, round_index))
+            result: Dict[str, Any] = {}
+            config: Dict[str, Any] = {}
+            try:
+                state = initial_state(file_path, graph.context_for(file_path) if graph else None,
+                                      (coverage_gaps or {}).get(file_path))
+                if checkpointer:
+                    config = checkpointer.start_file(run_id, file_path)
+                    checkpointed = resume_point(await app.aget_state(config), sink, stage)
+                    if checkpointed:
+                        state, result = None, checkpointed
+                        print(f"  {file_path}: resuming after scenario "
+                              f"{checkpointed.get('current_scenario_index', 0)}")
+                async for mode, chunk in app.astream(state, config, stream_mode=STREAM_MODES):
+                    result = handle_stream_chunk(
+                        sink, mode, chunk, lambda text: print(f"  {file_path}: {text}"), stage) or result
+                if graph:
+                    graph.record(file_path, result.get("code_map"))
+                output_file_path, message = finish_file(sink, result)
+                if output_file_path and round_index == 1 and not default_budget.skipped_for(file_path):
+                    manifest.record(file_path, output_file_path, graph.dependencies(file_path) if graph else ())
+                if checkpointer:
+                    checkpointer.finish_file(run_id, file_path)
+            except Exception as e:
+                message = failure_message(sink, e)
+            finally:
+                finished[file_path].set()
+
+        messages[index] = message
+        while next_to_report in messages:
+            print(f"[{next_to_report + 1}/{total}] {messages.pop(next_to_report)}")
+            next_to_report += 1
+
+    await asyncio.gather(*(process(i, f) for i, f in enumerate(source_files)))
+
+# --- Coverage-Guided Rounds ---
+def coverage_targets(report: coverage_guide.CoverageReport, source_files: List[str]) -> Dict[str, Dict[str, Any]]:
+    """``{file: coverage gaps}`` for the files with uncovered functions.
+
+    Files the report knows nothing about map to no gaps: all their functions are targets.
+    """
+    targets = {}
+    for file_path in source_files:
+        gaps = report.gaps(file_path)
+        if gaps is None or gaps:
+            targets[file_path] = gaps or {}
+    return targets
+
+def coverage_guided_run(generate, source_files: List[str], repo_path: str, output_dir: str,
+                        target: float, max_rounds: int) -> None:
+    """Generate tests in rounds, each for the functions the tests so far leave uncovered.
+
+    Every round first runs the repository's tests plus those generated so
+    far under coverage, then calls ``generate(files, round_index=...,
+    coverage_gaps=...)``
+    for the files with uncovered functions. Stops once ``target`` percent
+    of the lines and branches of ``source_files`` is covered, when nothing
+    is left to target, when a round did not raise coverage, when the run
+    budget is spent, or after ``max_rounds`` rounds.
+    """
+    # Earlier outputs of these files are about to be replaced; they must not count
+    stale = {path for file_path in source_files for path in generated_outputs(file_path, output_dir)}
+    written: set = set()
+    previous = None
+    for round_index in range(1, max_rounds + 2):
+        test_paths = [repo_path] + ([output_dir] if os.path.isdir(output_dir) else [])
+        report = coverage_guide.measure(repo_path, test_paths, ignore=sorted(stale - written))
+        covered = report.percent(source_files)
+        print(f"\nCoverage: {covered:.1f}% of lines and branches (target {target:g}%).")
+        if covered >= target:
+            print("Coverage target reached.")
+            return
+        if round_index > max_rounds:
+            print(f"Stopping after {max_rounds} coverage rounds.")
+            return
+        if previous is not None and covered <= previous:
+            print("The last round did not raise coverage; stopping.")
+            return
+        if default_budget.exhausted:
+            print("Run budget spent; stopping.")
+            return
+        targets = coverage_targets(report, source_files)
+        if not targets:
+            print("No uncovered functions left to target.")
+            return
+        files = [f for f in source_files if f in targets]
+        functions = sum(len(gaps) for gaps in targets.values())
+        message = f"Coverage round {round_index}: {len(files)} files"
+        if functions:
+            message += f", {functions} uncovered functions"
+        if len(files) < len(source_files):
+            message += f"; skipping {len(source_files) - len(files)} covered files"
+        print(message + ".")
+        default_budget.start_round(len(files))
+        generate(files, round_index=round_index, coverage_gaps=targets)
+        written.update(output_path_for(f, output_dir, round_index) for f in files)
+        previous = covered
+
+# --- Command Line Interface ---
+def discover_source_files(repo_path: str, include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                          use_gitignore: bool = True) -> List[str]:
+    """Python files under ``repo_path`` that should get generated tests.
+
+    ``include`` replaces the default globs (``*.py``); ``exclude`` globs
+    are added after the defaults (test modules, ``__init__.py``,
+    virtualenvs, the top-level ``build/`` and ``dist/``...), so a
+    ``!pattern`` there re-includes what a default skips. Files ignored by ``.gitignore`` are skipped unless
+    ``use_gitignore`` is off. See ``discovery`` for the glob syntax.
+    """
+    return list(iter_source_files(repo_path, include=include or DEFAULT_INCLUDE,
+                                  exclude=list(DEFAULT_EXCLUDE) + list(exclude or []),
+                                  use_gitignore=use_gitignore))
+
+def write_metrics_report(output_dir: str) -> None:
+    """Print the per-node summary table and save the full report as JSON and CSV."""
+    json_path = os.path.join(output_dir, f"{METRICS_NAME}.json")
+    csv_path = os.path.join(output_dir, f"{METRICS_NAME}.csv")
+    default_metrics.write_json(json_path)
+    default_metrics.write_csv(csv_path)
+    print(f"\n{default_metrics.format_table()}")
+    print(f"Metrics written to {json_path} and {csv_path}")
+
+def budget_limits(spec: str) -> Dict[str, float]:
+    try:
+        return parse_limits(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def shard_spec(spec: str) -> Tuple[int, int]:
+    try:
+        return parse_shard(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def merge_command(shard_dirs: List[str], output_dir: str) -> int:
+    """Combine shard outputs into ``output_dir`` and print the merged summary."""
+    shard_dirs = shard_dirs or find_shard_dirs(output_dir)
+    if not shard_dirs:
+        print(f"No shard directories to merge in {output_dir}.")
+        return 1
+    for line in merge_shards(shard_dirs, output_dir, METRICS_NAME):
+        print(line)
+    write_metrics_report(output_dir)
+    print(f"Merged {len(shard_dirs)} shards into '{output_dir}'.")
+    return 0
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate pytest tests with a multi-agent LLM workflow.")
+    parser.add_argument("repo_path", nargs="?", default="app",
+                        help="Directory containing the Python sources to test (default: app)")
+    parser.add_argument("--include", action="append", default=None, metavar="GLOB",
+                        help="Only process files matching this .gitignore-style glob; repeatable (default: *.py)")
+    parser.add_argument("--exclude", action="append", default=None, metavar="GLOB",
+                        help="Also skip files and directories matching this .gitignore-style glob; repeatable. "
+                             "A '!GLOB' re-includes paths skipped by the defaults (test modules, __init__.py, "
+                             "virtualenvs and caches anywhere, build/ and dist/ at the top), e.g. '!/build/'")
+    parser.add_argument("--no-gitignore", action="store_true",
+                        help="Process files even if a .gitignore ignores them")
+    parser.add_argument("-o", "--output-dir", default="generated_tests",
+                        help="Directory for the generated test files (default: generated_tests)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of source files to process concurrently (default: 1)")
+    parser.add_argument("--writer-concurrency", type=int, default=4,
+                        help="Max test writer LLM requests in flight per file (default: 4)")
+    parser.add_argument("--group-by-function", action="store_true",
+                        help="Write one parametrized test per function in a single LLM call")
+    parser.add_argument("--no-dedupe", action="store_true",
+                        help="Keep near-duplicate test scenarios instead of merging them before writing")
+    parser.add_argument("--enrich-descriptions", action="store_true",
+                        help="Ask the LLM to describe functions that have no docstring")
+    parser.add_argument("--backend", choices=["openai", "fake"], default=None,
+                        help="LLM backend for every agent; 'fake' runs offline (default: openai, or TESTGEN_BACKEND)")
+    parser.add_argument("--model", default=None,
+                        help="Model for every agent (per-agent: TESTGEN_<AGENT>_MODEL, e.g. TESTGEN_TEST_WRITER_MODEL)")
+    parser.add_argument("--structured-output", action="store_true",
+                        help="Ask the provider to follow each agent's JSON schema (needs e.g. gpt-4o)")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="Max pooled HTTP connections shared by all agents (default: 20)")
+    parser.add_argument("--rpm", type=float, default=None,
+                        help="Provider request-per-minute limit to stay under (default: TESTGEN_RPM, unlimited)")
+    parser.add_argument("--tpm", type=float, default=None,
+                        help="Provider token-per-minute limit to stay under (default: TESTGEN_TPM, unlimited)")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="Upper bound for adaptive LLM request concurrency across all files (default: 16)")
+    parser.add_argument("--budget", type=budget_limits, default={},
+                        help="Run budget in tokens, dollars and/or wall-clock time, e.g. '2M tokens', '$5' or "
+                             "'$5,2h'; lower-priority scenarios are skipped as it runs out")
+    parser.add_argument("--file-budget", type=budget_limits, default={},
+                        help="Budget per source file, in the same units as --budget")
+    parser.add_argument("--validate", choices=["flag", "drop"], default=None,
+                        help="Run each generated test in a sandboxed pytest process and flag or drop failing ones")
+    parser.add_argument("--validation-timeout", type=float, default=30.0,
+                        help="Seconds each generated test may run during validation (default: 30)")
+    parser.add_argument("--validation-workers", type=int, default=None,
+                        help="Generated tests validated in parallel per file (default: CPU count)")
+    parser.add_argument("--coverage-target", type=float, default=None, metavar="PCT",
+                        help="Run the existing tests under coverage and generate tests only for functions with "
+                             "uncovered lines or branches, in rounds until PCT%% is covered")
+    parser.add_argument("--coverage-rounds", type=int, default=3,
+                        help="Most coverage-guided rounds to run (default: 3)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the last interrupted run: skip its finished files and resume the others "
+                             "from their last checkpoint")
+    parser.add_argument("--shard", type=shard_spec, default=None, metavar="I/N",
+                        help="Process only shard I of N (1-based) and write it to <output-dir>/shard-I-of-N")
+    parser.add_argument("--merge", nargs="*", default=None, metavar="SHARD_DIR",
+                        help="Combine shard outputs (default: the shard-*-of-* directories of --output-dir) "
+                             "into --output-dir and exit")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate every file even if its source and pipeline are unchanged")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List the files that would be processed and exit without calling the LLM")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Directory for the persistent LLM response cache (default: .llm_cache)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always call the LLM instead of reusing cached responses")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    load_dotenv()
+    llm_client.configure(backend=args.backend, model=args.model,
+                         structured_output=True if args.structured_output else None)
+    output_dir = args.output_dir
+    if args.merge is not None:
+        return merge_command(args.merge, output_dir)
+
+    source_files = discover_source_files(args.repo_path, args.include, args.exclude,
+                                         use_gitignore=not args.no_gitignore)
+    if not source_files:
+        print(f"No Python files found in {args.repo_path}. Please check the path.")
+        return 1
+
+    print(f"Found {len(source_files)} Python files to test.")
+
+    # Dependencies first, so dependents can reuse their analysis
+    graph = ImportGraph(source_files, args.repo_path)
+    source_files = graph.order()
+    if graph.edge_count:
+        print(f"Ordered files by {graph.edge_count} imports between them.")
+
+    if args.shard:
+        index, count = args.shard
+        source_files = select_shard(source_files, index, count, lambda f: estimated_work(graph.code_map(f)),
+                                    args.repo_path)
+        output_dir = shard_dir(output_dir, index, count)
+        print(f"Shard {index}/{count}: {len(source_files)} files, written to {output_dir}.")
+
+    # Skip files whose source, imported modules, pipeline code and models match the last run
+    fingerprint = current_pipeline_fingerprint(
+        enrich_descriptions=args.enrich_descriptions, group_by_function=args.group_by_function,
+        validate=args.validate, dedupe_scenarios=not args.no_dedupe,
+        coverage_guided=args.coverage_target is not None)
+    manifest = RunManifest(output_dir, fingerprint)
+    if not args.force:
+        unchanged = [f for f in source_files
+                     if manifest.is_up_to_date(f, output_path_for(f, output_dir), graph.dependencies(f))]
+        source_files = [f for f in source_files if f not in unchanged]
+        if unchanged:
+            print(f"Skipping {len(unchanged)} unchanged files (use --force to regenerate).")
+
+    if args.dry_run:
+        for file_path in source_files:
+            print(f"Would process {file_path} -> {output_path_for(file_path, output_dir)}")
+        return 0
+
+    if not source_files:
+        print("Nothing to do.")
+        return 0
+
+    # Validate API key
+    if llm_client.requires_api_key() and not os.getenv("OPENAI_API_KEY"):
+        print("Please set your OpenAI API key!")
+        print("Either set the OPENAI_API_KEY environment variable or update the .env file.")
+        return 1
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Every step is checkpointed so an interrupted run can be continued with --resume
+    from checkpoints import CHECKPOINT_DB_NAME, SqliteCheckpointer
+    checkpointer = SqliteCheckpointer(os.path.join(output_dir, CHECKPOINT_DB_NAME))
+    run_id = None
+    if args.resume:
+        latest = checkpointer.latest_run()
+        if latest is None:
+            print("No earlier run to resume; starting a new one.")
+        elif latest[1] != fingerprint:
+            print("The last run used different code, models or options; starting a new one.")
+        else:
+            run_id = latest[0]
+            finished = [f for f in source_files if checkpointer.is_finished(run_id, f)]
+            source_files = [f for f in source_files if f not in finished]
+            print(f"Resuming run {run_id}" + (f", skipping {len(finished)} finished files." if finished else "."))
+            if not source_files:
+                print("Nothing to do.")
+                return 0
+    if run_id is None:
+        run_id = checkpointer.start_run(fingerprint)
+
+    configure_cache(cache_dir=args.cache_dir, enabled=not args.no_cache)
+    llm_client.configure_pool(max_connections=args.pool_size, max_keepalive_connections=args.pool_size)
+    default_scheduler.configure(rpm=args.rpm, tpm=args.tpm, max_concurrency=args.max_concurrency)
+    default_budget.configure(args.budget, args.file_budget, files=len(source_files), parallel=args.jobs)
+    validator = None
+    if args.validate:
+        validator = Validator(args.validate, timeout=args.validation_timeout, workers=args.validation_workers,
+                              cache=ValidationCache(os.path.join(output_dir, VALIDATION_CACHE_NAME)))
+    stage = "validated" if validator else "writer"
+    print()
+
+    # Every coverage round runs on this one event loop: the shared async HTTP
+    # client's pooled connections belong to the loop that opened them
+    with asyncio.Runner() as runner:
+        if args.jobs > 1:
+            app = build_workflow(writer_concurrency=args.writer_concurrency, use_async=True,
+                                 enrich_descriptions=args.enrich_descriptions,
+                                 group_by_function=args.group_by_function, validator=validator,
+                                 dedupe_scenarios=not args.no_dedupe, checkpointer=checkpointer)
+            generate = lambda files, **options: runner.run(run_concurrent(  # noqa: E731
+                app, files, output_dir, manifest, args.jobs, stage, graph, checkpointer, run_id, **options))
+        else:
+            app = build_workflow(writer_concurrency=args.writer_concurrency,
+                                 enrich_descriptions=args.enrich_descriptions,
+                                 group_by_function=args.group_by_function, validator=validator,
+                                 dedupe_scenarios=not args.no_dedupe, checkpointer=checkpointer)
+            generate = partial(run_serial, app, output_dir=output_dir, manifest=manifest, stage=stage, graph=graph,
+                               checkpointer=checkpointer, run_id=run_id)
+
+        if args.coverage_target is not None:
+            coverage_guided_run(generate, source_files, args.repo_path, output_dir, args.coverage_target,
+                                args.coverage_rounds)
+        else:
+            generate(source_files)
+
+    print(f"\n{default_cache.report()}")
+    print(default_scheduler.report())
+    if default_budget.enabled:
+        print(default_budget.report())
+        default_budget.write_json(os.path.join(output_dir, BUDGET_REPORT_NAME))
+    write_metrics_report(output_dir)
+    print(f"Test generation completed! Check the '{output_dir}' directory for results.")
+    return 0
+
+# --- Main Execution Logic ---
+if __name__ == "__main__":
+    sys.exit(main())
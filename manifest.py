@@ -0,0 +1,86 @@
+"""Run manifest used to skip source files whose inputs have not changed.
+
+The manifest lives in the output directory and records, for every source
+file, the hash of its contents, the hashes of the project modules it
+imports (their code maps are part of its prompts), the pipeline
+fingerprint (prompts, models and pipeline version) and the hash of the
+test file written for it.
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = ".testgen_manifest.json"
+
+# Bump when a change to the pipeline should invalidate every previous output
+PIPELINE_VERSION = "4"
+
+
+def file_hash(path):
+    """SHA-256 of a file's bytes, or None if it cannot be read."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def pipeline_fingerprint(*parts):
+    """Hash everything besides the source that influences generated output."""
+    digest = hashlib.sha256(PIPELINE_VERSION.encode("utf-8"))
+    for part in parts:
+        digest.update(b"\0")
+        digest.update(str(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """Per-file record of the inputs and output of the last successful run."""
+
+    def __init__(self, output_dir, fingerprint, name=MANIFEST_NAME):
+        self.path = os.path.join(output_dir, name)
+        self.fingerprint = fingerprint
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("files", {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """Write the manifest atomically."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"pipeline_version": PIPELINE_VERSION, "files": self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def is_up_to_date(self, file_path, output_path, dependencies=()):
+        """True when the source, its ``dependencies``, pipeline and existing output all match the record."""
+        entry = self.entries.get(file_path)
+        if not entry:
+            return False
+        return (entry.get("source_hash") == file_hash(file_path)
+                and entry.get("dependency_hashes", {}) == {dep: file_hash(dep) for dep in dependencies}
+                and entry.get("pipeline") == self.fingerprint
+                and entry.get("output_hash") == file_hash(output_path))
+
+    def record(self, file_path, output_path, dependencies=()):
+        """Remember a completed file and persist the manifest immediately.
+
+        ``dependencies`` are the project files it imports (see ``ImportGraph.dependencies``).
+        """
+        self.entries[file_path] = {
+            "source_hash": file_hash(file_path),
+            "dependency_hashes": {dep: file_hash(dep) for dep in dependencies},
+            "pipeline": self.fingerprint,
+            "output": output_path,
+            "output_hash": file_hash(output_path),
+        }
+        self.save()
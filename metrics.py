@@ -0,0 +1,222 @@
+"""Per-node token, latency and failure metrics.
+
+Graph nodes are wrapped with ``instrument()``, which times each run and
+tags everything recorded while it runs (LLM calls, retries, parse failures)
+with the node and file being processed. Writers additionally tag their
+LLM calls with the scenario or function they are writing. At the end of a
+run the collected samples are summarised per node with p50/p95/p99
+latencies and written as JSON and CSV.
+"""
+import contextvars
+import csv
+import functools
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+_scope = contextvars.ContextVar("metrics_scope", default={})
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, q):
+    """Linearly interpolated percentile of ``values`` (0 <= q <= 100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+@contextmanager
+def scope(**labels):
+    """Attach labels such as ``file``, ``node`` or ``scenario`` to everything recorded inside."""
+    token = _scope.set({**_scope.get(), **labels})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def current_scope():
+    return dict(_scope.get())
+
+
+class Metrics:
+    """Thread-safe collector of node runs, LLM calls and parse failures."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.node_runs = []
+        self.llm_calls = []
+        self.parse_failures = []
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        with self._lock:
+            self.node_runs.clear()
+            self.llm_calls.clear()
+            self.parse_failures.clear()
+
+    def record_node_run(self, node, file, seconds, failed):
+        with self._lock:
+            self.node_runs.append({"node": node, "file": file, "seconds": seconds, "failed": failed})
+
+    def record_llm_call(self, seconds, prompt_tokens=0, completion_tokens=0, cached=False, retries=0, error=None):
+        labels = current_scope()
+        with self._lock:
+            self.llm_calls.append({
+                "node": labels.get("node", "unknown"),
+                "file": labels.get("file"),
+                "scenario": labels.get("scenario"),
+                "seconds": seconds,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cached": cached,
+                "retries": retries,
+                "error": error,
+            })
+
+    def record_parse_failure(self, error):
+        labels = current_scope()
+        with self._lock:
+            self.parse_failures.append({
+                "node": labels.get("node", "unknown"),
+                "file": labels.get("file"),
+                "scenario": labels.get("scenario"),
+                "error": str(error),
+            })
+
+    def _aggregate(self, node_runs, llm_calls, parse_failures):
+        nodes = sorted({r["node"] for r in node_runs} | {c["node"] for c in llm_calls}
+                       | {f["node"] for f in parse_failures})
+        summary = {}
+        for node in nodes:
+            runs = [r for r in node_runs if r["node"] == node]
+            calls = [c for c in llm_calls if c["node"] == node]
+            run_seconds = [r["seconds"] for r in runs]
+            call_seconds = [c["seconds"] for c in calls if not c["cached"]]
+            entry = {
+                "runs": len(runs),
+                "failed_runs": sum(r["failed"] for r in runs),
+                "wall_seconds": sum(run_seconds),
+                "llm_calls": len(calls),
+                "cached_calls": sum(c["cached"] for c in calls),
+                "failed_calls": sum(c["error"] is not None for c in calls),
+                "retries": sum(c["retries"] for c in calls),
+                "parse_failures": sum(f["node"] == node for f in parse_failures),
+                "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+                "completion_tokens": sum(c["completion_tokens"] for c in calls),
+            }
+            for q in PERCENTILES:
+                entry[f"node_p{q}_seconds"] = percentile(run_seconds, q)
+            for q in PERCENTILES:
+                entry[f"llm_p{q}_seconds"] = percentile(call_seconds, q)
+            summary[node] = entry
+        return summary
+
+    def summary(self):
+        """Per-node aggregates over the whole run."""
+        with self._lock:
+            return self._aggregate(self.node_runs, self.llm_calls, self.parse_failures)
+
+    def per_file(self):
+        """Per-node aggregates for each file."""
+        with self._lock:
+            files = sorted({r["file"] for r in self.node_runs if r["file"]})
+            return {
+                file: self._aggregate(
+                    [r for r in self.node_runs if r["file"] == file],
+                    [c for c in self.llm_calls if c["file"] == file],
+                    [f for f in self.parse_failures if f["file"] == file],
+                )
+                for file in files
+            }
+
+    def write_json(self, path):
+        with self._lock:
+            raw = {"node_runs": list(self.node_runs), "llm_calls": list(self.llm_calls),
+                   "parse_failures": list(self.parse_failures)}
+        report = {"summary": self.summary(), "files": self.per_file(), **raw}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    def load_json(self, path):
+        """Add the samples of a report written by ``write_json`` (e.g. by another shard)."""
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        with self._lock:
+            self.node_runs.extend(report.get("node_runs", []))
+            self.llm_calls.extend(report.get("llm_calls", []))
+            self.parse_failures.extend(report.get("parse_failures", []))
+
+    def write_csv(self, path):
+        """One row per node for the whole run, then one row per file and node."""
+        rows = [{"file": "*", "node": node, **entry} for node, entry in self.summary().items()]
+        for file, nodes in self.per_file().items():
+            rows.extend({"file": file, "node": node, **entry} for node, entry in nodes.items())
+        if not rows:
+            return
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def format_table(self):
+        """Human-readable summary table for the end of a run."""
+        header = (f"{'node':<18}{'runs':>6}{'calls':>7}{'cached':>8}{'retries':>9}{'fails':>7}{'parse':>7}"
+                  f"{'prompt tok':>12}{'compl tok':>11}{'wall s':>9}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}")
+        lines = [header, "-" * len(header)]
+        for node, e in self.summary().items():
+            lines.append(
+                f"{node:<18}{e['runs']:>6}{e['llm_calls']:>7}{e['cached_calls']:>8}{e['retries']:>9}"
+                f"{e['failed_runs'] + e['failed_calls']:>7}{e['parse_failures']:>7}"
+                f"{e['prompt_tokens']:>12}{e['completion_tokens']:>11}{e['wall_seconds']:>9.2f}"
+                f"{e['node_p50_seconds']:>8.2f}{e['node_p95_seconds']:>8.2f}{e['node_p99_seconds']:>8.2f}"
+            )
+        return "\n".join(lines)
+
+
+default_metrics = Metrics()
+
+
+@contextmanager
+def parse_guard():
+    """Record a parse failure for the current node if the block raises."""
+    try:
+        yield
+    except Exception as e:
+        default_metrics.record_parse_failure(e)
+        raise
+
+
+def instrument(node, fn):
+    """Wrap a graph node so each run is timed and labelled with its node and file."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state):
+            with scope(node=node, file=state.get("file_path")):
+                start, failed = time.perf_counter(), True
+                try:
+                    result = await fn(state)
+                    failed = False
+                    return result
+                finally:
+                    default_metrics.record_node_run(node, state.get("file_path"), time.perf_counter() - start, failed)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        with scope(node=node, file=state.get("file_path")):
+            start, failed = time.perf_counter(), True
+            try:
+                result = fn(state)
+                failed = False
+                return result
+            finally:
+                default_metrics.record_node_run(node, state.get("file_path"), time.perf_counter() - start, failed)
+    return wrapper
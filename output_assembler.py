@@ -0,0 +1,436 @@
+"""Assembles streamed test snippets into one clean test module.
+
+The writer returns each test as a self-contained snippet with its own
+imports, and often its own copy of a fixture or of a module-level object
+such as ``client = TestClient(app)``. Concatenated as-is, a module imports
+the same things many times, builds the same objects at import time, and
+later snippets silently shadow names defined by earlier ones.
+``assemble_module`` instead:
+
+* hoists every top-level import to the head of the module, once;
+* keeps a single copy of identical top-level definitions;
+* renames a later definition whose name is already taken by a different
+  one (tests, fixtures, helpers, module variables or imports). Uses of
+  the name in that snippet are renamed with it;
+* moves fixtures that several snippets share, and that depend only on
+  imports, into the output directory's ``conftest.py`` with session
+  scope.
+
+Statements are copied from the snippet's source with their comments;
+renames edit just the renamed identifiers. Snippets that do not parse are
+kept verbatim.
+"""
+import ast
+import builtins
+import copy
+import os
+import re
+
+CONFTEST_NAME = "conftest.py"
+CONFTEST_BANNER = "# Shared fixtures for the generated tests\n# Generated by LangGraph Test Generator\n\n"
+
+# Fixtures a session-scoped fixture may still request
+_SESSION_SAFE_ARGS = {"request", "tmp_path_factory", "tmp_path_retention_policy"}
+_BUILTINS = set(dir(builtins))
+
+
+# --- Helpers ---
+
+def _unique(name, taken):
+    index = 2
+    while f"{name}_{index}" in taken:
+        index += 1
+    return f"{name}_{index}"
+
+
+def _fixture_decorator(node):
+    """The ``@pytest.fixture`` decorator of a function, or None."""
+    if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return None
+    for decorator in node.decorator_list:
+        target = decorator.func if isinstance(decorator, ast.Call) else decorator
+        if (isinstance(target, ast.Name) and target.id == "fixture") or (
+                isinstance(target, ast.Attribute) and target.attr == "fixture"):
+            return decorator
+    return None
+
+
+def _fixture_key(node):
+    """Identity of a fixture regardless of its scope decorator."""
+    bare = copy.copy(node)
+    bare.decorator_list = []
+    return ast.dump(bare)
+
+
+def _bound_names(node):
+    """Names a top-level non-import statement binds."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return [node.name]
+    if isinstance(node, ast.Assign):
+        return [n.id for target in node.targets for n in ast.walk(target) if isinstance(n, ast.Name)]
+    if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+        return [node.target.id]
+    return []
+
+
+def _free_names(node):
+    """Global names a function reads."""
+    local = {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and not isinstance(n.ctx, ast.Load)}
+    local |= {a.arg for a in ast.walk(node) if isinstance(a, ast.arg)}
+    local |= {n.name for n in ast.walk(node) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))}
+    loaded = {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)}
+    return loaded - local - _BUILTINS
+
+
+_DEF_KEYWORD = re.compile(rb"(?:async\s+)?(?:def|class)\s+")
+
+
+def _rename_edits(node, names, fixtures):
+    """``(line, start, end, new name)`` source edits that rename ``names`` inside ``node``.
+
+    Offsets are UTF-8 byte columns, as the AST reports them.
+    """
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and child.id in names:
+            yield child.lineno, child.col_offset, child.end_col_offset, names[child.id]
+        elif isinstance(child, ast.arg) and child.arg in fixtures:
+            yield child.lineno, child.col_offset, child.col_offset + len(child.arg.encode()), names[child.arg]
+        elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and child.name in names:
+            yield child.lineno, child.col_offset, None, names[child.name]
+
+
+def _apply_edits(lines, edits):
+    """A copy of ``lines`` with rename edits applied."""
+    encoded = [line.encode() for line in lines]
+    for lineno, start, end, new in sorted(edits, key=lambda e: (e[0], e[1]), reverse=True):
+        line = encoded[lineno - 1]
+        if end is None:
+            # A def/class name: skip the keyword
+            start = _DEF_KEYWORD.match(line, start).end()
+            end = start + len(re.match(rb"\w+", line[start:]).group())
+        encoded[lineno - 1] = line[:start] + new.encode() + line[end:]
+    return [line.decode() for line in encoded]
+
+
+class _Renamer(ast.NodeTransformer):
+    """Renames a snippet's names; parameters only for renamed fixtures, which tests request by name."""
+
+    def __init__(self, names, fixtures):
+        self.names = names
+        self.fixtures = fixtures
+
+    def visit_Name(self, node):
+        node.id = self.names.get(node.id, node.id)
+        return node
+
+    def visit_FunctionDef(self, node):
+        node.name = self.names.get(node.name, node.name)
+        self.generic_visit(node)
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        node.name = self.names.get(node.name, node.name)
+        self.generic_visit(node)
+        return node
+
+    def visit_arg(self, node):
+        if node.arg in self.fixtures:
+            node.arg = self.names[node.arg]
+        return node
+
+
+# --- Imports ---
+
+class _Import:
+    """One imported name: ``import module [as alias]`` or ``from module import name [as alias]``."""
+
+    def __init__(self, module, name=None, asname=None, level=0):
+        self.module = module
+        self.name = name
+        self.asname = asname
+        self.level = level
+
+    @property
+    def binding(self):
+        if self.asname:
+            return self.asname
+        return self.name if self.name else self.module.split(".")[0]
+
+    @property
+    def key(self):
+        """What the binding refers to, for telling conflicting imports apart."""
+        if self.name:
+            return ("from", self.level, self.module, self.name)
+        return ("import", self.module if self.asname else self.module.split(".")[0])
+
+    @property
+    def group(self):
+        return ("from", self.level, self.module) if self.name else ("import", self.module, self.asname)
+
+    def alias(self):
+        name = self.name or self.module
+        return f"{name} as {self.asname}" if self.asname else name
+
+
+def _imports(node):
+    if isinstance(node, ast.Import):
+        return [_Import(a.name, asname=a.asname) for a in node.names]
+    return [_Import(node.module or "", a.name, a.asname, node.level) for a in node.names]
+
+
+def _format_imports(imports):
+    groups = {}
+    for entry in imports:
+        groups.setdefault(entry.group, [])
+        if entry.alias() not in groups[entry.group]:
+            groups[entry.group].append(entry.alias())
+    future, lines = [], []
+    for group, aliases in groups.items():
+        if group[0] == "import":
+            lines.append(f"import {aliases[0]}")
+            continue
+        line = f"from {'.' * group[1]}{group[2]} import {', '.join(aliases)}"
+        (future if group[2] == "__future__" else lines).append(line)
+    return future + lines
+
+
+# --- Assembly ---
+
+class _Module:
+    """Bookkeeping while snippets are merged into one module."""
+
+    def __init__(self, shared_fixtures):
+        self.shared_fixtures = shared_fixtures
+        self.imports = []
+        self.import_keys = set()
+        self.bindings = {}  # name -> key of what it is bound to
+        self.definitions = {}  # statement key -> final name(s)
+        self.unnamed = set()  # dumps of statements that bind nothing
+        self.fixture_counts = {}
+        self.names_by_key = {}  # key -> name it was first bound to
+        self.sections = []  # (title, [(statement, text), ...])
+
+    def take(self, name, key, renames):
+        """Bind ``name`` to ``key``; returns the name to use, recording a rename if it was taken."""
+        final = name
+        if self.bindings.get(name, key) != key:
+            final = self.names_by_key.get(key) or _unique(name, self.bindings)
+            renames[name] = final
+        self.bindings[final] = key
+        self.names_by_key.setdefault(key, final)
+        return final
+
+
+def _statement_text(lines, node, previous_end):
+    """Source of a top-level statement with the comment lines just above it."""
+    start = min([d.lineno for d in getattr(node, "decorator_list", [])] + [node.lineno])
+    leading = lines[previous_end:start - 1]
+    while leading and not leading[0].strip():
+        leading.pop(0)
+    while leading and not leading[-1].strip():
+        leading.pop()
+    return "\n".join(leading + lines[start - 1:node.end_lineno])
+
+
+def _add_snippet(module, title, code):
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        module.sections.append((title, [(None, code.strip("\n"))]))
+        return
+
+    renames, fixture_renames = {}, set()
+    lines = code.splitlines()
+    statements, previous_end = [], 0
+    for node in tree.body:
+        start, previous_end = previous_end, node.end_lineno
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for entry in _imports(node):
+                if entry.name == "*":
+                    key = ("star", entry.level, entry.module)
+                else:
+                    final = module.take(entry.binding, entry.key, renames)
+                    if final != entry.binding:
+                        entry.asname = final
+                    key = (entry.key, final)
+                if key not in module.import_keys:
+                    module.import_keys.add(key)
+                    module.imports.append(entry)
+            continue
+        statements.append((node, start))
+
+    kept = []
+    for node, start in statements:
+        renamed = _Renamer(renames, fixture_renames).visit(copy.deepcopy(node))
+        is_fixture = _fixture_decorator(renamed) is not None
+        key = _fixture_key(renamed) if is_fixture else ast.dump(renamed)
+        if is_fixture:
+            module.fixture_counts[key] = module.fixture_counts.get(key, 0) + 1
+        names = _bound_names(renamed)
+        if not names:
+            if key not in module.unnamed:
+                module.unnamed.add(key)
+                kept.append((node, start))
+            continue
+        if key in module.definitions:
+            # Identical to an earlier definition: reuse it under its final name
+            for name, final in zip(names, module.definitions[key]):
+                if final != name:
+                    renames[name] = final
+                    if is_fixture:
+                        fixture_renames.add(name)
+            continue
+        finals = [module.take(name, key, renames) for name in names]
+        if is_fixture and finals[0] != names[0]:
+            fixture_renames.add(names[0])
+        module.definitions[key] = finals
+        kept.append((node, start))
+
+    # Renames decided late in the snippet apply to all of it
+    edits = [edit for node, _ in kept for edit in _rename_edits(node, renames, fixture_renames)]
+    lines = _apply_edits(lines, edits)
+    section = [(_Renamer(renames, fixture_renames).visit(copy.deepcopy(node)), _statement_text(lines, node, start))
+               for node, start in kept]
+    if section:
+        module.sections.append((title, section))
+
+
+def _shareable(module, node):
+    """Whether a fixture can move to conftest.py with session scope."""
+    decorator = _fixture_decorator(node)
+    if isinstance(decorator, ast.Call) and any(
+            k.arg == "autouse" and not (isinstance(k.value, ast.Constant) and not k.value.value)
+            for k in decorator.keywords):
+        return False
+    args = node.args
+    if args.vararg or args.kwarg or any(a.arg not in _SESSION_SAFE_ARGS
+                                        for a in args.posonlyargs + args.args + args.kwonlyargs):
+        return False
+    imported = {entry.binding for entry in module.imports}
+    if not _free_names(node) <= imported:
+        return False
+    key = _fixture_key(node)
+    if node.name in module.shared_fixtures:
+        return module.shared_fixtures[node.name] == key
+    return module.fixture_counts.get(key, 0) > 1
+
+
+def _session_scoped(node):
+    node = copy.deepcopy(node)
+    decorator = _fixture_decorator(node)
+    scope = ast.keyword(arg="scope", value=ast.Constant("session"))
+    if isinstance(decorator, ast.Call):
+        decorator.keywords = [k for k in decorator.keywords if k.arg != "scope"] + [scope]
+    else:
+        index = node.decorator_list.index(decorator)
+        node.decorator_list[index] = ast.Call(func=decorator, args=[], keywords=[scope])
+    return ast.fix_missing_locations(node)
+
+
+def assemble_module(snippets, banner="", preamble="", shared_fixtures=None, titled=True):
+    """Merge test snippets into the source of one module.
+
+    ``banner`` opens the module, and ``preamble`` is code merged in ahead of
+    the snippets (e.g. default imports). ``shared_fixtures`` maps the names
+    of fixtures already in conftest.py to their keys (see
+    ``read_shared_fixtures``); pass None to keep every fixture local.
+    With ``titled`` each snippet's section starts with ``# Test <n>``.
+
+    Returns ``(source, fixtures)``, where ``fixtures`` are snippets that
+    belong in conftest.py.
+    """
+    module = _Module(shared_fixtures if shared_fixtures is not None else {})
+    if preamble:
+        _add_snippet(module, None, preamble)
+    for number, code in enumerate(snippets, 1):
+        _add_snippet(module, f"# Test {number}" if titled else None, code)
+
+    shared = []
+    body = []
+    for title, section in module.sections:
+        parts = []
+        for node, text in section:
+            if shared_fixtures is not None and node is not None and _fixture_decorator(node) is not None \
+                    and _shareable(module, node):
+                free = _free_names(node)
+                imports = _format_imports([e for e in module.imports if e.binding in free])
+                shared.append("\n".join(imports + ["", ast.unparse(_session_scoped(node))]))
+                continue
+            parts.append(text)
+        if parts:
+            body.append((f"{title}\n" if title else "") + "\n\n".join(parts))
+
+    source = banner + "\n".join(_format_imports(module.imports)) + "\n\n"
+    if body:
+        source += "\n\n".join(body) + "\n"
+    return source, shared
+
+
+# --- conftest.py ---
+
+def read_shared_fixtures(conftest_path):
+    """``{name: key}`` of the fixtures in a conftest.py (empty if there is none)."""
+    try:
+        with open(conftest_path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError):
+        return {}
+    return {node.name: _fixture_key(node) for node in tree.body if _fixture_decorator(node) is not None}
+
+
+def update_conftest(conftest_path, fixtures):
+    """Add fixture snippets to a conftest.py, merging imports and skipping ones it already has."""
+    if not fixtures:
+        return
+    existing = []
+    if os.path.exists(conftest_path):
+        with open(conftest_path, "r", encoding="utf-8") as f:
+            existing = [f.read()]
+    source, _ = assemble_module(existing + list(fixtures), banner=CONFTEST_BANNER, titled=False)
+    tmp_path = f"{conftest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(source)
+    os.replace(tmp_path, conftest_path)
+
+
+def conftest_fixtures(conftest_path):
+    """``{name: (key, snippet)}`` for the fixtures in a conftest.py.
+
+    Each snippet holds the fixture with just the imports it uses.
+    """
+    try:
+        with open(conftest_path, "r", encoding="utf-8") as f:
+            source = f.read()
+        tree = ast.parse(source)
+    except (OSError, SyntaxError):
+        return {}
+    lines = source.splitlines()
+    imports = [entry for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))
+               for entry in _imports(node)]
+    fixtures = {}
+    for node in tree.body:
+        if _fixture_decorator(node) is None:
+            continue
+        free = _free_names(node)
+        start = min(d.lineno for d in node.decorator_list)
+        text = "\n".join(lines[start - 1:node.end_lineno])
+        head = _format_imports([entry for entry in imports if entry.binding in free])
+        fixtures[node.name] = (_fixture_key(node), "\n".join(head + ["", text]) + "\n")
+    return fixtures
+
+
+def add_local_fixtures(module_path, fixtures):
+    """Define fixture snippets in a generated test module, where they take precedence over conftest.py."""
+    with open(module_path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines(keepends=True)
+    banner_end = 0
+    while banner_end < len(lines) and lines[banner_end].startswith("#"):
+        banner_end += 1
+    banner = "".join(lines[:banner_end]) + "\n" if banner_end else ""
+    source, _ = assemble_module(["".join(lines[banner_end:])] + list(fixtures), banner=banner, titled=False)
+    tmp_path = f"{module_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(source)
+    os.replace(tmp_path, module_path)
@@ -0,0 +1,123 @@
+"""Incremental writer for generated test files.
+
+Tests are appended to ``<output>.partial`` as soon as the writer produces
+them and flushed to disk, so a crash late in a file keeps everything
+finished so far. ``commit()`` assembles the tests into a clean module (see
+``output_assembler``) and renames it over the final path in one atomic
+step, so readers never see a half-written test module.
+"""
+import os
+
+from output_assembler import CONFTEST_NAME, assemble_module, read_shared_fixtures, update_conftest
+
+BANNER = (
+    "# Auto-generated tests using AI-powered multi-agent analysis\n"
+    "# Source file: {file_path}\n"
+    "# Generated by LangGraph Test Generator\n\n"
+)
+DEFAULT_IMPORTS = "import pytest\nfrom unittest.mock import Mock, patch\n\n"
+HEADER = BANNER + DEFAULT_IMPORTS
+
+
+class TestFileSink:
+    """Streams the tests for one source file into its output file.
+
+    Tests may arrive out of order (e.g. from concurrent writers); each comes
+    with the index of its scenario and is written once every earlier index
+    has arrived, so the file keeps the strategist's priority order. A
+    ``None`` test marks a scenario that failed to generate.
+    """
+
+    __test__ = False  # Not a pytest test class despite the name
+
+    def __init__(self, file_path, output_path, assemble=True):
+        self.file_path = file_path
+        self.output_path = output_path
+        self.partial_path = f"{output_path}.partial"
+        self.conftest_path = os.path.join(os.path.dirname(output_path), CONFTEST_NAME)
+        self.assemble = assemble
+        self.written = 0
+        self.tests = []
+        self._file = None
+        self._pending = {}
+        self._next_index = 0
+
+    def add(self, index, test_code):
+        """Record the test for scenario ``index`` and write whatever is now in order."""
+        self._pending[index] = test_code
+        while self._next_index in self._pending:
+            code = self._pending.pop(self._next_index)
+            self._next_index += 1
+            if code is not None:
+                self._write(code)
+
+    def restore(self, tests, next_index):
+        """Start over from the tests finished before an interruption.
+
+        ``tests`` are rewritten to a fresh partial file, and the next test
+        expected is the one for scenario ``next_index``.
+        """
+        for code in tests:
+            self._write(code)
+        self._next_index = next_index
+
+    def _write(self, test_code):
+        if self._file is None:
+            self._file = open(self.partial_path, "w", encoding="utf-8")
+            self._file.write(HEADER.format(file_path=self.file_path))
+        self.written += 1
+        self.tests.append(test_code)
+        self._file.write(f"# Test {self.written}\n")
+        self._file.write(test_code)
+        self._file.write("\n\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def commit(self, generated_tests=()):
+        """Finish the file and move it into place.
+
+        ``generated_tests`` is the final list from the graph state; it is
+        written out if nothing was streamed. Unless the sink was created with
+        ``assemble=False``, the raw streamed snippets are replaced by the
+        assembled module, and fixtures shared between tests move to the
+        output directory's conftest.py. Returns the output path, or None if
+        there were no tests.
+        """
+        if self.written == 0:
+            for index, code in enumerate(generated_tests):
+                self.add(index, code)
+        # Anything still waiting on a missing earlier index goes out in order
+        for index in sorted(self._pending):
+            code = self._pending.pop(index)
+            if code is not None:
+                self._write(code)
+        if self._file is None:
+            return None
+        self._file.close()
+        self._file = None
+        if self.assemble:
+            self._write_assembled()
+        os.replace(self.partial_path, self.output_path)
+        return self.output_path
+
+    def _write_assembled(self):
+        source, shared = assemble_module(self.tests, banner=BANNER.format(file_path=self.file_path),
+                                         preamble=DEFAULT_IMPORTS,
+                                         shared_fixtures=read_shared_fixtures(self.conftest_path))
+        # conftest.py goes first so the module never lacks a fixture it expects there
+        update_conftest(self.conftest_path, shared)
+        with open(self.partial_path, "w", encoding="utf-8") as f:
+            f.write(source)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def abort(self):
+        """Close without committing, keeping completed tests in the partial file.
+
+        Returns the partial file path, or None if nothing had been written.
+        """
+        if self._file is None:
+            return None
+        self._file.close()
+        self._file = None
+        return self.partial_path
@@ -0,0 +1,239 @@
+"""Static execution-path enumeration over each function's AST.
+
+Walks the control flow of every function and emits one path per feasible
+combination of branch outcomes, ending in an explicit ``raise``, a
+``return`` or falling off the end of the body. Loops are entered at most
+once: ``break`` leaves the loop, skipping its ``else``, while an iteration
+that ends normally or by ``continue`` goes on to the ``else`` (or, for
+``while True``, around the loop again). The result has the same
+shape as the ``execution_paths`` the function path agent used to request
+from the LLM.
+"""
+import ast
+from static_analyzer import iter_functions
+
+# Functions with more paths than this are left to the LLM
+MAX_PATHS = 32
+
+_NEGATED_OPS = {
+    ast.Eq: ast.NotEq, ast.NotEq: ast.Eq,
+    ast.Lt: ast.GtE, ast.GtE: ast.Lt,
+    ast.Gt: ast.LtE, ast.LtE: ast.Gt,
+    ast.Is: ast.IsNot, ast.IsNot: ast.Is,
+    ast.In: ast.NotIn, ast.NotIn: ast.In,
+}
+
+_EDGE_MARKERS = ("None", "== 0", "<= 0", "< 0", "== ''", "== []", "len(", "is empty")
+
+_BREAK = {"kind": "break"}
+_CONTINUE = {"kind": "continue"}
+
+
+class PathExplosion(Exception):
+    """Raised when a function has too many paths to enumerate usefully."""
+
+
+def negate(test):
+    """Readable negation of a condition expression."""
+    if isinstance(test, ast.UnaryOp) and isinstance(test.op, ast.Not):
+        return ast.unparse(test.operand)
+    if isinstance(test, ast.Compare) and len(test.ops) == 1 and type(test.ops[0]) in _NEGATED_OPS:
+        negated = ast.Compare(left=test.left, ops=[_NEGATED_OPS[type(test.ops[0])]()], comparators=test.comparators)
+        return ast.unparse(negated)
+    if isinstance(test, (ast.Name, ast.Attribute, ast.Call, ast.Subscript)):
+        return f"not {ast.unparse(test)}"
+    return f"not ({ast.unparse(test)})"
+
+
+def _exception_name(exc):
+    if exc is None:
+        return "re-raised exception"
+    if isinstance(exc, ast.Call):
+        exc = exc.func
+    return ast.unparse(exc)
+
+
+class _PathWalker:
+    """Enumerates ``(conditions, outcome)`` pairs for a list of statements.
+
+    ``outcome`` is None for paths that fall through to the next statement;
+    inside a loop body it can also be ``_BREAK`` or ``_CONTINUE``.
+    """
+
+    def __init__(self, max_paths=MAX_PATHS):
+        self.max_paths = max_paths
+
+    def block(self, stmts):
+        paths = [((), None)]
+        for stmt in stmts:
+            stmt_paths = None
+            extended = []
+            for conditions, outcome in paths:
+                if outcome is not None:
+                    extended.append((conditions, outcome))
+                    continue
+                if stmt_paths is None:
+                    stmt_paths = self.statement(stmt)
+                extended.extend((conditions + more, result) for more, result in stmt_paths)
+            if len(extended) > self.max_paths:
+                raise PathExplosion(f"more than {self.max_paths} paths")
+            paths = extended
+        return paths
+
+    def statement(self, stmt):
+        if isinstance(stmt, ast.Return):
+            value = ast.unparse(stmt.value) if stmt.value is not None else "None"
+            return [((), {"kind": "return", "value": value})]
+        if isinstance(stmt, ast.Raise):
+            detail = ast.unparse(stmt.exc) if stmt.exc is not None else "raise"
+            return [((), {"kind": "raise", "exception": _exception_name(stmt.exc), "detail": detail})]
+        if isinstance(stmt, ast.If):
+            return (self._guarded(ast.unparse(stmt.test), stmt.body)
+                    + self._guarded(negate(stmt.test), stmt.orelse))
+        if isinstance(stmt, (ast.For, ast.AsyncFor)):
+            iterable = ast.unparse(stmt.iter)
+            # The else clause needs every item to get through the body, not just one
+            exhausted = f"{iterable} is exhausted" if stmt.orelse else None
+            return (self._loop((f"{iterable} is not empty",), stmt.body, stmt.orelse, exhausted)
+                    + self._guarded(f"{iterable} is empty", stmt.orelse))
+        if isinstance(stmt, ast.While):
+            if isinstance(stmt.test, ast.Constant) and stmt.test.value:
+                # Only break, return or raise leave the loop
+                return self._loop((), stmt.body, None)
+            exhausted = f"{negate(stmt.test)} after some iterations"
+            return (self._loop((ast.unparse(stmt.test),), stmt.body, stmt.orelse, exhausted)
+                    + self._guarded(negate(stmt.test), stmt.orelse))
+        if isinstance(stmt, ast.Break):
+            return [((), _BREAK)]
+        if isinstance(stmt, ast.Continue):
+            return [((), _CONTINUE)]
+        if isinstance(stmt, ast.Try) or (hasattr(ast, "TryStar") and isinstance(stmt, ast.TryStar)):
+            return self._try(stmt)
+        if isinstance(stmt, (ast.With, ast.AsyncWith)):
+            return self.block(stmt.body)
+        if isinstance(stmt, ast.Match):
+            return self._match(stmt)
+        if isinstance(stmt, ast.Assert):
+            detail = f"AssertionError({ast.unparse(stmt.msg)})" if stmt.msg is not None else "AssertionError"
+            return [((negate(stmt.test),), {"kind": "raise", "exception": "AssertionError", "detail": detail}),
+                    ((ast.unparse(stmt.test),), None)]
+        return [((), None)]
+
+    def _guarded(self, condition, stmts):
+        return [((condition,) + conditions, outcome) for conditions, outcome in self.block(stmts)]
+
+    def _loop(self, entered, body, orelse, exhausted=None):
+        """Paths that run a loop's body under ``entered`` conditions.
+
+        A ``break`` falls through past the loop; an iteration that ends
+        normally or by ``continue`` runs ``orelse`` once ``exhausted`` holds.
+        ``orelse`` None means the loop never ends on its own.
+        """
+        paths = []
+        for conditions, outcome in self.block(body):
+            conditions = entered + conditions
+            if outcome is _BREAK:
+                paths.append((conditions, None))
+            elif outcome is not None and outcome is not _CONTINUE:
+                paths.append((conditions, outcome))
+            elif orelse is not None:
+                if exhausted:
+                    conditions += (exhausted,)
+                paths.extend((conditions + more, result) for more, result in self.block(orelse))
+        if len(paths) > self.max_paths:
+            raise PathExplosion(f"more than {self.max_paths} paths")
+        return paths
+
+    def _try(self, stmt):
+        paths = self.block(stmt.body + stmt.orelse)
+        for handler in stmt.handlers:
+            caught = ast.unparse(handler.type) if handler.type is not None else "an exception"
+            paths += self._guarded(f"try block raises {caught}", handler.body)
+        if stmt.finalbody:
+            final = self.block(stmt.finalbody)
+            # A return or raise inside finally overrides the try outcome
+            paths = [(c + more, result if result is not None else o)
+                     for c, o in paths for more, result in final]
+        return paths
+
+    def _match(self, stmt):
+        subject = ast.unparse(stmt.subject)
+        paths, exhaustive = [], False
+        for case in stmt.cases:
+            condition = f"{subject} matches {ast.unparse(case.pattern)}"
+            if case.guard is not None:
+                condition += f" and {ast.unparse(case.guard)}"
+            paths += self._guarded(condition, case.body)
+            if isinstance(case.pattern, ast.MatchAs) and case.pattern.pattern is None and case.guard is None:
+                exhaustive = True
+        if not exhaustive:
+            paths.append(((f"{subject} matches no case",), None))
+        return paths
+
+
+def _path_type(conditions, outcome):
+    if outcome["kind"] == "raise":
+        return "error_case"
+    if any(condition.startswith("not ") or any(marker in condition for marker in _EDGE_MARKERS)
+           for condition in conditions):
+        return "edge_case"
+    return "happy_path"
+
+
+def describe_path(conditions, outcome):
+    """Convert one enumerated path into the execution_paths entry format."""
+    when = " and ".join(conditions)
+    if outcome["kind"] == "raise":
+        expected = f"raises {outcome['detail']}" if outcome["detail"] != "raise" else "re-raises the caught exception"
+    else:
+        expected = f"returns {outcome['value']}"
+    description = expected[0].upper() + expected[1:]
+    return {
+        "path_type": _path_type(conditions, outcome),
+        "description": f"{description} when {when}" if when else description,
+        "test_inputs": f"inputs where {when}" if when else "any valid inputs",
+        "expected_behavior": expected,
+        "conditions": list(conditions),
+        "source": "static",
+    }
+
+
+def function_paths(node, max_paths=MAX_PATHS):
+    """Enumerate the execution paths of one function node.
+
+    Raises PathExplosion if the function has more than ``max_paths`` paths,
+    or none that leave it (a ``while True`` without ``break``).
+    """
+    paths = _PathWalker(max_paths).block(node.body)
+    if not paths:
+        raise PathExplosion("no path leaves the function")
+    return [describe_path(conditions, outcome or {"kind": "return", "value": "None"})
+            for conditions, outcome in paths]
+
+
+def enumerate_paths(source_code, function_names=None, max_paths=MAX_PATHS):
+    """Statically enumerate execution paths for the functions in a module.
+
+    Returns ``(execution_paths, uncharacterized)`` where ``uncharacterized``
+    lists the requested functions the static pass could not handle: those
+    missing from the parsed module, with too many paths or with no path
+    out of the function.
+    """
+    wanted = set(function_names) if function_names is not None else None
+    try:
+        tree = ast.parse(source_code)
+    except SyntaxError:
+        return {}, sorted(wanted or [])
+
+    execution_paths, uncharacterized = {}, []
+    for name, node in iter_functions(tree):
+        if wanted is not None and name not in wanted:
+            continue
+        try:
+            execution_paths[name] = function_paths(node, max_paths)
+        except PathExplosion:
+            uncharacterized.append(name)
+
+    if wanted is not None:
+        uncharacterized += sorted(wanted - set(execution_paths) - set(uncharacterized))
+    return execution_paths, uncharacterized
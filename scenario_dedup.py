@@ -0,0 +1,107 @@
+"""Local removal of near-duplicate test scenarios.
+
+The strategist often plans the same test more than once under different
+names: same function, equivalent inputs, reworded expectations. Each copy
+would cost a full writer call. Scenarios are compared per function on a
+normalised form of their inputs and expected output:
+
+* case, quoting, punctuation and filler words are ignored, and simple
+  plurals are folded (``returns`` and ``return`` match);
+* numbers are canonicalised (``2.0`` and ``2`` match), and two scenarios
+  with different numbers in their inputs are never duplicates;
+* inputs and expected output are compared separately, by Jaccard
+  similarity of their words and word pairs (so ``x == 1`` and ``x != 1``
+  differ), and both must be similar.
+
+Scenarios arrive sorted by priority, so the first of each cluster, which
+is kept, is its highest-priority member.
+"""
+import re
+
+SIMILARITY_THRESHOLD = 0.8
+
+# Numbers, keyword assignments (``a=``), identifiers and comparison operators
+_TOKEN = re.compile(r"-?\d+(?:\.\d+)?(?:e-?\d+)?|[a-z_][a-z0-9_]*\s*=(?!=)|[a-z_][a-z0-9_]*|[=!<>]=|[<>]")
+_NUMBER = re.compile(r"-?\d")
+_ALIASES = {"null": "none", "nil": "none", "raised": "raise", "raising": "raise", "throw": "raise",
+            "throws": "raise", "thrown": "raise"}
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "with", "for", "in", "on", "is", "are", "be", "it",
+    "should", "must", "will", "that", "this", "as", "value", "values", "input", "inputs", "expected",
+    "expect", "output", "result", "returns", "return", "call", "calling", "when", "given", "exception",
+}
+_PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+
+def _canonical(token):
+    if token.endswith("="):
+        return token.replace(" ", "")
+    if _NUMBER.match(token):
+        number = float(token)
+        return str(int(number)) if number.is_integer() else repr(number)
+    token = _ALIASES.get(token, token)
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        token = token[:-1]
+    return _ALIASES.get(token, token)
+
+
+def normalize(text):
+    """Canonical tokens of a scenario field, without filler words."""
+    tokens = (_canonical(t) for t in _TOKEN.findall(str(text or "").lower()))
+    return [t for t in tokens if t not in _STOPWORDS]
+
+
+def _shingles(tokens):
+    return frozenset(tokens) | frozenset(zip(tokens, tokens[1:]))
+
+
+def signature(scenario):
+    """``(input shingles, expected shingles, input numbers)`` describing what a scenario tests.
+
+    The description stands in for the inputs when neither inputs nor
+    expected output are given.
+    """
+    inputs = normalize(scenario.get("test_inputs"))
+    expected = normalize(scenario.get("expected_output"))
+    if not inputs and not expected:
+        inputs = normalize(scenario.get("description"))
+    numbers = frozenset(t for t in inputs if _NUMBER.match(t))
+    return _shingles(inputs), _shingles(expected), numbers
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def similarity(a, b):
+    """How alike two signatures are: the lower of the input and expected-output similarities.
+
+    0 when their input numbers differ or they share no non-empty field.
+    """
+    if a[2] != b[2]:
+        return 0.0
+    scores = [_jaccard(x, y) for x, y in zip(a[:2], b[:2]) if x and y]
+    return min(scores) if scores else 0.0
+
+
+def dedupe_scenarios(scenarios, threshold=SIMILARITY_THRESHOLD):
+    """Split scenarios into ``(kept, duplicates)``, keeping the input order.
+
+    Within each function a scenario is a duplicate when it is at least
+    ``threshold`` similar to an earlier kept one, or to a higher-priority
+    one when the list is not sorted.
+    """
+    order = sorted(range(len(scenarios)),
+                   key=lambda i: _PRIORITY_RANK.get(scenarios[i].get("priority", "medium"), 1))
+    representatives = {}
+    duplicates = set()
+    for i in order:
+        function_name = str(scenarios[i].get("function", "")).strip().lower()
+        sig = signature(scenarios[i])
+        kept = representatives.setdefault(function_name, [])
+        if any(similarity(sig, other) >= threshold for other in kept):
+            duplicates.add(i)
+        else:
+            kept.append(sig)
+    return ([s for i, s in enumerate(scenarios) if i not in duplicates],
+            [s for i, s in enumerate(scenarios) if i in duplicates])
@@ -0,0 +1,257 @@
+"""Central admission control for LLM requests.
+
+Every request that reaches the provider (cache misses and retries) first
+takes a ticket from the shared scheduler. A ticket is granted when:
+
+* the request is at the head of the queue. The queue is ordered by
+  scenario priority (``high`` first, calls outside a scenario ahead of all
+  writer calls) and then by arrival;
+* fewer requests than the current concurrency limit are in flight;
+* the request and token buckets (``rpm``/``tpm``) have room for it, using an
+  estimate of its tokens that is corrected once the real usage is known;
+* no rate-limit pause from a recent 429 is in effect.
+
+The concurrency limit adapts AIMD-style. It grows by ``1/limit`` per
+successful request and is cut multiplicatively on 429s or when latency
+spikes well above the moving average of the same kind of call (requests
+are labelled by node, so a slow writer call is not compared with a quick
+planning call). The limit is cut at most once per round trip: a 429 or
+spike from a request that was already in flight at the last cut reflects
+the old limit and is only counted.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PRIORITY_RANK = {"high": 1, "medium": 2, "low": 3}
+
+# Rank for calls made outside a scenario (analysis, paths, planning); they
+# unblock the rest of a file, so they go first
+PIPELINE_RANK = 0
+
+# Assumed completion size when estimating a request's tokens up front
+COMPLETION_TOKEN_ESTIMATE = 500
+
+_priority = contextvars.ContextVar("scheduler_priority", default=PIPELINE_RANK)
+
+
+@contextmanager
+def priority(level):
+    """Schedule requests made inside the block at a scenario priority (high/medium/low)."""
+    token = _priority.set(PRIORITY_RANK.get(str(level).lower(), PRIORITY_RANK["medium"]))
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def estimate_tokens(messages):
+    """Rough token count of a request: four characters per prompt token plus a typical completion."""
+    return sum(len(str(m.content)) for m in messages) // 4 + COMPLETION_TOKEN_ESTIMATE
+
+
+class TokenBucket:
+    """Continuously refilling bucket; ``rate`` is units per second, None means unlimited.
+
+    Not thread-safe on its own; the scheduler serialises access.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else (rate * 60 if rate else None)
+        self.clock = clock
+        self.level = self.capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        if self.rate:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until ``amount`` units are available (0 if they are now)."""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        # A request larger than the bucket only has to wait for a full bucket
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed / self.rate)
+
+    def take(self, amount):
+        if self.rate:
+            self._refill()
+            self.level -= amount
+
+    def give_back(self, amount):
+        """Return (or, if negative, additionally charge) units after the fact."""
+        if self.rate:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+
+class Ticket:
+    __slots__ = ("rank", "seq", "tokens", "kind", "granted_at", "grant")
+
+    def __init__(self, rank, seq, tokens, kind=None):
+        self.rank = rank
+        self.seq = seq
+        self.tokens = tokens
+        self.kind = kind
+        self.granted_at = None
+        self.grant = None
+
+    def __lt__(self, other):
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+
+class Scheduler:
+    """Priority queue in front of the provider with rate limits and adaptive concurrency."""
+
+    def __init__(self, rpm=None, tpm=None, max_concurrency=16, min_concurrency=1,
+                 decrease_factor=0.5, spike_factor=3.0, clock=time.monotonic):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.decrease_factor = decrease_factor
+        self.spike_factor = spike_factor
+        self.clock = clock
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.requests = TokenBucket(rpm / 60 if rpm else None, clock=clock)
+        self.tokens = TokenBucket(tpm / 60 if tpm else None, clock=clock)
+        self.paused_until = 0.0
+        # Moving average latency per kind of call
+        self.latency_averages = {}
+        self.rate_limited = 0
+        self.latency_spikes = 0
+        self._queue = []
+        self._seq = itertools.count()
+        self._grants = 0
+        # Grants made before the last cut; their results do not cut again
+        self._cut_at_grant = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def configure(self, rpm=None, tpm=None, max_concurrency=None):
+        """Change limits before a run; None leaves a setting unchanged."""
+        with self._lock:
+            if rpm is not None:
+                self.requests = TokenBucket(rpm / 60, clock=self.clock)
+            if tpm is not None:
+                self.tokens = TokenBucket(tpm / 60, clock=self.clock)
+            if max_concurrency is not None:
+                self.max_concurrency = max_concurrency
+                self.limit = min(self.limit, max_concurrency) if self.in_flight else float(max_concurrency)
+            self._changed.notify_all()
+
+    def _enqueue(self, tokens, kind):
+        with self._lock:
+            ticket = Ticket(_priority.get(), next(self._seq), tokens, kind)
+            heapq.heappush(self._queue, ticket)
+            return ticket
+
+    def _try_grant(self, ticket):
+        """Grant ``ticket`` if it may go now; returns seconds to wait otherwise (None: until notified)."""
+        if self._queue[0] is not ticket or self.in_flight >= max(self.min_concurrency, int(self.limit)):
+            return None
+        wait = max(self.paused_until - self.clock(),
+                   self.requests.wait_time(1), self.tokens.wait_time(ticket.tokens))
+        if wait > 0:
+            return wait
+        heapq.heappop(self._queue)
+        self.requests.take(1)
+        self.tokens.take(ticket.tokens)
+        self.in_flight += 1
+        ticket.granted_at = self.clock()
+        ticket.grant = self._grants
+        self._grants += 1
+        # The next ticket in line may be able to go as well
+        self._changed.notify_all()
+        return 0.0
+
+    def acquire(self, estimated_tokens=0, kind=None):
+        """Block until a request may be sent; returns the ticket to release afterwards.
+
+        ``kind`` labels the call (e.g. its node) for latency comparisons.
+        """
+        ticket = self._enqueue(estimated_tokens, kind)
+        with self._lock:
+            while True:
+                wait = self._try_grant(ticket)
+                if wait == 0.0:
+                    return ticket
+                self._changed.wait(timeout=wait)
+
+    async def aacquire(self, estimated_tokens=0, kind=None):
+        """Async variant of ``acquire``; polls instead of blocking the event loop."""
+        ticket = self._enqueue(estimated_tokens, kind)
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_grant(ticket)
+                if wait == 0.0:
+                    return ticket
+                await asyncio.sleep(min(wait, 0.05) if wait else 0.01)
+        except asyncio.CancelledError:
+            with self._lock:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._changed.notify_all()
+            raise
+
+    def release(self, ticket, used_tokens=None, rate_limited=False, retry_after=None):
+        """Finish a request and adapt the concurrency limit to how it went.
+
+        ``used_tokens`` corrects the bucket for the ticket's estimate.
+        ``rate_limited`` marks a 429, optionally with the server's
+        ``retry_after`` in seconds.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if used_tokens is not None:
+                self.tokens.give_back(ticket.tokens - used_tokens)
+            latency = self.clock() - ticket.granted_at
+            average = self.latency_averages.get(ticket.kind)
+            if rate_limited:
+                self.rate_limited += 1
+                self._decrease(ticket)
+                if retry_after:
+                    self.paused_until = max(self.paused_until, self.clock() + retry_after)
+            elif average is not None and latency > self.spike_factor * average:
+                self.latency_spikes += 1
+                self._decrease(ticket)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            if not rate_limited:
+                self.latency_averages[ticket.kind] = latency if average is None else 0.8 * average + 0.2 * latency
+            self._changed.notify_all()
+
+    def _decrease(self, ticket):
+        """Cut the limit, unless ``ticket`` was sent before the last cut."""
+        if ticket.grant < self._cut_at_grant:
+            return
+        self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+        self._cut_at_grant = self._grants
+
+    def report(self):
+        """One-line summary for the end of a run."""
+        return (f"Scheduler: concurrency limit {self.limit:.1f}/{self.max_concurrency}, "
+                f"{self.rate_limited} rate-limited responses, {self.latency_spikes} latency spikes")
+
+
+def _env_number(name):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+default_scheduler = Scheduler(
+    rpm=_env_number("TESTGEN_RPM"),
+    tpm=_env_number("TESTGEN_TPM"),
+    max_concurrency=int(os.getenv("TESTGEN_MAX_CONCURRENCY", "16")),
+)
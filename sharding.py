@@ -0,0 +1,163 @@
+"""Splitting one repository's generation across machines, and merging the results.
+
+``--shard i/n`` runs the pipeline on shard ``i`` of ``n`` (1-based). Every
+machine computes the same assignment from the same checkout without
+talking to the others. Files are weighed by their estimated work (the
+number of functions to test, plus one for the per-file analysis) and
+handed out heaviest first, each to the least-loaded shard. Ties between
+files are broken by a stable hash of their path relative to the
+repository, so the order of discovery does not matter.
+
+Each shard writes to its own ``shard-<i>-of-<n>`` directory below the
+output directory, with its own manifest, metrics and conftest.py.
+``merge_shards`` combines those directories into one test tree:
+
+* test modules are copied into the output directory;
+* conftest.py fixtures are merged. A shard fixture whose name is already
+  taken by a different fixture is instead defined in that shard's modules
+  that use it, where it takes precedence over conftest.py;
+* manifests, metrics, budget reports and validation caches are combined.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from budget import BUDGET_REPORT_NAME
+from manifest import MANIFEST_NAME, RunManifest, file_hash
+from metrics import default_metrics
+from output_assembler import (CONFTEST_NAME, add_local_fixtures, conftest_fixtures, read_shared_fixtures,
+                              update_conftest)
+from validation import VALIDATION_CACHE_NAME, ValidationCache
+
+_SHARD = re.compile(r"^\s*(\d+)\s*/\s*(\d+)\s*$")
+_SHARD_DIR = re.compile(r"^shard-(\d+)-of-(\d+)$")
+
+
+def parse_shard(spec):
+    """``(index, count)`` from ``"i/n"`` with 1 <= i <= n; raises ValueError otherwise."""
+    match = _SHARD.match(str(spec))
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise ValueError(f"invalid shard {spec!r}; use i/n with 1 <= i <= n, e.g. 2/4")
+    return int(match.group(1)), int(match.group(2))
+
+
+def shard_dir(output_dir, index, count):
+    return os.path.join(output_dir, f"shard-{index}-of-{count}")
+
+
+def find_shard_dirs(output_dir):
+    """The ``shard-<i>-of-<n>`` directories below ``output_dir``, in shard order."""
+    try:
+        names = os.listdir(output_dir)
+    except OSError:
+        return []
+    shards = sorted((int(m.group(2)), int(m.group(1)), name) for name in names if (m := _SHARD_DIR.match(name)))
+    return [os.path.join(output_dir, name) for _, _, name in shards]
+
+
+def stable_hash(file_path, repo_path):
+    """Hash of a file's path relative to the repository, the same on every machine."""
+    relative = os.path.relpath(file_path, repo_path).replace(os.sep, "/")
+    return hashlib.sha256(relative.encode("utf-8")).hexdigest()
+
+
+def estimated_work(code_map):
+    """Relative cost of a file: one per function to test, plus one for its analysis."""
+    return len(code_map.get("functions", [])) + 1
+
+
+def assign_shards(files, count, work, repo_path):
+    """``{file: shard index}`` balancing ``work(file)`` over ``count`` shards."""
+    loads = [0] * count
+    assignment = {}
+    for file_path in sorted(files, key=lambda f: (-work(f), stable_hash(f, repo_path))):
+        shard = min(range(count), key=lambda i: (loads[i], i))
+        loads[shard] += work(file_path)
+        assignment[file_path] = shard + 1
+    return assignment
+
+
+def select_shard(files, index, count, work, repo_path):
+    """The files of shard ``index``, in their original order."""
+    assignment = assign_shards(files, count, work, repo_path)
+    return [f for f in files if assignment[f] == index]
+
+
+def _load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge_conftest(shard_path, output_dir, shard_modules):
+    """Merge a shard's conftest.py; returns how many fixtures had to stay in the shard's modules."""
+    conftest_path = os.path.join(output_dir, CONFTEST_NAME)
+    merged = read_shared_fixtures(conftest_path)
+    shared, local = [], {}
+    for name, (key, snippet) in conftest_fixtures(os.path.join(shard_path, CONFTEST_NAME)).items():
+        if name not in merged:
+            shared.append(snippet)
+        elif merged[name] != key:
+            local[name] = snippet
+    update_conftest(conftest_path, shared)
+    for module_path in shard_modules:
+        with open(module_path, "r", encoding="utf-8") as f:
+            source = f.read()
+        used = [snippet for name, snippet in local.items()
+                if re.search(rf"\b{name}\b", source) and not re.search(rf"^(?:async\s+)?def {name}\(", source, re.M)]
+        if used:
+            add_local_fixtures(module_path, used)
+    return len(local)
+
+
+def merge_shards(shard_dirs, output_dir, metrics_name):
+    """Combine shard output directories into ``output_dir``; returns one summary line per shard.
+
+    The shards' metrics reports (``<metrics_name>.json``) are loaded into
+    ``default_metrics``.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = RunManifest(output_dir, None)
+    validation = ValidationCache(os.path.join(output_dir, VALIDATION_CACHE_NAME))
+    budget = {"spent": {}, "skipped": []}
+    lines = []
+    for shard_path in shard_dirs:
+        modules = []
+        for name in sorted(os.listdir(shard_path)):
+            if name.startswith("test_") and name.endswith(".py"):
+                target = os.path.join(output_dir, name)
+                shutil.copyfile(os.path.join(shard_path, name), target)
+                modules.append(target)
+        kept_local = _merge_conftest(shard_path, output_dir, modules)
+
+        shard_manifest = _load_json(os.path.join(shard_path, MANIFEST_NAME)) or {}
+        for source_path, entry in shard_manifest.get("files", {}).items():
+            output_path = os.path.join(output_dir, os.path.basename(entry.get("output", "")))
+            manifest.entries[source_path] = {**entry, "output": output_path, "output_hash": file_hash(output_path)}
+
+        metrics_path = os.path.join(shard_path, f"{metrics_name}.json")
+        if os.path.exists(metrics_path):
+            default_metrics.load_json(metrics_path)
+        validation.entries.update(ValidationCache(os.path.join(shard_path, VALIDATION_CACHE_NAME)).entries)
+        shard_budget = _load_json(os.path.join(shard_path, BUDGET_REPORT_NAME))
+        if shard_budget:
+            for kind, amount in shard_budget.get("spent", {}).items():
+                budget["spent"][kind] = budget["spent"].get(kind, 0) + amount
+            budget["skipped"].extend(shard_budget.get("skipped", []))
+
+        line = f"{os.path.basename(os.path.normpath(shard_path))}: {len(modules)} test modules"
+        if kept_local:
+            line += f", {kept_local} conflicting fixtures kept in its modules"
+        lines.append(line)
+
+    manifest.save()
+    if validation.entries:
+        validation.save()
+    if budget["spent"] or budget["skipped"]:
+        with open(os.path.join(output_dir, BUDGET_REPORT_NAME), "w", encoding="utf-8") as f:
+            json.dump(budget, f, indent=2)
+    return lines
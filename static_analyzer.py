@@ -0,0 +1,151 @@
+"""Deterministic code analysis built on Python's ``ast`` module.
+
+Produces the same ``code_map`` structure the code analyzer agent used to
+request from the LLM, with exact signatures and a measured cyclomatic
+complexity instead of a guessed label.
+"""
+import ast
+
+# Upper bounds of cyclomatic complexity for each complexity label
+SIMPLE_MAX = 3
+MEDIUM_MAX = 7
+
+_COMPLEXITY_RANK = {"simple": 0, "medium": 1, "complex": 2}
+
+
+def cyclomatic_complexity(node):
+    """McCabe complexity of a function body: one plus its decision points.
+
+    Nested functions and classes are measured separately and not counted.
+    """
+    complexity = 1
+    stack = list(ast.iter_child_nodes(node))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        if isinstance(child, (ast.If, ast.IfExp, ast.For, ast.AsyncFor, ast.While,
+                              ast.ExceptHandler, ast.Assert, ast.match_case)):
+            complexity += 1
+        elif isinstance(child, ast.comprehension):
+            complexity += 1 + len(child.ifs)
+        elif isinstance(child, ast.BoolOp):
+            complexity += len(child.values) - 1
+        stack.extend(ast.iter_child_nodes(child))
+    return complexity
+
+
+def complexity_label(complexity):
+    """Map a cyclomatic complexity to the simple|medium|complex scale."""
+    if complexity <= SIMPLE_MAX:
+        return "simple"
+    if complexity <= MEDIUM_MAX:
+        return "medium"
+    return "complex"
+
+
+def _params(node, is_method):
+    args = node.args
+    names = [a.arg for a in args.posonlyargs + args.args]
+    if args.vararg:
+        names.append(f"*{args.vararg.arg}")
+    names.extend(a.arg for a in args.kwonlyargs)
+    if args.kwarg:
+        names.append(f"**{args.kwarg.arg}")
+
+    decorators = {_decorator_name(d) for d in node.decorator_list}
+    if is_method and "staticmethod" not in decorators and names and names[0] in ("self", "cls"):
+        names = names[1:]
+    return names
+
+
+def _decorator_name(node):
+    if isinstance(node, ast.Call):
+        node = node.func
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return ""
+
+
+def _description(node):
+    docstring = ast.get_docstring(node)
+    return docstring.strip().splitlines()[0] if docstring else ""
+
+
+def _function_info(node, qualified_name, is_method):
+    complexity = cyclomatic_complexity(node)
+    return {
+        "name": qualified_name,
+        "params": _params(node, is_method),
+        "return_type": ast.unparse(node.returns) if node.returns else "unknown",
+        "complexity": complexity_label(complexity),
+        "cyclomatic_complexity": complexity,
+        "description": _description(node),
+        "is_async": isinstance(node, ast.AsyncFunctionDef),
+        "lineno": node.lineno,
+        "end_lineno": node.end_lineno,
+    }
+
+
+def _collect_class(node, prefix, functions, classes):
+    name = f"{prefix}{node.name}"
+    methods = []
+    classes.append({
+        "name": name,
+        "methods": methods,
+        "bases": [ast.unparse(base) for base in node.bases],
+        "description": _description(node),
+        "lineno": node.lineno,
+        "end_lineno": node.end_lineno,
+    })
+    for child in node.body:
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            methods.append(child.name)
+            functions.append(_function_info(child, f"{name}.{child.name}", is_method=True))
+        elif isinstance(child, ast.ClassDef):
+            _collect_class(child, f"{name}.", functions, classes)
+
+
+def iter_functions(tree):
+    """Yield ``(qualified_name, node)`` for every module function and method.
+
+    Names follow the code_map convention: ``func``, ``Class.method`` and
+    ``Outer.Inner.method``.
+    """
+    def walk(body, prefix):
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                yield f"{prefix}{node.name}", node
+            elif isinstance(node, ast.ClassDef):
+                yield from walk(node.body, f"{prefix}{node.name}.")
+
+    yield from walk(tree.body, "")
+
+
+def analyze_source(source_code):
+    """Build a ``code_map`` for a module.
+
+    Raises SyntaxError if the source cannot be parsed.
+    """
+    tree = ast.parse(source_code)
+    functions, classes, imports = [], [], []
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append(_function_info(node, node.name, is_method=False))
+        elif isinstance(node, ast.ClassDef):
+            _collect_class(node, "", functions, classes)
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.append(ast.unparse(node))
+
+    overall = max((f["complexity"] for f in functions), key=_COMPLEXITY_RANK.get, default="simple")
+    return {
+        "functions": functions,
+        "classes": classes,
+        "imports": imports,
+        "overall_complexity": overall,
+    }
@@ -0,0 +1,290 @@
+"""Shared parsing layer for the JSON-producing agents.
+
+Replies are turned into validated data in three steps:
+
+1. ``extract_json`` finds the JSON in the reply (fenced block or bare, with
+   prose around it) and, if it does not parse, repairs it locally: trailing
+   commas, Python literals and truncated objects/arrays are fixed without
+   another LLM call.
+2. The result is validated against the pydantic schema for its stage.
+   Entries that do not fit are dropped rather than failing the whole reply.
+3. When the provider supports it, ``response_format`` asks it to follow the
+   same schema in the first place (see ``llm_client.call_llm``).
+"""
+import json
+import re
+from typing import Dict, List, Literal
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, field_validator
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)(?:```|$)", re.S)
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONRepairError(ValueError):
+    """Raised when a reply contains no JSON that can be recovered."""
+
+
+# --- Extraction and repair ---
+
+def _normalize(text):
+    """Drop trailing commas and map Python literals to JSON, outside strings."""
+    out, i, in_string = [], 0, False
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            out.append(char)
+            if char == "\\":
+                out.append(text[i + 1:i + 2])
+                i += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char == ",":
+            rest = text[i + 1:].lstrip()
+            if not rest.startswith(("}", "]")):
+                out.append(char)
+        else:
+            word = re.match(r"True|False|None", text[i:]) if char in "TFN" else None
+            if word and not (out and (out[-1].isalnum() or out[-1] == "_")):
+                out.append(_LITERALS[word.group()])
+                i += len(word.group())
+                continue
+            out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def _close_truncated(text):
+    """Close a JSON document that was cut off, dropping its last incomplete entry."""
+    stack, in_string, escaped = [], False, False
+    # Places where the document can be cut cleanly: before a comma, or failing
+    # that right after an opener
+    comma_cuts, opener_cuts = [], []
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(char)
+            opener_cuts.append((i + 1, list(stack)))
+        elif char in "}]":
+            if stack:
+                stack.pop()
+        elif char == ",":
+            comma_cuts.append((i, list(stack)))
+
+    def closed(prefix, open_stack):
+        return prefix + "".join(_CLOSERS[c] for c in reversed(open_stack))
+
+    candidates = [closed(text + ('"' if in_string else ""), stack)]
+    for cuts in (comma_cuts, opener_cuts):
+        candidates += [closed(text[:index], open_stack) for index, open_stack in reversed(cuts)]
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    raise JSONRepairError("could not close truncated JSON")
+
+
+def _decode(text, expect):
+    """Decode the first JSON value in ``text``; returns ``(value, repaired)``."""
+    openers = "[" if expect is list else "{" if expect is dict else "{["
+    starts = [i for i in (text.find(c) for c in openers) if i != -1]
+    if not starts:
+        raise JSONRepairError("no JSON object or array found")
+    text = text[min(starts):]
+    decoder = json.JSONDecoder()
+    try:
+        return decoder.raw_decode(text)[0], False
+    except ValueError:
+        pass
+    normalized = _normalize(text)
+    try:
+        return decoder.raw_decode(normalized)[0], True
+    except ValueError:
+        return _close_truncated(normalized.rstrip()), True
+
+
+def extract_json(response_text, expect=None):
+    """Find, and if needed repair, the JSON value in an LLM reply.
+
+    ``expect`` (``dict`` or ``list``) picks which kind of value to look for.
+    Returns ``(value, repaired)``; raises JSONRepairError if nothing usable
+    is found.
+    """
+    candidates = [m.group(1) for m in _FENCE.finditer(response_text)] + [response_text]
+    last_error = None
+    for candidate in candidates:
+        try:
+            return _decode(candidate, expect)
+        except JSONRepairError as e:
+            last_error = e
+    raise last_error
+
+
+# --- Schemas ---
+
+class _Lenient(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+
+class FunctionInfo(_Lenient):
+    name: str
+    params: List[str] = Field(default_factory=list)
+    return_type: str = "unknown"
+    complexity: str = "simple"
+    description: str = ""
+
+    @field_validator("params", mode="before")
+    @classmethod
+    def _params(cls, value):
+        return [str(p) for p in value] if isinstance(value, list) else []
+
+
+class ClassInfo(_Lenient):
+    name: str
+    methods: List[str] = Field(default_factory=list)
+    description: str = ""
+
+
+class CodeMap(_Lenient):
+    functions: List[FunctionInfo] = Field(default_factory=list)
+    classes: List[ClassInfo] = Field(default_factory=list)
+    imports: List[str] = Field(default_factory=list)
+    overall_complexity: str = "unknown"
+
+
+class ExecutionPath(_Lenient):
+    path_type: Literal["happy_path", "edge_case", "error_case"] = "happy_path"
+    description: str = ""
+    test_inputs: str = ""
+    expected_behavior: str = ""
+
+    @field_validator("path_type", mode="before")
+    @classmethod
+    def _path_type(cls, value):
+        value = str(value).strip().lower().replace(" ", "_").replace("-", "_")
+        return value if value in ("happy_path", "edge_case", "error_case") else "edge_case"
+
+    @field_validator("test_inputs", "expected_behavior", "description", mode="before")
+    @classmethod
+    def _text(cls, value):
+        return value if isinstance(value, str) else json.dumps(value)
+
+
+class TestScenario(_Lenient):
+    __test__ = False  # Not a pytest test class despite the name
+
+    function: str
+    test_name: str = ""
+    description: str = ""
+    priority: Literal["high", "medium", "low"] = "medium"
+    test_type: str = "unit"
+    setup_required: str = ""
+    test_inputs: str = ""
+    expected_output: str = ""
+
+    @field_validator("priority", mode="before")
+    @classmethod
+    def _priority(cls, value):
+        value = str(value).strip().lower()
+        return value if value in ("high", "medium", "low") else "medium"
+
+    @field_validator("setup_required", "test_inputs", "expected_output", "description", mode="before")
+    @classmethod
+    def _text(cls, value):
+        return value if isinstance(value, str) else json.dumps(value)
+
+
+class ScenarioPlan(BaseModel):
+    """Object wrapper for providers whose structured output must be an object."""
+    scenarios: List[TestScenario]
+
+
+# JSON schemas sent as ``response_format`` by providers that support them
+RESPONSE_SCHEMAS = {
+    "code_map": CodeMap.model_json_schema(),
+    "execution_paths": TypeAdapter(Dict[str, List[ExecutionPath]]).json_schema(),
+    "test_scenarios": ScenarioPlan.model_json_schema(),
+    "descriptions": TypeAdapter(Dict[str, str]).json_schema(),
+}
+
+
+def _valid_items(model, items):
+    """Validate each item on its own, keeping the ones that fit."""
+    valid = []
+    for item in items if isinstance(items, list) else []:
+        try:
+            valid.append(model.model_validate(item).model_dump())
+        except ValidationError:
+            continue
+    return valid
+
+
+def _report_repair(repaired, what):
+    if repaired:
+        print(f"Repaired malformed JSON in {what} reply")
+
+
+# --- Stage parsers ---
+
+def parse_code_map(response_text):
+    """Validated code map from a code analyzer reply."""
+    data, repaired = extract_json(response_text, dict)
+    _report_repair(repaired, "code analyzer")
+    if not isinstance(data, dict):
+        raise JSONRepairError("code map is not a JSON object")
+    imports = data.get("imports") if isinstance(data.get("imports"), list) else []
+    return {
+        "functions": _valid_items(FunctionInfo, data.get("functions")),
+        "classes": _valid_items(ClassInfo, data.get("classes")),
+        "imports": [i for i in imports if isinstance(i, str)],
+        "overall_complexity": str(data.get("overall_complexity", "unknown")),
+    }
+
+
+def parse_execution_paths(response_text):
+    """Validated ``{function: [path, ...]}`` mapping from a path analyzer reply."""
+    data, repaired = extract_json(response_text, dict)
+    _report_repair(repaired, "path analyzer")
+    if not isinstance(data, dict):
+        raise JSONRepairError("execution paths are not a JSON object")
+    return {str(name): paths for name, paths in
+            ((name, _valid_items(ExecutionPath, paths)) for name, paths in data.items()) if paths}
+
+
+def parse_test_scenarios(response_text):
+    """Validated scenario list from a strategist reply (bare array or ``{"scenarios": [...]}``)."""
+    data, repaired = extract_json(response_text)
+    _report_repair(repaired, "test strategist")
+    if isinstance(data, dict):
+        data = data.get("scenarios", next((v for v in data.values() if isinstance(v, list)), None))
+    if not isinstance(data, list):
+        raise JSONRepairError("test scenarios are not a JSON array")
+    scenarios = _valid_items(TestScenario, data)
+    for i, scenario in enumerate(scenarios):
+        if not scenario["test_name"]:
+            function_name = re.sub(r"\W+", "_", scenario["function"]).strip("_").lower()
+            scenario["test_name"] = f"test_{function_name}_{i}"
+    return scenarios
+
+
+def parse_descriptions(response_text):
+    """``{function: description}`` mapping from an enrichment reply."""
+    data, repaired = extract_json(response_text, dict)
+    _report_repair(repaired, "description")
+    if not isinstance(data, dict):
+        raise JSONRepairError("descriptions are not a JSON object")
+    return {str(name): text for name, text in data.items() if isinstance(text, str)}
@@ -1,21 +1,14 @@
 import json
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
-import os
-from dotenv import load_dotenv
+from llm_client import call_llm, acall_llm
+import metrics
+import structured_output
+from context_slicer import attach_context
+from scenario_dedup import dedupe_scenarios
 
-load_dotenv()
-llm = ChatOpenAI(api_key=os.getenv("OPENAI_API_KEY"), model="gpt-4", temperature=0.1)
+LLM_NODE = "test_strategist"
 
-def test_strategist_node(state):
-    """Creates a filtered test plan using the LLM"""
-    print("Agent: Test Strategist")
-    
-    if not state.get("execution_paths"):
-        print("No execution paths to create test scenarios")
-        return {**state, "test_scenarios": [], "generated_tests": [], "current_scenario_index": 0}
-
-    system_prompt = """You are a test strategist. Based on the code analysis and execution paths, create a comprehensive test plan.
+SYSTEM_PROMPT = """You are a test strategist. Based on the code analysis and execution paths, create a comprehensive test plan.
 Prioritize:
 1. Critical functionality tests
 2. Edge cases that are likely to break  
@@ -36,47 +29,107 @@ Return ONLY a valid JSON array of test scenarios:
     }
 ]"""
 
+def build_messages(state):
+    """Builds the test planning prompt"""
+    gaps = state.get("coverage_gaps")
+    functions = state["code_map"].get("functions", [])
     context = {
-        "functions": state["code_map"].get("functions", []),
+        "functions": [f for f in functions if f.get("name") in gaps] if gaps else functions,
         "execution_paths": state["execution_paths"]
     }
-    
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"Create test scenarios for:\n{json.dumps(context, indent=2)}")
+    if gaps:
+        # Existing tests cover everything else; plan only for what they miss
+        context["uncovered_code"] = gaps
+        request = ("Create test scenarios that exercise the uncovered lines and branches "
+                   "(not already covered by existing tests) of:")
+    else:
+        request = "Create test scenarios for:"
+
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
+        HumanMessage(content=f"{request}\n{json.dumps(context, indent=2)}")
     ]
+
+def sort_by_priority(test_scenarios):
+    """Sorts scenarios in place, high priority first"""
+    priority_order = {"high": 0, "medium": 1, "low": 2}
+    test_scenarios.sort(key=lambda x: priority_order.get(x.get("priority", "medium"), 1))
+    return test_scenarios
+
+def parse_test_scenarios(response_text):
+    """Extracts the scenario list from the LLM response, sorted by priority"""
+    with metrics.parse_guard():
+        test_scenarios = structured_output.parse_test_scenarios(response_text)
+
+    sort_by_priority(test_scenarios)
+    print(f"Created {len(test_scenarios)} test scenarios")
+    return test_scenarios
+
+def scenarios_from_paths(execution_paths):
+    """One scenario per execution path, used when the LLM's plan cannot be recovered"""
+    scenarios = []
+    for function_name, paths in execution_paths.items():
+        for i, path in enumerate(paths):
+            path_type = path.get("path_type", "happy_path")
+            scenarios.append({
+                "function": function_name,
+                "test_name": f"test_{function_name.replace('.', '_').lower()}_{path_type}_{i}",
+                "description": path.get("description", ""),
+                "priority": "high" if path_type == "happy_path" else "medium",
+                "test_type": "error_handling" if path_type == "error_case" else "unit",
+                "setup_required": "none",
+                "test_inputs": path.get("test_inputs", ""),
+                "expected_output": path.get("expected_behavior", ""),
+            })
+    print(f"Planned {len(scenarios)} test scenarios from execution paths")
+    return sort_by_priority(scenarios)
+
+def remove_duplicates(test_scenarios):
+    """Drops near-duplicate scenarios so each costs at most one writer call"""
+    kept, duplicates = dedupe_scenarios(test_scenarios)
+    if duplicates:
+        print(f"Removed {len(duplicates)} duplicate scenarios of {len(test_scenarios)} "
+              f"({len(duplicates)} writer calls saved)")
+    return kept
+
+def test_strategist_node(state, dedupe=True):
+    """Creates a filtered test plan using the LLM"""
+    print("Agent: Test Strategist")
+    
+    if not state.get("execution_paths"):
+        print("No execution paths to create test scenarios")
+        return {"test_scenarios": [], "current_scenario_index": 0}
     
     try:
-        response = llm.invoke(messages)
-        response_text = response.content.strip()
-        
-        # Extract JSON from response
-        if "```json" in response_text:
-            json_start = response_text.find("```json") + 7
-            json_end = response_text.find("```", json_start)
-            json_text = response_text[json_start:json_end].strip()
-        elif "```" in response_text:
-            json_start = response_text.find("```") + 3
-            json_end = response_text.find("```", json_start)
-            json_text = response_text[json_start:json_end].strip()
-        else:
-            json_text = response_text
-        
-        test_scenarios = json.loads(json_text)
-        
-        # Sort by priority
-        priority_order = {"high": 0, "medium": 1, "low": 2}
-        test_scenarios.sort(key=lambda x: priority_order.get(x.get("priority", "medium"), 1))
-        
-        print(f"Created {len(test_scenarios)} test scenarios")
-        
+        response = call_llm(LLM_NODE, build_messages(state), schema="test_scenarios")
+        test_scenarios = attach_context(parse_test_scenarios(response.content), state["source_code"],
+                                        state.get("dependency_context"))
     except (json.JSONDecodeError, Exception) as e:
         print(f"Error parsing test scenarios: {e}")
-        test_scenarios = []
-    
-    return {
-        **state,
-        "test_scenarios": test_scenarios, 
-        "generated_tests": [],
-        "current_scenario_index": 0
-    }
\ No newline at end of file
+        test_scenarios = attach_context(scenarios_from_paths(state["execution_paths"]), state["source_code"],
+                                        state.get("dependency_context"))
+
+    if dedupe:
+        test_scenarios = remove_duplicates(test_scenarios)
+    return {"test_scenarios": test_scenarios, "current_scenario_index": 0}
+
+async def atest_strategist_node(state, dedupe=True):
+    """Async variant of test_strategist_node."""
+    print("Agent: Test Strategist")
+
+    if not state.get("execution_paths"):
+        print("No execution paths to create test scenarios")
+        return {"test_scenarios": [], "current_scenario_index": 0}
+
+    try:
+        response = await acall_llm(LLM_NODE, build_messages(state), schema="test_scenarios")
+        test_scenarios = attach_context(parse_test_scenarios(response.content), state["source_code"],
+                                        state.get("dependency_context"))
+    except (json.JSONDecodeError, Exception) as e:
+        print(f"Error parsing test scenarios: {e}")
+        test_scenarios = attach_context(scenarios_from_paths(state["execution_paths"]), state["source_code"],
+                                        state.get("dependency_context"))
+
+    if dedupe:
+        test_scenarios = remove_duplicates(test_scenarios)
+    return {"test_scenarios": test_scenarios, "current_scenario_index": 0}
@@ -0,0 +1,40 @@
+import asyncio
+from collections import Counter
+from langgraph.types import Overwrite
+from test_writer_agent import emit_test
+
+STAGE = "validated"
+
+def validate_tests(state, validator):
+    """Runs the generated tests and applies the validator's flag/drop policy.
+
+    Each test is streamed to the output file as soon as its run finishes.
+    """
+    tests = state.get("generated_tests") or []
+
+    def on_result(index, result):
+        emit_test(index, validator.apply(tests[index], result), stage=STAGE)
+
+    results = validator.validate(tests, state["file_path"], on_result=on_result)
+    kept = [validator.apply(code, result) for code, result in zip(tests, results)]
+
+    outcomes = Counter(result["outcome"] for result in results)
+    cached = sum(result["cached"] for result in results)
+    print(f"Validated {len(tests)} tests: " + ", ".join(f"{n} {outcome}" for outcome, n in sorted(outcomes.items()))
+          + f" ({cached} cached)")
+
+    # The reducer would append; the validated list replaces the writer's instead
+    return {
+        "generated_tests": Overwrite([code for code in kept if code is not None]),
+        "validation_results": results,
+    }
+
+def test_validator_node(state, validator):
+    """Runs every generated test in a sandboxed pytest process, flagging or dropping failures"""
+    print(f"Agent: Test Validator ({validator.mode} failures, {validator.workers} workers)")
+    return validate_tests(state, validator)
+
+async def atest_validator_node(state, validator):
+    """Async variant of test_validator_node; the test runs happen in a worker thread"""
+    print(f"Agent: Test Validator ({validator.mode} failures, {validator.workers} workers)")
+    return await asyncio.to_thread(validate_tests, state, validator)
@@ -1,26 +1,17 @@
+import asyncio
+import contextvars
 import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
-import os
-from dotenv import load_dotenv
+from budget import default_budget
+from llm_client import call_llm, acall_llm
+import metrics
+import scheduler
 
-load_dotenv()
-llm = ChatOpenAI(api_key=os.getenv("OPENAI_API_KEY"), model="gpt-4", temperature=0.1)
+LLM_NODE = "test_writer"
 
-def test_writer_node(state):
-    """Writes test code for a single scenario using LLM"""
-    print("Agent: Test Writer")
-
-    scenarios = state["test_scenarios"]
-    current_index = state.get("current_scenario_index", 0)
-    
-    if current_index >= len(scenarios):
-        return state
-    
-    current_scenario = scenarios[current_index]
-    print(f"Writing test {current_index + 1}/{len(scenarios)}: {current_scenario.get('test_name', 'Unknown')}")
-    
-    system_prompt = """You are a Python test code writer. Write a complete, executable pytest test function based on the scenario.
+SYSTEM_PROMPT = """You are a Python test code writer. Write a complete, executable pytest test function based on the scenario.
 
 Requirements:
 1. Use pytest conventions
@@ -33,46 +24,361 @@ Requirements:
 
 Return ONLY the complete test code, no explanations."""
 
-    # Include relevant source code context
-    source_snippet = state["source_code"][:1500] if state["source_code"] else ""
-    
-    messages = [
-        SystemMessage(content=system_prompt),
+PARAMETRIZE_PROMPT = """You are a Python test code writer. Write pytest tests covering ALL of the given scenarios for one function.
+
+Requirements:
+1. Put the imports once at the top
+2. Combine scenarios that exercise the same behaviour into a single test using @pytest.mark.parametrize, with one parameter row per scenario and ids taken from the scenario test names
+3. Scenarios that expect an exception go in a separate parametrized test using pytest.raises
+4. Only write a standalone test when a scenario needs unique setup or mocking
+5. Add a short docstring to each test function
+6. Use proper mocking if external dependencies are involved
+
+Return ONLY the complete test code, no explanations."""
+
+def dependency_section(dependencies):
+    """Prompt section summarising imported project symbols, or an empty string"""
+    if not dependencies:
+        return ""
+    return f"""
+Imported project code it uses (signatures and descriptions):
+```python
+{dependencies}
+```
+"""
+
+def build_messages(scenario, source_code):
+    """Builds the prompt for a single test scenario"""
+    # Prefer the function-scoped slice attached by the strategist
+    source_snippet = scenario.get("context") or (source_code[:1500] if source_code else "")
+    scenario_info = {key: value for key, value in scenario.items() if key not in ("context", "dependencies")}
+
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
         HumanMessage(content=f"""Write a test for this scenario:
-{json.dumps(current_scenario, indent=2)}
+{json.dumps(scenario_info, indent=2)}
 
 Source code context:
 ```python
 {source_snippet}
 ```
+{dependency_section(scenario.get("dependencies"))}
+Generate complete test code with all necessary imports.""")
+    ]
+
+def extract_code(response_text):
+    """Cleans up the response to extract just the Python code"""
+    if "```python" in response_text:
+        code_start = response_text.find("```python") + 9
+        code_end = response_text.find("```", code_start)
+        return response_text[code_start:code_end].strip()
+    elif "```" in response_text:
+        code_start = response_text.find("```") + 3
+        code_end = response_text.find("```", code_start)
+        return response_text[code_start:code_end].strip()
+    return response_text
+
+def check_syntax(code):
+    """Records a parse failure if generated test code does not compile"""
+    try:
+        compile(code, "<generated test>", "exec")
+    except SyntaxError as e:
+        metrics.default_metrics.record_parse_failure(e)
+    return code
+
+def emit_test(index, test_code, stage="writer"):
+    """Streams a finished test (None if it failed) to the graph's custom stream.
+
+    ``index`` orders the test within the file and ``stage`` names the node
+    that produced it. Does nothing outside a graph run.
+    """
+    from langgraph.config import get_stream_writer
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer({"test_index": index, "test_code": test_code, "stage": stage})
+
+@contextmanager
+def budgeted(state, scenarios, grouped=False):
+    """Yields the scenarios the run's budget still allows writing (see ``budget``).
 
+    The others are recorded as skipped. Each admitted scenario holds a
+    writer call's share of the budget until the block ends; with
+    ``grouped`` the scenarios are one function's group, written in a
+    single call that holds one share.
+    """
+    functions = state.get("code_map", {}).get("functions", [])
+    file_path = state.get("file_path")
+
+    def complexity(scenario):
+        name = scenario.get("function")
+        return next((f.get("complexity", "simple") for f in functions
+                     if name in (f["name"], f["name"].split(".")[-1])), "simple")
+
+    if grouped:
+        allowed = default_budget.admit_call(file_path, scenarios, complexity(scenarios[0])) if scenarios else []
+        calls = 1 if allowed else 0
+    else:
+        allowed = [s for s in scenarios if default_budget.admit(file_path, s, complexity(s))]
+        calls = len(allowed)
+    try:
+        yield allowed
+    finally:
+        default_budget.release(file_path, calls)
+
+def write_test(scenario, source_code):
+    """Writes test code for one scenario, returning None on failure"""
+    try:
+        with metrics.scope(scenario=scenario.get("test_name")), scheduler.priority(scenario.get("priority", "medium")):
+            response = call_llm(LLM_NODE, build_messages(scenario, source_code))
+            return check_syntax(extract_code(response.content))
+    except Exception as e:
+        print(f"Error generating test code for {scenario.get('test_name', 'Unknown')}: {e}")
+        return None
+
+async def awrite_test(scenario, source_code):
+    """Async variant of write_test"""
+    try:
+        with metrics.scope(scenario=scenario.get("test_name")), scheduler.priority(scenario.get("priority", "medium")):
+            response = await acall_llm(LLM_NODE, build_messages(scenario, source_code))
+            return check_syntax(extract_code(response.content))
+    except Exception as e:
+        print(f"Error generating test code for {scenario.get('test_name', 'Unknown')}: {e}")
+        return None
+
+def group_scenarios(scenarios):
+    """Groups scenarios by function, ordered by each function's highest-priority scenario"""
+    groups = {}
+    for scenario in scenarios:
+        groups.setdefault(scenario.get("function", "unknown"), []).append(scenario)
+    return list(groups.items())
+
+def build_group_messages(function_name, scenarios, source_code):
+    """Builds the prompt for one parametrized test module covering a function"""
+    source_snippet = next((s["context"] for s in scenarios if s.get("context")), None)
+    if source_snippet is None:
+        source_snippet = source_code[:1500] if source_code else ""
+    scenario_info = [{key: value for key, value in s.items() if key not in ("context", "dependencies")}
+                     for s in scenarios]
+    dependencies = next((s["dependencies"] for s in scenarios if s.get("dependencies")), None)
+
+    return [
+        SystemMessage(content=PARAMETRIZE_PROMPT),
+        HumanMessage(content=f"""Write tests for `{function_name}` covering these {len(scenarios)} scenarios:
+{json.dumps(scenario_info, indent=2)}
+
+Source code context:
+```python
+{source_snippet}
+```
+{dependency_section(dependencies)}
 Generate complete test code with all necessary imports.""")
     ]
-    
+
+def write_function_tests(function_name, scenarios, source_code):
+    """Writes parametrized tests for all scenarios of one function, returning None on failure"""
     try:
-        response = llm.invoke(messages)
-        generated_code = response.content
-        
-        # Clean up the response to extract just the Python code
-        if "```python" in generated_code:
-            code_start = generated_code.find("```python") + 9
-            code_end = generated_code.find("```", code_start)
-            generated_code = generated_code[code_start:code_end].strip()
-        elif "```" in generated_code:
-            code_start = generated_code.find("```") + 3
-            code_end = generated_code.find("```", code_start)
-            generated_code = generated_code[code_start:code_end].strip()
-        
-        # Add test to the list
-        updated_tests = state["generated_tests"] + [generated_code]
-        print(f"Test generated successfully")
-        
+        # Groups are ordered by their highest-priority scenario, which comes first
+        with metrics.scope(scenario=function_name), scheduler.priority(scenarios[0].get("priority", "medium")):
+            response = call_llm(LLM_NODE, build_group_messages(function_name, scenarios, source_code))
+            return check_syntax(extract_code(response.content))
+    except Exception as e:
+        print(f"Error generating tests for {function_name}: {e}")
+        return None
+
+async def awrite_function_tests(function_name, scenarios, source_code):
+    """Async variant of write_function_tests"""
+    try:
+        # Groups are ordered by their highest-priority scenario, which comes first
+        with metrics.scope(scenario=function_name), scheduler.priority(scenarios[0].get("priority", "medium")):
+            response = await acall_llm(LLM_NODE, build_group_messages(function_name, scenarios, source_code))
+            return check_syntax(extract_code(response.content))
     except Exception as e:
-        print(f"Error generating test code: {e}")
-        updated_tests = state["generated_tests"]
+        print(f"Error generating tests for {function_name}: {e}")
+        return None
+
+def test_writer_node(state):
+    """Writes test code for a single scenario using LLM"""
+    print("Agent: Test Writer")
+
+    scenarios = state["test_scenarios"]
+    current_index = state.get("current_scenario_index", 0)
+    
+    if current_index >= len(scenarios):
+        return {}
     
+    current_scenario = scenarios[current_index]
+    with budgeted(state, [current_scenario]) as allowed:
+        if not allowed:
+            print(f"Skipping test {current_index + 1}/{len(scenarios)}: "
+                  f"{current_scenario.get('test_name', 'Unknown')} (over budget)")
+            emit_test(current_index, None)
+            return {"current_scenario_index": current_index + 1}
+        print(f"Writing test {current_index + 1}/{len(scenarios)}: {current_scenario.get('test_name', 'Unknown')}")
+        generated_code = write_test(current_scenario, state["source_code"])
+    emit_test(current_index, generated_code)
+    if generated_code is not None:
+        print(f"Test generated successfully")
+
+    # Only the new test is returned; the state's reducer appends it
+    return {
+        "generated_tests": [generated_code] if generated_code is not None else [],
+        "current_scenario_index": current_index + 1
+    }
+
+def test_writer_batch_node(state, max_in_flight=4):
+    """Writes test code for all remaining scenarios concurrently.
+
+    At most ``max_in_flight`` LLM requests run at once. Results are kept in
+    the strategist's priority order regardless of completion order.
+    """
+    print(f"Agent: Test Writer (concurrent, max {max_in_flight} in flight)")
+
+    scenarios = state["test_scenarios"]
+    current_index = state.get("current_scenario_index", 0)
+    pending = scenarios[current_index:]
+
+    if not pending:
+        return {}
+
+    def write_and_emit(index, scenario):
+        with budgeted(state, [scenario]) as allowed:
+            code = write_test(scenario, state["source_code"]) if allowed else None
+        emit_test(index, code)
+        return code
+
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as executor:
+        # Each task runs in a copy of this context so metrics and the stream
+        # writer keep working; results are collected in submission order,
+        # which preserves priority order
+        futures = [executor.submit(contextvars.copy_context().run, write_and_emit, index, s)
+                   for index, s in enumerate(pending, current_index)]
+        results = [future.result() for future in futures]
+
+    new_tests = [code for code in results if code is not None]
+    print(f"Generated {len(new_tests)}/{len(pending)} tests")
+
+    return {
+        "generated_tests": new_tests,
+        "current_scenario_index": len(scenarios)
+    }
+
+async def atest_writer_node(state):
+    """Async variant of test_writer_node."""
+    print("Agent: Test Writer")
+
+    scenarios = state["test_scenarios"]
+    current_index = state.get("current_scenario_index", 0)
+
+    if current_index >= len(scenarios):
+        return {}
+
+    current_scenario = scenarios[current_index]
+    with budgeted(state, [current_scenario]) as allowed:
+        if not allowed:
+            print(f"Skipping test {current_index + 1}/{len(scenarios)}: "
+                  f"{current_scenario.get('test_name', 'Unknown')} (over budget)")
+            emit_test(current_index, None)
+            return {"current_scenario_index": current_index + 1}
+        print(f"Writing test {current_index + 1}/{len(scenarios)}: {current_scenario.get('test_name', 'Unknown')}")
+        generated_code = await awrite_test(current_scenario, state["source_code"])
+    emit_test(current_index, generated_code)
+    if generated_code is not None:
+        print(f"Test generated successfully")
+
     return {
-        **state,
-        "generated_tests": updated_tests,
+        "generated_tests": [generated_code] if generated_code is not None else [],
         "current_scenario_index": current_index + 1
-    }
\ No newline at end of file
+    }
+
+async def atest_writer_batch_node(state, max_in_flight=4):
+    """Async variant of test_writer_batch_node."""
+    print(f"Agent: Test Writer (concurrent, max {max_in_flight} in flight)")
+
+    scenarios = state["test_scenarios"]
+    current_index = state.get("current_scenario_index", 0)
+    pending = scenarios[current_index:]
+
+    if not pending:
+        return {}
+
+    semaphore = asyncio.Semaphore(max(1, max_in_flight))
+
+    async def bounded_write(index, scenario):
+        async with semaphore:
+            with budgeted(state, [scenario]) as allowed:
+                code = await awrite_test(scenario, state["source_code"]) if allowed else None
+        emit_test(index, code)
+        return code
+
+    # gather() returns results in argument order, which preserves priority order
+    results = await asyncio.gather(*(bounded_write(i, s) for i, s in enumerate(pending, current_index)))
+
+    new_tests = [code for code in results if code is not None]
+    print(f"Generated {len(new_tests)}/{len(pending)} tests")
+
+    return {
+        "generated_tests": new_tests,
+        "current_scenario_index": len(scenarios)
+    }
+
+def test_writer_grouped_node(state, max_in_flight=4):
+    """Writes one parametrized test per function instead of one test per scenario.
+
+    Each function's scenarios go to the LLM in a single call, with up to
+    ``max_in_flight`` functions written concurrently.
+    """
+    scenarios = state["test_scenarios"]
+    groups = group_scenarios(scenarios[state.get("current_scenario_index", 0):])
+    print(f"Agent: Test Writer (grouped, {len(groups)} functions, max {max_in_flight} in flight)")
+
+    if not groups:
+        return {}
+
+    def write_and_emit(index, function_name, group):
+        with budgeted(state, group, grouped=True) as allowed:
+            code = write_function_tests(function_name, allowed, state["source_code"]) if allowed else None
+        emit_test(index, code)
+        return code
+
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, write_and_emit, index, function_name, group)
+                   for index, (function_name, group) in enumerate(groups)]
+        results = [future.result() for future in futures]
+
+    new_tests = [code for code in results if code is not None]
+    print(f"Generated tests for {len(new_tests)}/{len(groups)} functions")
+
+    return {
+        "generated_tests": new_tests,
+        "current_scenario_index": len(scenarios)
+    }
+
+async def atest_writer_grouped_node(state, max_in_flight=4):
+    """Async variant of test_writer_grouped_node."""
+    scenarios = state["test_scenarios"]
+    groups = group_scenarios(scenarios[state.get("current_scenario_index", 0):])
+    print(f"Agent: Test Writer (grouped, {len(groups)} functions, max {max_in_flight} in flight)")
+
+    if not groups:
+        return {}
+
+    semaphore = asyncio.Semaphore(max(1, max_in_flight))
+
+    async def bounded_write(index, group):
+        async with semaphore:
+            with budgeted(state, group[1], grouped=True) as allowed:
+                code = await awrite_function_tests(group[0], allowed, state["source_code"]) if allowed else None
+        emit_test(index, code)
+        return code
+
+    results = await asyncio.gather(*(bounded_write(i, group) for i, group in enumerate(groups)))
+
+    new_tests = [code for code in results if code is not None]
+    print(f"Generated tests for {len(new_tests)}/{len(groups)} functions")
+
+    return {
+        "generated_tests": new_tests,
+        "current_scenario_index": len(scenarios)
+    }
@@ -0,0 +1,49 @@
+import pytest
+
+import llm_client
+import main
+import metrics
+import scheduler
+from budget import default_budget
+from llm_cache import default_cache
+from metrics import Metrics
+from scheduler import Scheduler
+
+
+@pytest.fixture(autouse=True)
+def shared_state(monkeypatch, tmp_path):
+    """Give every test fresh LLM clients, settings, scheduler and budget, and no response cache."""
+    for node in (None, *llm_client.NODES):
+        prefix = f"TESTGEN_{node.upper()}_" if node else "TESTGEN_"
+        for key in llm_client.DEFAULTS:
+            monkeypatch.delenv(f"{prefix}{key.upper()}", raising=False)
+    monkeypatch.setattr(llm_client, "_overrides", {})
+    monkeypatch.setattr(llm_client, "_pool", dict(llm_client._pool))
+    monkeypatch.setattr(default_cache, "enabled", False)
+    monkeypatch.setattr(default_cache, "cache_dir", str(tmp_path / "llm_cache"))
+    monkeypatch.setattr(default_cache, "max_bytes", default_cache.max_bytes)
+    monkeypatch.setattr(default_cache, "_total_bytes", None)
+    fresh = Scheduler()
+    for module in (scheduler, llm_client, main):
+        monkeypatch.setattr(module, "default_scheduler", fresh)
+    default_budget.configure()
+    llm_client.reset()
+    yield
+    llm_client.reset()
+    default_budget.configure()
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """Offline fake models that answer without simulated latency."""
+    monkeypatch.setenv("TESTGEN_BACKEND", "fake")
+    monkeypatch.setenv("TESTGEN_FAKE_LATENCY", "0")
+
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    """An empty metrics collector in place of the shared one."""
+    collector = Metrics()
+    monkeypatch.setattr(metrics, "default_metrics", collector)
+    monkeypatch.setattr(llm_client, "default_metrics", collector)
+    return collector
@@ -0,0 +1,82 @@
+import ast
+import asyncio
+import re
+import threading
+
+import pytest
+
+import test_writer_agent as writer
+from fake_llm import FakeChatModel
+
+SOURCE = '''def clamp(value, limit):
+    if value > limit:
+        return limit
+    return value
+'''
+
+SCENARIOS = [{"function": "clamp", "test_name": f"test_clamp_{i}", "test_inputs": str(i),
+              "priority": ("high", "medium", "low")[i * 3 // 10]} for i in range(10)]
+
+
+class InFlight:
+    """Counts concurrent fake model calls and the order they finish in."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.finished = []
+
+    def enter(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def leave(self, messages):
+        with self.lock:
+            self.active -= 1
+            self.finished.append(re.search(r'"test_name": "([^"]+)"', messages[-1].content).group(1))
+
+
+@pytest.fixture
+def in_flight(fake_backend, monkeypatch):
+    monkeypatch.setenv("TESTGEN_FAKE_LATENCY", "0.05")
+    monkeypatch.setenv("TESTGEN_FAKE_JITTER", "0.04")
+    tracker = InFlight()
+    invoke, ainvoke = FakeChatModel.invoke, FakeChatModel.ainvoke
+
+    def tracked_invoke(self, messages, *args, **kwargs):
+        tracker.enter()
+        try:
+            return invoke(self, messages, *args, **kwargs)
+        finally:
+            tracker.leave(messages)
+
+    async def tracked_ainvoke(self, messages, *args, **kwargs):
+        tracker.enter()
+        try:
+            return await ainvoke(self, messages, *args, **kwargs)
+        finally:
+            tracker.leave(messages)
+
+    monkeypatch.setattr(FakeChatModel, "invoke", tracked_invoke)
+    monkeypatch.setattr(FakeChatModel, "ainvoke", tracked_ainvoke)
+    return tracker
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_batch_writer_bounds_in_flight_calls_and_keeps_priority_order(in_flight, tmp_path, use_async):
+    state = {"file_path": str(tmp_path / "clamp.py"), "source_code": SOURCE, "code_map": {},
+             "test_scenarios": SCENARIOS, "current_scenario_index": 0}
+    if use_async:
+        result = asyncio.run(writer.atest_writer_batch_node(state, max_in_flight=3))
+    else:
+        result = writer.test_writer_batch_node(state, max_in_flight=3)
+
+    assert in_flight.peak == 3
+    submitted = [s["test_name"] for s in SCENARIOS]
+    # The jittered latencies finish some later scenarios first
+    assert in_flight.finished != submitted and sorted(in_flight.finished) == sorted(submitted)
+    names = [ast.parse(code).body[0].name for code in result["generated_tests"]]
+    assert names == submitted
+    assert result["current_scenario_index"] == len(SCENARIOS)
@@ -0,0 +1,84 @@
+import pytest
+
+from budget import Budget, parse_limits
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def scenario(priority, name="test_x"):
+    return {"test_name": name, "function": "f", "priority": priority}
+
+
+def test_parse_limits():
+    assert parse_limits("500k tokens") == {"tokens": 500000}
+    assert parse_limits("$5, 90m") == {"dollars": 5, "seconds": 5400}
+    assert parse_limits("2m tokens,2h") == {"tokens": 2000000, "seconds": 7200}
+    for spec in ("5", "2k", "five dollars"):
+        with pytest.raises(ValueError):
+            parse_limits(spec)
+
+
+def test_lower_priority_and_simpler_functions_stop_first():
+    budget = Budget(clock=FakeClock())
+    budget.configure({"tokens": 10000}, files=1)
+    budget.charge("a.py", 6000, 1000, 1.0)  # 3000 left, a writer call is estimated at 2000
+
+    admitted = {}
+    for priority, complexity in [("low", "simple"), ("low", "complex"), ("medium", "simple"), ("high", "simple")]:
+        admitted[priority, complexity] = budget.admit("a.py", scenario(priority), complexity)
+        budget.release("a.py")
+    assert admitted == {("low", "simple"): False, ("low", "complex"): False,
+                        ("medium", "simple"): True, ("high", "simple"): True}
+    assert [s["priority"] for s in budget.skipped_for("a.py")] == ["low", "low"]
+    assert "a.py:" in budget.report()
+    assert not budget.exhausted
+    budget.charge("a.py", 2000, 0, 1.0)
+    assert budget.exhausted
+
+
+def test_fair_share_across_files_and_in_flight_reservations():
+    clock = FakeClock()
+    budget = Budget(clock=clock)
+    budget.configure({"tokens": 10000}, files=2)
+    budget.charge("a.py", 4000, 0, 1.0)  # a.py's share is half of the run
+    assert not budget.admit("a.py", scenario("medium"))
+    assert "share" in budget.skipped[-1]["reason"]
+
+    # High priority may use the rest of the run, but not more than is left once in-flight calls finish
+    assert all(budget.admit("a.py", scenario("high")) for _ in range(3))
+    assert not budget.admit("a.py", scenario("high"))
+    budget.release("a.py", 3)
+    assert budget.admit("a.py", scenario("high"))
+    budget.release("a.py")
+
+    # Wall-clock limits count from the start of the run
+    budget.configure({"seconds": 60}, files=1)
+    assert budget.admit("b.py", scenario("high"))
+    budget.release("b.py")
+    clock.now = 61
+    assert not budget.admit("b.py", scenario("high"))
+
+
+def test_a_grouped_call_reserves_one_writer_call_for_its_scenarios():
+    budget = Budget(clock=FakeClock())
+    budget.configure({"tokens": 20000}, files=1)
+    assert budget.admit_call("a.py", [scenario("high")])
+    budget.release("a.py")
+    budget.charge("a.py", 4000, 1000, 1.0, writer=True)  # One grouped call cost 5000
+
+    group = [scenario("high", f"test_{i}") for i in range(5)]
+    assert budget.admit_call("a.py", group) == group
+    assert budget.run.writing == 1
+    budget.release("a.py")
+
+    # Low priority scenarios leave the group once the reserve is reached; the call still goes ahead
+    budget.charge("a.py", 6000, 0, 1.0, writer=True)  # 9000 left, a call is now estimated at 5500
+    mixed = [scenario("high", "test_h"), scenario("low", "test_l")]
+    assert budget.admit_call("a.py", mixed) == mixed[:1]
+    assert [s["test_name"] for s in budget.skipped] == ["test_l"]
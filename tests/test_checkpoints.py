@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+import llm_client
+from checkpoints import SqliteCheckpointer, thread_config
+from main import build_workflow, initial_state, run_serial
+from manifest import RunManifest
+
+SOURCE = '''def clamp(value, limit):
+    if value > limit:
+        return limit
+    return value
+'''
+
+TEST_CODE = "def test_clamp():\n    assert True\n" + "# padding\n" * 100
+
+
+@pytest.fixture
+def scripted(fake_backend, monkeypatch, tmp_path):
+    def script(scenarios):
+        plan = [{"function": "clamp", "test_name": f"test_clamp_{i}", "test_inputs": str(i), "priority": "high"}
+                for i in range(scenarios)]
+        path = tmp_path / f"script_{scenarios}.json"
+        path.write_text(json.dumps([{"match": "test strategist", "response": json.dumps(plan)},
+                                    {"match": "test code writer", "response": f"```python\n{TEST_CODE}```"}]))
+        monkeypatch.setenv("TESTGEN_FAKE_SCRIPT", str(path))
+        llm_client.reset()
+
+    return script
+
+
+def stored_bytes(checkpointer, channel):
+    return checkpointer._query("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM blobs WHERE channel = ?", (channel,))[0][0]
+
+
+def test_channel_values_are_stored_once_and_restored(scripted, tmp_path):
+    source = tmp_path / "clamp.py"
+    source.write_text(SOURCE)
+    sizes = {}
+    for scenarios in (10, 40):
+        scripted(scenarios)
+        checkpointer = SqliteCheckpointer(str(tmp_path / f"checkpoints_{scenarios}.sqlite"))
+        app = build_workflow(writer_concurrency=1, dedupe_scenarios=False, checkpointer=checkpointer)
+        config = thread_config("run", str(source))
+        result = app.invoke(initial_state(str(source)), config)
+
+        restored = SqliteCheckpointer(checkpointer.path).get_tuple(config).checkpoint["channel_values"]
+        assert restored["generated_tests"] == result["generated_tests"]
+        assert len(restored["generated_tests"]) == scenarios
+        assert restored["current_scenario_index"] == scenarios
+        sizes[scenarios] = stored_bytes(checkpointer, "generated_tests")
+
+    # Each step stores only the test it added, so 4x the tests take about 4x the space, not 16x
+    assert sizes[40] < 5 * sizes[10]
+
+
+class FailingApp:
+    """The workflow, failing partway through one file."""
+
+    def __init__(self, app, failing_path, after_chunks):
+        self.app = app
+        self.failing_path = failing_path
+        self.after_chunks = after_chunks
+
+    def get_state(self, config):
+        return self.app.get_state(config)
+
+    def stream(self, state, config, **kwargs):
+        for count, chunk in enumerate(self.app.stream(state, config, **kwargs)):
+            if config["configurable"]["thread_id"].endswith(self.failing_path) and count == self.after_chunks:
+                raise RuntimeError("connection lost")
+            yield chunk
+
+
+def test_failed_files_keep_no_state_in_memory_and_resume_as_deltas(scripted, tmp_path):
+    scripted(6)
+    sources = []
+    for name in ("bad.py", "good.py"):
+        (tmp_path / name).write_text(SOURCE)
+        sources.append(str(tmp_path / name))
+    (tmp_path / "out").mkdir()
+    manifest = RunManifest(str(tmp_path / "out"), "pipeline")
+    db_path = str(tmp_path / "checkpoints.sqlite")
+
+    checkpointer = SqliteCheckpointer(db_path)
+    run_id = checkpointer.start_run("pipeline")
+    app = FailingApp(build_workflow(writer_concurrency=1, dedupe_scenarios=False, checkpointer=checkpointer),
+                     sources[0], after_chunks=20)
+    run_serial(app, sources, str(tmp_path / "out"), manifest, checkpointer=checkpointer, run_id=run_id)
+    assert checkpointer.is_finished(run_id, sources[1]) and not checkpointer.is_finished(run_id, sources[0])
+    # Only the failed file's thread is left, and only on disk
+    assert {row[0] for row in checkpointer._query("SELECT DISTINCT thread_id FROM blobs")} == {
+        thread_config(run_id, sources[0])["configurable"]["thread_id"]}
+    assert not [name for name, value in vars(checkpointer).items() if isinstance(value, dict) and value]
+    checkpointer.close()
+
+    # A new process resumes the file from the database and keeps storing only the new tests
+    checkpointer = SqliteCheckpointer(db_path)
+    app = build_workflow(writer_concurrency=1, dedupe_scenarios=False, checkpointer=checkpointer)
+    config = thread_config(run_id, sources[0])
+    written_before = len(app.get_state(config).values["generated_tests"])
+    assert 0 < written_before < 6
+    result = app.invoke(None, config)
+    assert len(result["generated_tests"]) == 6
+    rows = checkpointer._query("SELECT base_version FROM blobs WHERE channel = 'generated_tests' "
+                               "AND value_type != 'empty' ORDER BY rowid")
+    # The initial empty list, then one delta per test
+    assert len(rows) == 7 and rows[0][0] is None and all(base is not None for base, in rows[1:])
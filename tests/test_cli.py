@@ -0,0 +1,130 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Wall-clock budget for a cold `python main.py --dry-run`, interpreter startup included
+STARTUP_BUDGET_SECONDS = float(os.getenv("TESTGEN_STARTUP_BUDGET", "1.5"))
+
+HEAVY_MODULES = ("langgraph", "langchain", "langchain_core", "langchain_openai", "openai")
+
+@pytest.fixture
+def repo(tmp_path):
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    (source_dir / "module.py").write_text("def f(x):\n    return x\n")
+    (source_dir / "test_module.py").write_text("def test_f():\n    pass\n")
+    (source_dir / "__init__.py").write_text("")
+    return source_dir
+
+def test_dry_run_lists_files_without_heavy_imports(repo, tmp_path, capsys):
+    output_dir = tmp_path / "out"
+    code = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, main; main.main(sys.argv[1:]); "
+         f"print(sorted(m for m in sys.modules if m.split('.')[0] in {HEAVY_MODULES!r}))",
+         str(repo), "-o", str(output_dir), "--dry-run"],
+        cwd=ROOT, capture_output=True, text=True, env={**os.environ, "OPENAI_API_KEY": ""},
+    )
+    assert code.returncode == 0, code.stderr
+    assert f"Would process {repo / 'module.py'}" in code.stdout
+    assert f"Would process {repo / 'test_module.py'}" not in code.stdout
+    assert code.stdout.strip().endswith("[]")
+    assert not output_dir.exists()
+
+def test_cold_start_within_budget(repo, tmp_path):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "main.py", str(repo), "-o", str(tmp_path / "out"), "--dry-run"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    assert result.returncode == 0, result.stderr
+    assert elapsed < STARTUP_BUDGET_SECONDS, f"cold start took {elapsed:.2f}s"
+
+def test_missing_repo_and_missing_api_key(repo, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(main, "load_dotenv", lambda: None)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    assert main.main([str(tmp_path / "missing")]) == 1
+    assert main.main([str(repo), "-o", str(tmp_path / "out")]) == 1
+    assert "Please set your OpenAI API key!" in capsys.readouterr().out
+
+def test_offline_run_with_fake_backend(repo, tmp_path):
+    output_dir = tmp_path / "out"
+    result = subprocess.run(
+        [sys.executable, "main.py", str(repo), "-o", str(output_dir), "--backend", "fake", "--no-cache"],
+        cwd=ROOT, capture_output=True, text=True, env={**os.environ, "OPENAI_API_KEY": ""},
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    generated = (output_dir / "test_module.py").read_text()
+    compile(generated, "test_module.py", "exec")
+    assert "def test_f_" in generated
+    assert (output_dir / "testgen_metrics.json").exists()
+
+def test_crash_keeps_streamed_tests(repo, tmp_path):
+    # The strategist plans two scenarios; writing the second one crashes the run
+    output_dir = tmp_path / "out"
+    script = tmp_path / "script.json"
+    script.write_text('[{"match": "test strategist", "response": "[{\\"function\\": \\"f\\", \\"test_name\\": \\"test_ok\\"}, {\\"function\\": \\"f\\", \\"test_name\\": \\"test_boom\\"}]"}]')
+    code = (
+        "import sys, main, test_writer_agent\n"
+        "write_test = test_writer_agent.write_test\n"
+        "def crash(scenario, source):\n"
+        "    if scenario['test_name'] == 'test_boom':\n"
+        "        raise KeyboardInterrupt\n"
+        "    return write_test(scenario, source)\n"
+        "test_writer_agent.write_test = crash\n"
+        "main.main(sys.argv[1:])\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code, str(repo), "-o", str(output_dir), "--backend", "fake", "--no-cache",
+         "--writer-concurrency", "1"],
+        cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, "OPENAI_API_KEY": "", "TESTGEN_FAKE_SCRIPT": str(script)},
+    )
+    assert result.returncode != 0
+    assert not (output_dir / "test_module.py").exists()
+    assert "def test_ok" in (output_dir / "test_module.py.partial").read_text()
+
+def test_resume_continues_interrupted_file(repo, tmp_path):
+    # The first run crashes while writing test_boom; --resume writes only that test
+    output_dir = tmp_path / "out"
+    script = tmp_path / "script.json"
+    script.write_text('[{"match": "test strategist", "response": "[{\\"function\\": \\"f\\", \\"test_name\\": \\"test_ok\\"}, {\\"function\\": \\"f\\", \\"test_name\\": \\"test_boom\\"}]"}]')
+    code = (
+        "import sys, main, test_writer_agent\n"
+        "write_test = test_writer_agent.write_test\n"
+        "def tracked(scenario, source):\n"
+        "    print('writing', scenario['test_name'])\n"
+        "    if scenario['test_name'] == 'test_boom' and '--resume' not in sys.argv:\n"
+        "        raise KeyboardInterrupt\n"
+        "    return write_test(scenario, source)\n"
+        "test_writer_agent.write_test = tracked\n"
+        "main.main(sys.argv[1:])\n"
+    )
+
+    def run(*extra):
+        return subprocess.run(
+            [sys.executable, "-c", code, str(repo), "-o", str(output_dir), "--backend", "fake", "--no-cache",
+             "--writer-concurrency", "1", *extra],
+            cwd=ROOT, capture_output=True, text=True,
+            env={**os.environ, "OPENAI_API_KEY": "", "TESTGEN_FAKE_SCRIPT": str(script)},
+        )
+
+    assert run().returncode != 0
+    resumed = run("--resume")
+    assert resumed.returncode == 0, resumed.stdout + resumed.stderr
+    assert "writing test_ok" not in resumed.stdout
+    assert "writing test_boom" in resumed.stdout
+    generated = (output_dir / "test_module.py").read_text()
+    assert "def test_ok" in generated and "def test_boom" in generated
+
+    again = run("--resume", "--force")
+    assert "skipping 1 finished files" in again.stdout
+    assert "writing" not in again.stdout
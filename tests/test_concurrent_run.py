@@ -0,0 +1,69 @@
+import asyncio
+import re
+
+import pytest
+
+from main import build_workflow, initial_state, run_concurrent
+from manifest import RunManifest
+
+SOURCES = {
+    "slow.py": "def slow(x):\n    if x < 0:\n        raise ValueError(x)\n    return x\n",
+    "broken.py": "def broken(x):\n    return x\n",
+    "fast.py": "def fast(a, b):\n    return a + b\n",
+}
+
+
+@pytest.fixture
+def sources(tmp_path):
+    paths = []
+    for name, source in SOURCES.items():
+        path = tmp_path / name
+        path.write_text(source)
+        paths.append(str(path))
+    return paths
+
+
+class ScriptedApp:
+    """The async workflow, with the first file finishing last and one file failing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def astream(self, state, config, **kwargs):
+        if state["file_path"].endswith("broken.py"):
+            raise RuntimeError("model unavailable")
+        if state["file_path"].endswith("slow.py"):
+            await asyncio.sleep(0.2)
+        async for item in self.app.astream(state, config, **kwargs):
+            yield item
+
+
+def test_results_are_reported_in_order_and_failures_stay_isolated(fake_backend, sources, tmp_path, capsys):
+    (tmp_path / "out").mkdir()
+    manifest = RunManifest(str(tmp_path / "out"), "pipeline")
+    app = ScriptedApp(build_workflow(use_async=True))
+    asyncio.run(run_concurrent(app, sources, str(tmp_path / "out"), manifest, jobs=3))
+
+    out = capsys.readouterr().out
+    # fast.py finished while slow.py was still running, but is reported after it
+    assert out.rindex(f"  {sources[2]}: ") < out.index("[1/3]")
+    reports = re.findall(r"^\[(\d)/3\] (.*)$", out, re.M)
+    assert [index for index, _ in reports] == ["1", "2", "3"]
+    assert "slow.py" in reports[0][1] and reports[0][1].startswith("Generated")
+    assert reports[1][1].startswith("Error processing") and "model unavailable" in reports[1][1]
+    assert "fast.py" in reports[2][1] and reports[2][1].startswith("Generated")
+    assert (tmp_path / "out" / "test_slow.py").exists() and (tmp_path / "out" / "test_fast.py").exists()
+    assert not (tmp_path / "out" / "test_broken.py").exists()
+    assert sorted(manifest.entries) == sorted([sources[0], sources[2]])
+
+
+@pytest.mark.parametrize("options", [{"writer_concurrency": 1}, {"writer_concurrency": 4},
+                                     {"group_by_function": True}])
+def test_async_nodes_match_the_sync_ones(fake_backend, sources, options):
+    sync_app, async_app = build_workflow(**options), build_workflow(use_async=True, **options)
+    for source in sources:
+        expected = sync_app.invoke(initial_state(source))
+        result = asyncio.run(async_app.ainvoke(initial_state(source)))
+        for key in ("code_map", "execution_paths", "test_scenarios", "generated_tests", "current_scenario_index"):
+            assert result[key] == expected[key], key
+        assert result["generated_tests"]
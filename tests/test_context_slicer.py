@@ -0,0 +1,58 @@
+from context_slicer import attach_context, slice_function
+
+SOURCE = '''import os
+import json
+from app.calculator import Calculator
+
+LIMIT = 10
+UNUSED = 3
+
+def helper(value):
+    """Clamp a value"""
+    return min(value, LIMIT)
+
+class Service(Base):
+    """Service docstring"""
+    retries = 2
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        return json.loads(self.read())
+
+    def read(self):
+        return open(self.path).read()
+
+    def total(self, values):
+        return helper(sum(values)) + Calculator.add(1, 2)
+'''
+
+def test_slice_contains_referenced_names_only():
+    context = slice_function(SOURCE, "Service.total")
+
+    assert "from app.calculator import Calculator" in context
+    assert "def helper(value):\n    \"\"\"Clamp a value\"\"\"\n    ..." in context
+    assert "class Service(Base):" in context and "retries = 2" in context
+    assert "def __init__(self, path):" in context
+    assert "return helper(sum(values))" in context
+    # Unreferenced imports, globals and sibling methods are left out
+    assert "import os" not in context
+    assert "UNUSED" not in context
+    assert "def load" not in context
+
+def test_methods_called_on_self_are_stubbed():
+    context = slice_function(SOURCE, "Service.load")
+    assert "import json" in context
+    assert "    def read(self):\n        ..." in context
+    assert "open(self.path)" not in context
+
+def test_unqualified_name_and_missing_function():
+    assert "def total" in slice_function(SOURCE, "total")
+    assert slice_function(SOURCE, "missing") is None
+    assert slice_function("def broken(:", "broken") is None
+
+def test_attach_context():
+    scenarios = attach_context([{"function": "helper"}, {"function": "missing"}], SOURCE)
+    assert "LIMIT = 10" in scenarios[0]["context"]
+    assert "context" not in scenarios[1]
@@ -0,0 +1,69 @@
+import asyncio
+
+import main
+from coverage_guide import CoverageReport, measure
+
+MODULE = '''def double(x):
+    return 2 * x
+
+
+def safe_divide(a, b):
+    if b == 0:
+        raise ValueError("b must not be zero")
+    return a / b
+'''
+
+TESTS = '''from ops import double, safe_divide
+
+
+def test_double():
+    assert double(2) == 4
+
+
+def test_divide():
+    assert safe_divide(4, 2) == 2
+'''
+
+
+def test_uncovered_lines_and_branches_map_to_their_functions(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYTEST_DISABLE_PLUGIN_AUTOLOAD", "1")
+    (tmp_path / "ops.py").write_text(MODULE)
+    (tmp_path / "test_ops.py").write_text(TESTS)
+    source = str(tmp_path / "ops.py")
+
+    report = measure(str(tmp_path), [str(tmp_path)])
+    assert report.gaps(source) == {"safe_divide": {"lines": ['7: raise ValueError("b must not be zero")'],
+                                                   "branches": ["6->7: if b == 0:"]}}
+    assert 0 < report.percent([source]) < 100
+
+    # Without its tests nothing is covered, not even the module-level def lines
+    report = measure(str(tmp_path), [str(tmp_path)], ignore=[str(tmp_path / "test_ops.py")])
+    assert set(report.gaps(source)) == {"double", "safe_divide"}
+    assert report.gaps(str(tmp_path / "missing.py")) is None
+
+
+def test_concurrent_coverage_rounds_share_one_event_loop(tmp_path, monkeypatch):
+    repo = tmp_path / "src"
+    repo.mkdir()
+    (repo / "ops.py").write_text(MODULE)
+    covered = iter([10, 50, 95])
+
+    def fake_measure(repo_path, test_paths, ignore=()):
+        entry = {"summary": {"covered_lines": next(covered), "num_statements": 100},
+                 "missing_lines": [7], "missing_branches": []}
+        return CoverageReport({"files": {str(repo / "ops.py"): entry}})
+
+    loops = []
+
+    async def fake_run_concurrent(app, files, *args, **options):
+        loops.append(asyncio.get_running_loop())
+
+    monkeypatch.setattr(main.coverage_guide, "measure", fake_measure)
+    monkeypatch.setattr(main, "run_concurrent", fake_run_concurrent)
+    monkeypatch.setattr(main, "load_dotenv", lambda: None)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    assert main.main([str(repo), "-o", str(tmp_path / "out"), "--backend", "fake", "--no-cache", "-j", "2",
+                      "--coverage-target", "90"]) == 0
+    # The shared async HTTP client stays bound to the loop of the first round
+    assert len(loops) == 2 and loops[0] is loops[1] and loops[0].is_closed()
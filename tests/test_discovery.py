@@ -0,0 +1,53 @@
+import os
+
+import discovery
+from discovery import DEFAULT_EXCLUDE, ignored, iter_source_files, parse_patterns
+
+
+def write(root, path, text=""):
+    full = root / path
+    full.parent.mkdir(parents=True, exist_ok=True)
+    full.write_text(text)
+
+
+def test_patterns_follow_gitignore_rules():
+    patterns = parse_patterns(["*.log", "!keep.log", "/build/", "docs/**/*.md", "# comment", ""])
+    assert ignored(patterns, "a/b/debug.log", False)
+    assert not ignored(patterns, "a/keep.log", False)
+    assert ignored(patterns, "build", True)
+    assert not ignored(patterns, "build", False)  # Directory-only pattern
+    assert not ignored(patterns, "src/build", True)  # Anchored to the root
+    assert ignored(patterns, "docs/x/y/readme.md", False)
+    assert ignored(patterns, "docs/readme.md", False)
+
+
+def test_walk_prunes_ignored_trees_and_honours_nested_gitignores(tmp_path, monkeypatch):
+    for path in ("app/core.py", "app/test_core.py", "app/__init__.py", "app/generated.py", "app/keep_me.py",
+                 "app/legacy/old.py", "node_modules/pkg/x.py", ".venv/lib/y.py", "scripts/run.py", "notes.txt"):
+        write(tmp_path, path)
+    write(tmp_path, ".gitignore", "scripts/\n")
+    write(tmp_path, "app/.gitignore", "generated.py\n*_me.py\n!keep_me.py\n")
+
+    scanned = []
+    scandir = os.scandir
+    monkeypatch.setattr(discovery.os, "scandir", lambda path: scanned.append(path) or scandir(path))
+
+    found = list(iter_source_files(str(tmp_path), exclude=list(DEFAULT_EXCLUDE) + ["app/legacy"]))
+    assert found == [str(tmp_path / "app" / "core.py"), str(tmp_path / "app" / "keep_me.py")]
+    assert {os.path.relpath(p, tmp_path) for p in scanned} == {".", "app"}
+
+    everything = list(iter_source_files(str(tmp_path), include=["*.txt"], use_gitignore=False))
+    assert everything == [str(tmp_path / "notes.txt")]
+
+
+def test_default_excludes_only_skip_top_level_build_output(tmp_path):
+    for path in ("build/lib/x.py", "dist/y.py", "src/build/y.py", "src/dist/z.py", "src/core.py"):
+        write(tmp_path, path)
+
+    found = [os.path.relpath(p, tmp_path) for p in iter_source_files(str(tmp_path), use_gitignore=False)]
+    assert sorted(found) == [os.path.join("src", "build", "y.py"), os.path.join("src", "core.py"),
+                             os.path.join("src", "dist", "z.py")]
+
+    # A negated exclude re-includes what a default skips
+    found = list(iter_source_files(str(tmp_path), exclude=list(DEFAULT_EXCLUDE) + ["!/build/"], use_gitignore=False))
+    assert str(tmp_path / "build" / "lib" / "x.py") in found and str(tmp_path / "dist" / "y.py") not in found
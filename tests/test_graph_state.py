@@ -0,0 +1,27 @@
+import pytest
+
+from main import build_workflow, initial_state
+
+SOURCE = '''def divide(a, b):
+    if b == 0:
+        raise ZeroDivisionError("b is zero")
+    return a / b
+'''
+
+
+@pytest.mark.parametrize("writer_concurrency", [1, 4])
+def test_nodes_return_deltas_and_tests_accumulate(fake_backend, tmp_path, writer_concurrency):
+    source = tmp_path / "divide.py"
+    source.write_text(SOURCE)
+    app = build_workflow(writer_concurrency=writer_concurrency)
+
+    final, writer_updates = None, []
+    for mode, chunk in app.stream(initial_state(str(source)), stream_mode=["updates", "values"]):
+        if mode == "values":
+            final = chunk
+        elif "test_writer" in chunk:
+            writer_updates.append(chunk["test_writer"])
+
+    assert all(set(update) == {"generated_tests", "current_scenario_index"} for update in writer_updates)
+    assert sum(len(update["generated_tests"]) for update in writer_updates) == len(final["generated_tests"])
+    assert len(final["generated_tests"]) == len(final["test_scenarios"]) > 0
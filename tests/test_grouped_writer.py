@@ -0,0 +1,59 @@
+import ast
+import asyncio
+import subprocess
+import sys
+
+import pytest
+
+from main import build_workflow, initial_state
+from test_writer_agent import group_scenarios
+
+SOURCE = '''def clamp(value, limit):
+    if value > limit:
+        return limit
+    return value
+
+
+def sign(x):
+    if x < 0:
+        return -1
+    return 1
+'''
+
+
+def test_scenarios_are_grouped_by_function_in_priority_order():
+    scenarios = [{"function": "b", "test_name": "b_high"}, {"function": "a", "test_name": "a_high"},
+                 {"function": "b", "test_name": "b_low"}, {"test_name": "orphan"}]
+    groups = group_scenarios(scenarios)
+    assert [name for name, _ in groups] == ["b", "a", "unknown"]
+    assert [[s["test_name"] for s in group] for _, group in groups] == [["b_high", "b_low"], ["a_high"], ["orphan"]]
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_one_parametrized_test_is_written_per_function(fake_backend, fresh_metrics, tmp_path, use_async):
+    source = tmp_path / "ops.py"
+    source.write_text(SOURCE)
+    app = build_workflow(group_by_function=True, use_async=use_async)
+    state = initial_state(str(source))
+    result = asyncio.run(app.ainvoke(state)) if use_async else app.invoke(state)
+
+    scenarios = result["test_scenarios"]
+    assert result["current_scenario_index"] == len(scenarios)
+    writer_calls = [call for call in fresh_metrics.llm_calls if call["node"] == "test_writer"]
+    assert len(writer_calls) == 2 and len(scenarios) > 2
+
+    modules = result["generated_tests"]
+    assert len(modules) == 2
+    for (function_name, group), code in zip(group_scenarios(scenarios), modules):
+        tree = ast.parse(code)
+        tests = [node for node in tree.body if isinstance(node, ast.FunctionDef)]
+        assert [test.name for test in tests] == [f"test_{function_name}"]
+        cases = ast.literal_eval(tests[0].decorator_list[0].args[1])
+        assert cases == [s["test_name"] for s in group]
+
+    # Every scenario becomes one case of its function's test
+    (tmp_path / "test_ops.py").write_text("\n\n".join(modules) + "\n")
+    run = subprocess.run([sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", str(tmp_path / "test_ops.py")],
+                         capture_output=True, text=True, cwd=tmp_path)
+    assert run.returncode == 0, run.stdout
+    assert f"{len(scenarios)} passed" in run.stdout
@@ -0,0 +1,55 @@
+from import_graph import ImportGraph, imported_modules
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return str(path)
+
+
+def test_files_are_ordered_dependencies_first(tmp_path):
+    repo = tmp_path / "pkg"
+    api = write(repo / "api.py", "from pkg.service import Service\nfrom .models import Item\n")
+    service = write(repo / "service.py", "import models\n\nclass Service:\n    pass\n")
+    models = write(repo / "models.py", "class Item:\n    pass\n")
+    # a and b import each other; the cycle is broken in discovery order
+    a = write(repo / "a.py", "from pkg import b\n")
+    b = write(repo / "b.py", "from pkg import a\n")
+
+    graph = ImportGraph([api, service, models, a, b], str(repo))
+    assert graph.order() == [models, service, api, b, a]
+    assert graph.order([api, models]) == [models, api]
+    assert set(graph.dependencies(api)) == {service, models}
+    assert graph.edge_count == 5
+
+
+def test_context_summarises_imported_symbols_once(tmp_path):
+    repo = tmp_path / "app"
+    calculator = write(repo / "calculator.py", '''class Calculator:
+    """Basic arithmetic."""
+
+    def divide(self, a: float, b: float) -> float:
+        """Divide a by b.
+
+        Raises ZeroDivisionError when b is zero.
+        """
+        return a / b
+
+def unused():
+    pass
+''')
+    main = write(repo / "main.py", "from app.calculator import Calculator as Calc\nimport calculator\n")
+    graph = ImportGraph([main, calculator], str(repo))
+
+    context = graph.context_for(main)
+    assert context["Calc"] == ("# Calculator from app.calculator\nclass Calculator: Basic arithmetic.\n"
+                               "    Calculator.divide(a, b) -> float: Divide a by b.")
+    assert "def unused" not in context["calculator"] and "unused() -> unknown" in context["calculator"]
+    # The dependency is analysed once and reused
+    assert graph.code_map(calculator) is graph.code_map(calculator)
+
+
+def test_relative_imports_resolve_against_the_package():
+    imports = imported_modules("from . import util\nfrom ..core.base import Base\n", "pkg.sub.mod")
+    assert imports["pkg.sub.util"] == {"util": None}
+    assert imports["pkg.core.base"] == {"Base": "Base"}
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+import llm_client
+from llm_cache import EVICT_TO, LLMCache, default_cache
+
+MESSAGES = [SystemMessage(content="You are a test code writer."), HumanMessage(content="Write a test for f")]
+
+
+@pytest.fixture
+def shared_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(default_cache, "enabled", True)
+    return default_cache
+
+
+def test_fake_backend_never_serves_the_real_model(shared_cache, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("TESTGEN_BACKEND", "fake")
+    llm_client.call_llm("test_writer", MESSAGES)
+    fake_model_name = llm_client.get_llm("test_writer").model_name
+    assert len(list(shared_cache._entries())) == 1
+
+    monkeypatch.setenv("TESTGEN_BACKEND", "openai")
+    llm_client.reset()
+    settings = llm_client.node_settings("test_writer")
+    real = llm_client.get_llm("test_writer")
+    assert real.model_name == fake_model_name
+    assert shared_cache.get(LLMCache.make_key(real, MESSAGES, llm_client.cache_scope(settings))) is None
+
+    # The endpoint and the response schema are part of the key too
+    keys = {LLMCache.make_key(real, MESSAGES, llm_client.cache_scope({**settings, **changed}, "test_scenarios"))
+            for changed in ({}, {"base_url": "http://localhost:8000/v1"}, {"structured_output": True})}
+    assert len(keys) == 3
+
+
+class CountingModel:
+    model_name = "counting"
+    temperature = 0.0
+
+    def __init__(self):
+        self.calls = 0
+
+    def _reply(self, messages):
+        from langchain_core.messages import AIMessage
+        self.calls += 1
+        return AIMessage(content=f"reply to {messages[-1].content}")
+
+    def invoke(self, messages):
+        time.sleep(0.05)
+        return self._reply(messages)
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(0.05)
+        return self._reply(messages)
+
+
+def entry_sizes(cache):
+    return sum(size for _, size, _ in cache._entries())
+
+
+def test_eviction_drops_least_recently_used_down_to_the_low_mark(tmp_path):
+    cache = LLMCache(str(tmp_path), max_bytes=10**6)
+    for i in range(10):
+        cache.put(f"{i:02d}" + "k" * 62, "x" * 100)
+    entry_size = entry_sizes(cache) // 10
+    assert cache._total_bytes == entry_size * 10
+    cache.put("05" + "k" * 62, "x" * 100)  # Overwriting an entry does not count it twice
+    assert cache._total_bytes == entry_sizes(cache) == entry_size * 10
+
+    # Oldest first by modification time; reading entry 0 makes it the most recent
+    for i in range(10):
+        os.utime(cache._path(f"{i:02d}" + "k" * 62), (1000 + i, 1000 + i))
+    assert cache.get("00" + "k" * 62) is not None
+
+    cache.max_bytes = entry_size * 10  # Full; the next put evicts down to 90%
+    cache.put("10" + "k" * 62, "x" * 100)
+    kept = sorted(os.path.basename(path)[:2] for _, _, path in cache._entries())
+    assert kept == ["00", "03", "04", "05", "06", "07", "08", "09", "10"]
+    assert cache._total_bytes == entry_sizes(cache) <= cache.max_bytes * EVICT_TO
+
+
+def test_same_key_requests_are_sent_once_across_threads_and_tasks(tmp_path):
+    cache = LLMCache(str(tmp_path))
+    model = CountingModel()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        replies = list(executor.map(lambda _: cache.invoke(model, MESSAGES).content, range(8)))
+    assert model.calls == 1 and set(replies) == {"reply to Write a test for f"}
+    assert cache.misses == 1
+
+    other = [SystemMessage(content="You are a test code writer."), HumanMessage(content="Write a test for g")]
+
+    async def ask_concurrently():
+        return await asyncio.gather(*(cache.ainvoke(model, other) for _ in range(8)))
+
+    replies = asyncio.run(ask_concurrently())
+    assert model.calls == 2 and {reply.content for reply in replies} == {"reply to Write a test for g"}
+    assert cache.misses == 2
@@ -0,0 +1,52 @@
+import pytest
+
+import llm_client
+from main import build_workflow, initial_state
+
+SOURCE = '''def clamp(value, limit):
+    if value > limit:
+        return limit
+    return value
+'''
+
+
+def test_agents_share_one_model_per_distinct_settings(fake_backend, monkeypatch, tmp_path):
+    source = tmp_path / "clamp.py"
+    source.write_text(SOURCE)
+    build_workflow().invoke(initial_state(str(source)))
+    assert len(llm_client._models) == 1
+    assert len({id(llm_client.get_llm(node)) for node in llm_client.NODES}) == 1
+
+    # A node with its own model gets its own instance; the rest keep sharing
+    monkeypatch.setenv("TESTGEN_TEST_WRITER_MODEL", "other")
+    writer = llm_client.get_llm("test_writer")
+    assert writer.model_name == "other"
+    assert writer is not llm_client.get_llm("test_strategist")
+    assert llm_client.get_llm("code_analyzer") is llm_client.get_llm("test_strategist")
+
+
+def test_openai_models_share_the_http_pool(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    llm_client.configure("test_writer", model="gpt-4o")
+    writer, strategist = llm_client.get_llm("test_writer"), llm_client.get_llm("test_strategist")
+    assert writer is not strategist
+    assert writer.http_client is strategist.http_client is llm_client._http_client
+    assert writer.http_async_client is strategist.http_async_client is llm_client._http_async_client
+
+
+def test_pool_can_only_be_sized_before_first_use(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    llm_client.configure_pool(max_connections=4, max_keepalive_connections=2)
+    http_client, _ = llm_client._http_clients()
+    assert http_client._transport._pool._max_connections == 4
+
+    with pytest.raises(RuntimeError):
+        llm_client.configure_pool(max_connections=8)
+    llm_client.get_llm("test_writer")
+    with pytest.raises(RuntimeError):
+        llm_client.configure_pool(keepalive_expiry=5.0)
+
+    # reset() closes the pool, after which it can be sized again
+    llm_client.reset()
+    llm_client.configure_pool(max_connections=8)
+    assert llm_client._pool["max_connections"] == 8
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+from manifest import RunManifest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_source_pipeline_and_output_changes_invalidate_an_entry(tmp_path):
+    source, output = tmp_path / "module.py", tmp_path / "test_module.py"
+    source.write_text("def f(x):\n    return x\n")
+    output.write_text("def test_f():\n    pass\n")
+    manifest = RunManifest(str(tmp_path / "out"), "pipeline-a")
+    assert not manifest.is_up_to_date(str(source), str(output))
+    manifest.record(str(source), str(output))
+    assert manifest.is_up_to_date(str(source), str(output))
+
+    assert not RunManifest(str(tmp_path / "out"), "pipeline-b").is_up_to_date(str(source), str(output))
+    output.write_text("def test_f():\n    assert False\n")
+    assert not manifest.is_up_to_date(str(source), str(output))
+    manifest.record(str(source), str(output))
+    source.write_text("def f(x):\n    return -x\n")
+    assert not manifest.is_up_to_date(str(source), str(output))
+    manifest.record(str(source), str(output))
+    output.unlink()
+    assert not manifest.is_up_to_date(str(source), str(output))
+
+
+def test_unchanged_files_are_skipped_unless_forced(tmp_path):
+    repo, output_dir = tmp_path / "src", tmp_path / "out"
+    repo.mkdir()
+    (repo / "module.py").write_text("def f(x):\n    return x\n")
+    (repo / "other.py").write_text("def g(x):\n    return x\n")
+
+    def run(*extra):
+        result = subprocess.run(
+            [sys.executable, "main.py", str(repo), "-o", str(output_dir), "--backend", "fake", "--no-cache", *extra],
+            cwd=ROOT, capture_output=True, text=True, env={**os.environ, "OPENAI_API_KEY": ""})
+        assert result.returncode == 0, result.stdout + result.stderr
+        return result.stdout
+
+    run()
+    assert "Skipping 2 unchanged files" in run("--dry-run")
+    (repo / "other.py").write_text("def g(x):\n    return -x\n")
+    changed = run("--dry-run")
+    assert "Skipping 1 unchanged files" in changed and f"Would process {repo / 'other.py'}" in changed
+    forced = run("--dry-run", "--force")
+    assert "Skipping" not in forced and forced.count("Would process") == 2
+
+
+def test_dependency_changes_make_dependents_stale(tmp_path):
+    calculator, app, output = tmp_path / "calculator.py", tmp_path / "main.py", tmp_path / "test_main.py"
+    calculator.write_text("def add(a, b):\n    return a + b\n")
+    app.write_text("from calculator import add\n")
+    output.write_text("def test_add():\n    pass\n")
+    dependencies = [str(calculator)]
+
+    manifest = RunManifest(str(tmp_path / "out"), "pipeline")
+    manifest.record(str(app), str(output), dependencies)
+    assert RunManifest(str(tmp_path / "out"), "pipeline").is_up_to_date(str(app), str(output), dependencies)
+
+    calculator.write_text("def add(a, b, c=0):\n    return a + b + c\n")
+    assert not manifest.is_up_to_date(str(app), str(output), dependencies)
+    # A file that starts importing another project module is stale too
+    manifest.record(str(app), str(output))
+    assert not manifest.is_up_to_date(str(app), str(output), dependencies)
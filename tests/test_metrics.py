@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+import llm_client
+from metrics import instrument, percentile, scope
+import metrics
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class FlakyLLM:
+    model_name = "fake"
+    temperature = 0.0
+
+    def __init__(self, failures):
+        self.failures = failures
+
+    def invoke(self, messages):
+        from langchain_core.messages import AIMessage
+
+        if self.failures:
+            self.failures -= 1
+            raise RateLimited("slow down")
+        return AIMessage(content="ok", usage_metadata={"input_tokens": 7, "output_tokens": 3, "total_tokens": 10})
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) == 0.0
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([5, 1, 3], 100) == 5
+
+
+def test_instrument_labels_llm_calls_with_node_file_and_scenario(fresh_metrics):
+    def node(state):
+        with scope(scenario="test_one"):
+            fresh_metrics.record_llm_call(0.5, prompt_tokens=10, completion_tokens=2)
+        return state
+
+    instrument("test_writer", node)({"file_path": "app/a.py"})
+
+    call = fresh_metrics.llm_calls[0]
+    assert (call["node"], call["file"], call["scenario"]) == ("test_writer", "app/a.py", "test_one")
+    summary = fresh_metrics.summary()["test_writer"]
+    assert summary["runs"] == 1 and summary["prompt_tokens"] == 10
+    assert fresh_metrics.per_file()["app/a.py"]["test_writer"]["llm_calls"] == 1
+
+
+def test_instrument_records_failed_async_runs(fresh_metrics):
+    async def node(state):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        asyncio.run(instrument("code_analyzer", node)({"file_path": "app/a.py"}))
+    assert fresh_metrics.summary()["code_analyzer"]["failed_runs"] == 1
+
+
+def test_parse_guard_records_and_reraises(fresh_metrics):
+    with scope(node="test_strategist"), pytest.raises(ValueError):
+        with metrics.parse_guard():
+            raise ValueError("bad json")
+    assert fresh_metrics.summary()["test_strategist"]["parse_failures"] == 1
+
+
+def test_call_llm_counts_retries_and_tokens(fresh_metrics, monkeypatch):
+    monkeypatch.setattr(llm_client, "get_llm", lambda node: FlakyLLM(failures=2))
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt: 0)
+
+    with scope(node="test_writer"):
+        assert llm_client.call_llm("test_writer", []).content == "ok"
+
+    call = fresh_metrics.llm_calls[0]
+    assert call["retries"] == 2 and call["prompt_tokens"] == 7 and call["completion_tokens"] == 3
+
+
+def test_write_reports(fresh_metrics, tmp_path):
+    instrument("function_path", lambda state: state)({"file_path": "app/a.py"})
+    fresh_metrics.write_json(tmp_path / "m.json")
+    fresh_metrics.write_csv(tmp_path / "m.csv")
+    rows = (tmp_path / "m.csv").read_text().splitlines()
+    assert rows[0].startswith("file,node,runs") and len(rows) == 3
+    assert "function_path" in fresh_metrics.format_table()
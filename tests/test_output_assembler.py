@@ -0,0 +1,49 @@
+import subprocess
+import sys
+
+from output_assembler import assemble_module
+from output_sink import TestFileSink
+
+FIXTURE = '''import pytest
+import json
+
+@pytest.fixture
+def payload():
+    return json.loads('{"a": 1}')
+'''
+
+
+def test_imports_are_hoisted_and_collisions_renamed():
+    snippets = [
+        "import pytest\nfrom json import dumps\n\nencoder = dumps\n\ndef test_a():\n    assert encoder(1) == '1'",
+        "import pytest\nfrom json import dumps, loads\n\nencoder = dumps\n\ndef test_b():\n    assert loads(encoder(2)) == 2",
+        "from json import loads\n\nencoder = str\n\ndef test_a():\n    # Uses its own encoder\n    assert encoder(3) == '3'",
+        "from pickle import loads\n\ndef test_c():\n    assert loads(b'\\x80\\x04K\\x05.') == 5",
+        "def test_broken(:\n    pass",
+    ]
+    source, shared = assemble_module(snippets, preamble="import pytest\n")
+    assert shared == []
+    assert source.startswith("import pytest\nfrom json import dumps, loads\nfrom pickle import loads as loads_2\n")
+    assert source.count("encoder = dumps") == 1
+    assert "encoder_2 = str\n\ndef test_a_2():\n    # Uses its own encoder\n    assert encoder_2(3) == '3'" in source
+    assert "assert loads_2(b'\\x80\\x04K\\x05.') == 5" in source
+    assert "# Test 5\ndef test_broken(:" in source
+
+
+def test_shared_fixtures_move_to_session_scoped_conftest(tmp_path):
+    uses = "\n\ndef test_{0}(payload):\n    assert payload == {{'a': 1}}"
+    for module in ("one", "two"):
+        sink = TestFileSink(f"src/{module}.py", str(tmp_path / f"test_{module}.py"))
+        sink.add(0, FIXTURE + uses.format(f"{module}_first"))
+        sink.add(1, FIXTURE + uses.format(f"{module}_second"))
+        sink.commit()
+
+    conftest = (tmp_path / "conftest.py").read_text()
+    assert conftest.count("def payload") == 1
+    assert "@pytest.fixture(scope='session')" in conftest and "import json" in conftest
+    module = (tmp_path / "test_two.py").read_text()
+    assert "def payload" not in module and module.count("import json") == 1
+
+    result = subprocess.run([sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", str(tmp_path)],
+                            cwd=tmp_path, capture_output=True, text=True)
+    assert "4 passed" in result.stdout, result.stdout
@@ -0,0 +1,42 @@
+from output_sink import TestFileSink
+
+
+def test_out_of_order_tests_are_written_in_scenario_order(tmp_path):
+    output = tmp_path / "test_module.py"
+    sink = TestFileSink("src/module.py", str(output))
+
+    sink.add(1, "def test_b():\n    pass")
+    assert sink.written == 0
+    sink.add(0, "def test_a():\n    pass")
+    sink.add(2, None)
+    sink.add(3, "def test_d():\n    pass")
+    assert sink.written == 3
+    assert not output.exists()
+
+    assert sink.commit() == str(output)
+    text = output.read_text()
+    assert text.startswith("# Auto-generated tests")
+    assert "# Source file: src/module.py" in text
+    assert text.index("test_a") < text.index("test_b") < text.index("test_d")
+    assert "# Test 3\ndef test_d" in text
+    assert not (tmp_path / "test_module.py.partial").exists()
+
+
+def test_abort_keeps_completed_tests_in_partial_file(tmp_path):
+    output = tmp_path / "test_module.py"
+    sink = TestFileSink("src/module.py", str(output))
+    sink.add(0, "def test_a():\n    pass")
+
+    partial = sink.abort()
+    assert partial == f"{output}.partial"
+    assert "def test_a" in open(partial).read()
+    assert not output.exists()
+
+
+def test_commit_falls_back_to_final_state(tmp_path):
+    output = tmp_path / "test_module.py"
+    assert TestFileSink("m.py", str(output)).commit([]) is None
+    assert not output.exists()
+
+    assert TestFileSink("m.py", str(output)).commit(["def test_a():\n    pass"]) == str(output)
+    assert "def test_a" in output.read_text()
@@ -0,0 +1,142 @@
+from path_analyzer import enumerate_paths
+
+def paths_for(source, name):
+    execution_paths, uncharacterized = enumerate_paths(source, [name])
+    assert uncharacterized == []
+    return execution_paths[name]
+
+def test_calculator_raise_sites():
+    with open("app/calculator.py", encoding="utf-8") as f:
+        source = f.read()
+    execution_paths, uncharacterized = enumerate_paths(source)
+
+    assert uncharacterized == []
+    divide = execution_paths["Calculator.divide"]
+    assert [p["path_type"] for p in divide] == ["error_case", "happy_path"]
+    assert divide[0]["conditions"] == ["b == 0"]
+    assert divide[0]["expected_behavior"] == "raises ZeroDivisionError('Cannot divide by zero')"
+    assert divide[1]["conditions"] == ["b != 0"]
+    assert divide[1]["expected_behavior"] == "returns a / b"
+
+    sqrt = execution_paths["Calculator.sqrt"]
+    assert sqrt[0]["conditions"] == ["number < 0"]
+    assert sqrt[0]["expected_behavior"].startswith("raises ValueError(")
+
+def test_early_return_and_fall_through():
+    source = '''
+def f(x):
+    if x is None:
+        return 0
+    x.run()
+'''
+    first, second = paths_for(source, "f")
+    assert first["conditions"] == ["x is None"] and first["path_type"] == "edge_case"
+    assert second["conditions"] == ["x is not None"]
+    assert second["expected_behavior"] == "returns None"
+
+def test_try_except_and_loops():
+    source = '''
+def g(items):
+    for item in items:
+        try:
+            item.check()
+        except KeyError:
+            raise ValueError("bad")
+    return len(items)
+'''
+    conditions = [p["conditions"] for p in paths_for(source, "g")]
+    assert conditions == [
+        ["items is not empty"],
+        ["items is not empty", "try block raises KeyError"],
+        ["items is empty"],
+    ]
+
+def test_path_explosion_and_unknown_functions_go_to_llm():
+    branches = "\n".join(f"    if x == {i}:\n        y = {i}" for i in range(8))
+    source = f"def many(x):\n{branches}\n    return y\n"
+    execution_paths, uncharacterized = enumerate_paths(source, ["many", "missing"])
+    assert execution_paths == {}
+    assert uncharacterized == ["many", "missing"]
+
+def test_unparsable_source():
+    assert enumerate_paths("def broken(:", ["broken"]) == ({}, ["broken"])
+
+def test_for_else_search():
+    source = '''
+def index_of(items, target):
+    for i, x in enumerate(items):
+        if x == target:
+            return i
+    else:
+        return -1
+'''
+    found, missing, empty = paths_for(source, "index_of")
+    assert found["expected_behavior"] == "returns i" and found["path_type"] == "happy_path"
+    assert missing["expected_behavior"] == "returns -1"
+    assert missing["conditions"] == ["enumerate(items) is not empty", "x != target", "enumerate(items) is exhausted"]
+    assert empty["expected_behavior"] == "returns -1" and empty["conditions"] == ["enumerate(items) is empty"]
+
+def test_break_skips_the_loop_else():
+    source = '''
+def first_negative(items):
+    for x in items:
+        if x < 0:
+            break
+    else:
+        return None
+    return x
+'''
+    assert [(p["conditions"], p["expected_behavior"]) for p in paths_for(source, "first_negative")] == [
+        (["items is not empty", "x < 0"], "returns x"),
+        (["items is not empty", "x >= 0", "items is exhausted"], "returns None"),
+        (["items is empty"], "returns None"),
+    ]
+
+def test_while_true_only_exits_through_break_return_or_raise():
+    source = '''
+def drain(queue):
+    while True:
+        x = queue.pop()
+        if not x:
+            break
+        if x == "stop":
+            raise StopIteration
+    return x
+'''
+    stopped, raised = paths_for(source, "drain")
+    assert stopped["conditions"] == ["not x"] and stopped["expected_behavior"] == "returns x"
+    assert raised["conditions"] == ["x", "x == 'stop'"] and raised["path_type"] == "error_case"
+
+    # A loop nothing leaves has no paths to test
+    assert enumerate_paths("def serve():\n    while True:\n        pass\n") == ({}, ["serve"])
+
+def test_continue_goes_on_to_the_next_iteration():
+    source = '''
+def total(items):
+    n = 0
+    for item in items:
+        if item is None:
+            continue
+        n += item
+    return n
+'''
+    paths = paths_for(source, "total")
+    assert [p["expected_behavior"] for p in paths] == ["returns n"] * 3
+    assert [p["conditions"] for p in paths] == [
+        ["items is not empty", "item is None"],
+        ["items is not empty", "item is not None"],
+        ["items is empty"],
+    ]
+
+def test_non_empty_loops_are_not_edge_cases():
+    source = '''
+def names(users):
+    for user in users:
+        if not user.active:
+            raise ValueError(user)
+    return [u.name for u in users]
+'''
+    error, normal, empty = paths_for(source, "names")
+    assert normal["conditions"] == ["users is not empty", "user.active"] and normal["path_type"] == "happy_path"
+    assert error["path_type"] == "error_case"
+    assert empty["path_type"] == "edge_case"
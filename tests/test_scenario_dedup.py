@@ -0,0 +1,43 @@
+from scenario_dedup import dedupe_scenarios
+
+
+def scenario(function, test_name, inputs, expected, priority="medium"):
+    return {"function": function, "test_name": test_name, "priority": priority,
+            "test_inputs": inputs, "expected_output": expected}
+
+
+def test_reworded_duplicates_collapse_to_highest_priority():
+    scenarios = [
+        scenario("add", "test_add_two_numbers", "a=2, b=3", "returns 5", "high"),
+        scenario("sub", "test_sub_same_inputs", "a=2, b=3", "returns 5", "high"),
+        scenario("add", "test_addition_works", "a = 2.0, b = 3", "Should return 5", "medium"),
+        scenario("add", "test_add_negative", "a=-2, b=3", "returns 1", "medium"),
+        scenario("add", "test_add_none", "a=None, b=3", "raises TypeError", "low"),
+        scenario("add", "test_add_null_input", "a = null, b = 3", "Raises a TypeError exception", "low"),
+    ]
+
+    kept, duplicates = dedupe_scenarios(scenarios)
+    assert [s["test_name"] for s in kept] == [
+        "test_add_two_numbers", "test_sub_same_inputs", "test_add_negative", "test_add_none"]
+    assert [s["test_name"] for s in duplicates] == ["test_addition_works", "test_add_null_input"]
+
+
+def test_priority_decides_representative_even_when_unsorted():
+    low = scenario("f", "test_low", "x=[]", "returns empty list", "low")
+    high = scenario("f", "test_high", "x = []", "Returns an empty list", "high")
+    kept, duplicates = dedupe_scenarios([low, high])
+    assert kept == [high] and duplicates == [low]
+
+
+def test_distinct_scenarios_are_kept():
+    scenarios = [
+        scenario("f", "test_valid", "valid inputs", "returns a result"),
+        scenario("f", "test_invalid", "invalid inputs", "raises an exception"),
+        scenario("f", "test_big", "x=10", "returns 20"),
+        scenario("f", "test_small", "x=1", "returns 2"),
+        scenario("f", "test_add_op", "operation == 'add'", "returns add(a, b)"),
+        scenario("f", "test_other_op", "operation != 'add'", "returns add(a, b)"),
+        scenario("f", "test_unplanned_a", "", ""),
+        scenario("f", "test_unplanned_b", "", ""),
+    ]
+    assert dedupe_scenarios(scenarios) == (scenarios, [])
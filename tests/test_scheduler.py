@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+import llm_client
+import scheduler
+from scheduler import Scheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_at_its_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=4, clock=clock)
+    assert bucket.wait_time(4) == 0
+    bucket.take(4)
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.now = 1.0
+    assert bucket.wait_time(2) == 0
+    bucket.give_back(-2)
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+
+
+def test_aimd_cuts_on_rate_limits_and_spikes_and_grows_on_success():
+    sched = Scheduler(max_concurrency=8)
+    sched.release(sched.acquire(), rate_limited=True, retry_after=0.01)
+    assert sched.limit == 4
+    for _ in range(4):
+        sched.release(sched.acquire())
+    assert 4 < sched.limit < 6
+
+    clock = FakeClock()
+    sched = Scheduler(max_concurrency=8, clock=clock)
+    for latency in (1, 1, 10):
+        ticket = sched.acquire()
+        clock.now += latency
+        sched.release(ticket)
+    assert sched.latency_spikes == 1 and sched.limit < 8
+
+
+def test_limit_is_cut_once_per_round_trip():
+    sched = Scheduler(max_concurrency=8)
+    in_flight = [sched.acquire() for _ in range(6)]
+    for ticket in in_flight:
+        sched.release(ticket, rate_limited=True)
+    # All six were sent at the old limit, so the burst counts as one signal
+    assert sched.rate_limited == 6 and sched.limit == 4
+
+    # A request sent after the cut that is still rejected cuts again
+    sched.release(sched.acquire(), rate_limited=True)
+    assert sched.limit == 2
+
+
+def test_latency_spikes_are_judged_per_kind_of_call():
+    clock = FakeClock()
+    sched = Scheduler(max_concurrency=8, clock=clock)
+
+    def call(kind, latency):
+        ticket = sched.acquire(kind=kind)
+        clock.now += latency
+        sched.release(ticket)
+
+    for _ in range(3):
+        call("test_strategist", 1)
+    call("test_writer", 10)
+    call("test_writer", 12)
+    assert sched.latency_spikes == 0 and sched.limit == 8
+    call("test_writer", 50)
+    assert sched.latency_spikes == 1 and sched.limit == 4
+
+
+def test_higher_priority_requests_are_granted_first():
+    sched = Scheduler(max_concurrency=1)
+    holder = sched.acquire()
+    order, threads = [], []
+
+    def request(level):
+        with scheduler.priority(level):
+            ticket = sched.acquire()
+        order.append(level)
+        sched.release(ticket)
+
+    for level in ("low", "medium", "high"):
+        threads.append(threading.Thread(target=request, args=(level,)))
+        threads[-1].start()
+        while len(sched._queue) < len(threads):
+            time.sleep(0.001)
+    sched.release(holder)
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order == ["high", "medium", "low"]
+
+
+def test_request_bucket_paces_requests():
+    sched = Scheduler(rpm=600, max_concurrency=8)
+    sched.requests.level = 0  # Start empty: 10 requests per second
+    start = time.monotonic()
+    for _ in range(3):
+        sched.release(sched.acquire())
+    assert time.monotonic() - start >= 0.25
+
+
+class RateLimitedProvider(BaseHTTPRequestHandler):
+    """OpenAI-compatible stand-in that returns 429 above MAX_IN_FLIGHT concurrent requests."""
+
+    MAX_IN_FLIGHT = 2
+    lock = threading.Lock()
+    in_flight = 0
+    served = 0
+    rejected = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        cls = type(self)
+        with cls.lock:
+            overloaded = cls.in_flight >= cls.MAX_IN_FLIGHT
+            if overloaded:
+                cls.rejected += 1
+            else:
+                cls.in_flight += 1
+        if overloaded:
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                       {"retry-after": "0.05"})
+            return
+        time.sleep(0.05)
+        with cls.lock:
+            cls.in_flight -= 1
+            cls.served += 1
+        self._send(200, {
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-4",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+        })
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RateLimitedProvider)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("TESTGEN_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setenv("TESTGEN_MAX_RETRIES", "8")
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt: 0.01)
+    yield RateLimitedProvider
+    server.shutdown()
+
+
+def test_concurrency_adapts_to_a_rate_limited_provider(provider, monkeypatch):
+    sched = Scheduler(max_concurrency=8)
+    monkeypatch.setattr(llm_client, "default_scheduler", sched)
+
+    results = []
+
+    def call(i):
+        results.append(llm_client.call_llm("test_writer", [HumanMessage(content=f"request {i}")]).content)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    assert results == ["ok"] * 12
+    assert provider.rejected > 0 and sched.rate_limited == provider.rejected
+    assert sched.limit < 8
+    assert sched.in_flight == 0
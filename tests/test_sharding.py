@@ -0,0 +1,52 @@
+import pytest
+
+from sharding import assign_shards, merge_shards, parse_shard
+
+CONFTEST = '''import pytest
+from decimal import Decimal
+
+
+@pytest.fixture(scope="session")
+def ledger():
+    return [Decimal({value})]
+'''
+
+MODULE = '''# Auto-generated tests using AI-powered multi-agent analysis
+# Source file: src/{name}.py
+
+import pytest
+
+# Test 1
+def test_{name}(ledger):
+    assert ledger == [{value}]
+'''
+
+
+def test_assignment_is_balanced_and_independent_of_order():
+    work = {f"src/m{i}.py": w for i, w in enumerate([9, 1, 1, 4, 4, 3, 2, 2])}
+    assignment = assign_shards(list(work), 3, work.get, "src")
+    assert assignment == assign_shards(list(reversed(work)), 3, work.get, "src")
+    loads = [sum(w for f, w in work.items() if assignment[f] == shard) for shard in (1, 2, 3)]
+    assert sorted(loads) == [8, 9, 9]
+    assert parse_shard(" 2/4") == (2, 4)
+    for spec in ("0/4", "5/4", "2"):
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+
+
+def test_merge_keeps_conflicting_fixtures_local(tmp_path):
+    for shard, (name, value) in enumerate([("alpha", 1), ("beta", 2)], 1):
+        shard_path = tmp_path / "out" / f"shard-{shard}-of-2"
+        shard_path.mkdir(parents=True)
+        (shard_path / "conftest.py").write_text(CONFTEST.format(value=value))
+        (shard_path / f"test_{name}.py").write_text(MODULE.format(name=name, value=value))
+
+    output = tmp_path / "out"
+    lines = merge_shards(sorted(str(p) for p in output.iterdir()), str(output), "testgen_metrics")
+    assert lines[1] == "shard-2-of-2: 1 test modules, 1 conflicting fixtures kept in its modules"
+    assert "Decimal(1)" in (output / "conftest.py").read_text()
+    beta = (output / "test_beta.py").read_text()
+    assert beta.startswith("# Auto-generated tests")
+    assert "def ledger():" in beta and "Decimal(2)" in beta
+    assert "def ledger" not in (output / "test_alpha.py").read_text()
+    compile(beta, "test_beta.py", "exec")
@@ -0,0 +1,71 @@
+import pytest
+from static_analyzer import analyze_source, complexity_label
+
+SOURCE = '''
+import os
+from typing import Optional
+
+def top_level(a, b=1, *args, key=None, **kwargs) -> Optional[int]:
+    """Top level function"""
+    if a and b:
+        return a
+    for item in args:
+        if item:
+            return item
+    return None
+
+class Outer(Base):
+    """Outer class"""
+
+    def method(self, x):
+        return [y for y in x if y]
+
+    @staticmethod
+    def static(self_like):
+        return self_like
+
+    class Inner:
+        async def run(self):
+            pass
+'''
+
+@pytest.fixture
+def code_map():
+    return analyze_source(SOURCE)
+
+def test_functions_are_qualified_by_class(code_map):
+    names = [f["name"] for f in code_map["functions"]]
+    assert names == ["top_level", "Outer.method", "Outer.static", "Outer.Inner.run"]
+
+def test_params_and_return_type(code_map):
+    top, method, static, run = code_map["functions"]
+    assert top["params"] == ["a", "b", "*args", "key", "**kwargs"]
+    assert top["return_type"] == "Optional[int]"
+    assert top["description"] == "Top level function"
+    assert method["params"] == ["x"]
+    assert static["params"] == ["self_like"]
+    assert run["is_async"] and run["return_type"] == "unknown"
+
+def test_cyclomatic_complexity(code_map):
+    top, method, _, run = code_map["functions"]
+    # if + and + for + if
+    assert top["cyclomatic_complexity"] == 5
+    assert top["complexity"] == "medium"
+    # comprehension loop + its condition
+    assert method["cyclomatic_complexity"] == 3
+    assert run["cyclomatic_complexity"] == 1
+    assert code_map["overall_complexity"] == "medium"
+
+def test_classes_and_imports(code_map):
+    assert [c["name"] for c in code_map["classes"]] == ["Outer", "Outer.Inner"]
+    assert code_map["classes"][0]["methods"] == ["method", "static"]
+    assert code_map["classes"][0]["bases"] == ["Base"]
+    assert code_map["imports"] == ["import os", "from typing import Optional"]
+
+@pytest.mark.parametrize("complexity,label", [(1, "simple"), (3, "simple"), (4, "medium"), (7, "medium"), (8, "complex")])
+def test_complexity_label(complexity, label):
+    assert complexity_label(complexity) == label
+
+def test_syntax_error_is_raised():
+    with pytest.raises(SyntaxError):
+        analyze_source("def broken(:\n")
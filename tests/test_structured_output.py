@@ -0,0 +1,52 @@
+import pytest
+
+from structured_output import (
+    JSONRepairError, extract_json, parse_code_map, parse_execution_paths, parse_test_scenarios,
+)
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ('```json\n{"a": [1, 2]}\n```', {"a": [1, 2]}),
+    ('Sure! Here is the map:\n{"a": 1}\nLet me know if you need more.', {"a": 1}),
+    ('{"a": [1, 2,],}', {"a": [1, 2]}),
+    ('{"a": True, "b": None, "c": "True, None,]"}', {"a": True, "b": None, "c": "True, None,]"}),
+    ('```json\n{"a": [{"b": 1}, {"b": 2}, {"b"', {"a": [{"b": 1}, {"b": 2}]}),
+    ('[{"x": "cut off mid str', [{"x": "cut off mid str"}]),
+])
+def test_extract_json_repairs_common_damage(reply, expected):
+    assert extract_json(reply)[0] == expected
+
+
+def test_extract_json_reports_unrecoverable_replies():
+    with pytest.raises(JSONRepairError):
+        extract_json("I could not analyze this code.")
+
+
+def test_scenarios_are_validated_item_by_item():
+    reply = """[
+        {"function": "f", "test_name": "test_f", "priority": "HIGH"},
+        {"function": "g", "priority": "urgent"},
+        {"test_name": "no_function"},
+        "not a scenario",
+        {"function": "h", "test_name": "test_h", "desc"""
+    scenarios = parse_test_scenarios(reply)
+    assert [s["test_name"] for s in scenarios] == ["test_f", "test_g_1", "test_h"]
+    assert [s["priority"] for s in scenarios] == ["high", "medium", "medium"]
+
+
+def test_scenarios_accept_structured_output_wrapper():
+    assert parse_test_scenarios('{"scenarios": [{"function": "f", "test_name": "t"}]}')[0]["test_name"] == "t"
+
+
+def test_execution_paths_drop_invalid_entries_and_normalize_types():
+    reply = '{"f": [{"path_type": "Error Case", "expected_behavior": {"raises": "ValueError"}}, 7], "g": "oops"}'
+    paths = parse_execution_paths(reply)
+    assert list(paths) == ["f"]
+    assert paths["f"][0]["path_type"] == "error_case"
+    assert paths["f"][0]["expected_behavior"] == '{"raises": "ValueError"}'
+
+
+def test_code_map_keeps_valid_functions():
+    code_map = parse_code_map('{"functions": [{"name": "f", "params": ["x"]}, {"params": []}], "imports": "os"}')
+    assert [f["name"] for f in code_map["functions"]] == ["f"]
+    assert code_map["imports"] == [] and code_map["classes"] == []
@@ -0,0 +1,53 @@
+import validation
+from test_validator_agent import validate_tests
+from validation import ValidationCache, Validator
+
+PASSING = "from mod import double\n\ndef test_double():\n    assert double(2) == 4"
+FAILING = "from mod import double\n\ndef test_double_wrong():\n    assert double(2) == 5"
+HANGING = "import time\n\ndef test_slow():\n    time.sleep(30)"
+
+
+def write_source(tmp_path):
+    source = tmp_path / "mod.py"
+    source.write_text("def double(x):\n    return x * 2\n")
+    return str(source)
+
+
+def test_tests_run_in_parallel_sandboxes_with_outcomes_and_timeouts(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-secret")
+    source = write_source(tmp_path)
+    leak = "import os\n\ndef test_env():\n    assert 'OPENAI_API_KEY' not in os.environ"
+    validator = Validator("flag", timeout=5, workers=4)
+
+    results = validator.validate([PASSING, FAILING, "def test_broken(:\n    pass", leak], source)
+    assert [r["outcome"] for r in results] == ["passed", "failed", "error", "passed"]
+    assert "assert 4 == 5" in results[1]["detail"]
+
+    assert validation.run_test(HANGING, source, timeout=1)["outcome"] == "timeout"
+
+
+def test_outcomes_are_cached_by_test_and_source_hash(tmp_path, monkeypatch):
+    source = write_source(tmp_path)
+    cache_path = str(tmp_path / "cache.json")
+    runs = []
+    real_run = validation.run_test
+    monkeypatch.setattr(validation, "run_test", lambda *args: runs.append(args) or real_run(*args))
+
+    Validator(cache=ValidationCache(cache_path)).validate([PASSING], source)
+    results = Validator(cache=ValidationCache(cache_path)).validate([PASSING], source)
+    assert results[0] == {"outcome": "passed", "detail": "", "cached": True}
+    assert len(runs) == 1
+
+    (tmp_path / "mod.py").write_text("def double(x):\n    return x + x\n")
+    assert Validator(cache=ValidationCache(cache_path)).validate([PASSING], source)[0]["cached"] is False
+
+
+def test_failing_tests_are_flagged_or_dropped(tmp_path):
+    state = {"file_path": write_source(tmp_path), "generated_tests": [FAILING, PASSING]}
+
+    flagged = validate_tests(state, Validator("flag"))["generated_tests"].value
+    assert flagged[0].startswith("# VALIDATION FAILED") and flagged[1] == PASSING
+
+    update = validate_tests(state, Validator("drop"))
+    assert update["generated_tests"].value == [PASSING]
+    assert [r["outcome"] for r in update["validation_results"]] == ["failed", "passed"]
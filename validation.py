@@ -0,0 +1,166 @@
+"""Runs generated tests to check that they actually pass.
+
+Each generated test runs in its own pytest subprocess inside a throwaway
+directory with a per-test timeout, several at a time. The subprocess sees
+the source file's directory, the root of its package and the working
+directory on ``PYTHONPATH``, so both ``from main import app`` and
+``from app.main import app`` style imports resolve. Secrets such as API
+keys are removed from its environment and third-party pytest plugins are
+not loaded.
+
+Outcomes are cached on disk, keyed by the hash of the test code and of
+the source file, so unchanged tests are never rerun.
+"""
+import contextvars
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import file_hash
+from output_sink import HEADER
+
+VALIDATION_CACHE_NAME = ".testgen_validation.json"
+
+PASSED, FAILED, ERROR, TIMEOUT = "passed", "failed", "error", "timeout"
+
+# pytest exit codes: 0 all passed, 1 some failed, 5 nothing collected, others are errors
+_EXIT_OUTCOMES = {0: PASSED, 1: FAILED}
+
+_SECRET_MARKERS = ("KEY", "TOKEN", "SECRET", "PASSWORD")
+
+
+def _sandbox_env(source_path):
+    env = {k: v for k, v in os.environ.items() if not any(marker in k.upper() for marker in _SECRET_MARKERS)}
+    source_dir = os.path.dirname(os.path.abspath(source_path))
+    package_root = source_dir
+    while os.path.exists(os.path.join(package_root, "__init__.py")):
+        package_root = os.path.dirname(package_root)
+    paths = [source_dir, package_root, os.getcwd()]
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(dict.fromkeys(paths))
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    # Installed pytest plugins (langsmith, cov, ...) add seconds to every run
+    env["PYTEST_DISABLE_PLUGIN_AUTOLOAD"] = "1"
+    return env
+
+
+def _summary(output):
+    """The most informative line of pytest's output."""
+    lines = [line.strip() for line in output.splitlines() if line.strip()]
+    for prefix in ("E ", "ERROR", "FAILED"):
+        for line in lines:
+            if line.startswith(prefix):
+                return line[:200]
+    return lines[-1][:200] if lines else ""
+
+
+def run_test(test_code, source_path, timeout=30.0):
+    """Run one generated test in an isolated pytest subprocess; returns ``{"outcome", "detail"}``."""
+    with tempfile.TemporaryDirectory(prefix="testgen_validate_") as sandbox:
+        test_path = os.path.join(sandbox, "test_generated.py")
+        with open(test_path, "w", encoding="utf-8") as f:
+            f.write(HEADER.format(file_path=source_path))
+            f.write(test_code)
+            f.write("\n")
+        command = [sys.executable, "-m", "pytest", "-q", "--no-header", "-p", "no:cacheprovider", test_path]
+        try:
+            result = subprocess.run(command, cwd=sandbox, env=_sandbox_env(source_path),
+                                    capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {"outcome": TIMEOUT, "detail": f"timed out after {timeout:g}s"}
+    outcome = _EXIT_OUTCOMES.get(result.returncode, ERROR)
+    return {"outcome": outcome, "detail": "" if outcome == PASSED else _summary(result.stdout + result.stderr)}
+
+
+class ValidationCache:
+    """Outcomes of earlier validation runs, keyed by test and source hashes."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    @staticmethod
+    def make_key(test_code, source_hash):
+        return hashlib.sha256(f"{source_hash}\0{test_code}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            return self.entries.get(key)
+
+    def put(self, key, result):
+        with self._lock:
+            self.entries[key] = result
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+
+
+class Validator:
+    """Validation settings for a run: what to do with failures, and how to run tests.
+
+    ``mode`` is ``"flag"`` to keep failing tests with a comment explaining the
+    failure, or ``"drop"`` to leave them out of the file.
+    """
+
+    def __init__(self, mode="flag", timeout=30.0, workers=None, cache=None):
+        if mode not in ("flag", "drop"):
+            raise ValueError(f"Unknown validation mode {mode!r}")
+        self.mode = mode
+        self.timeout = timeout
+        self.workers = workers or os.cpu_count() or 2
+        self.cache = cache if cache is not None else ValidationCache()
+
+    def validate(self, tests, source_path, on_result=None):
+        """Run ``tests`` in parallel; returns one result dict per test, in order.
+
+        ``on_result(index, result)`` is called as each test finishes, in the
+        caller's context (so it may use the graph stream writer).
+        """
+        source_hash = file_hash(source_path) or ""
+
+        def check(index, test_code):
+            key = ValidationCache.make_key(test_code, source_hash)
+            result = self.cache.get(key)
+            if result is not None:
+                result = {**result, "cached": True}
+            else:
+                result = {**run_test(test_code, source_path, self.timeout), "cached": False}
+                self.cache.put(key, {"outcome": result["outcome"], "detail": result["detail"]})
+            if on_result is not None:
+                on_result(index, result)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, check, index, code)
+                       for index, code in enumerate(tests)]
+            results = [future.result() for future in futures]
+        self.cache.save()
+        return results
+
+    def apply(self, test_code, result):
+        """The test as it should be written: unchanged, flagged, or None when dropped."""
+        if result["outcome"] == PASSED:
+            return test_code
+        if self.mode == "drop":
+            return None
+        detail = f": {result['detail']}" if result["detail"] else ""
+        return f"# VALIDATION {result['outcome'].upper()}{detail}\n{test_code}"